@@ -0,0 +1,51 @@
+"""Add vendors.geohash and per-cell vendor counts
+
+Revision ID: 4a6d0b2e9c17
+Revises: f1c3a7d92b60
+Create Date: 2026-10-18 17:21:45.118302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '4a6d0b2e9c17'
+down_revision = 'f1c3a7d92b60'
+branch_labels = None
+depends_on = None
+
+# stesse precisioni del default di Settings.GEO_CELL_PRECISIONS
+PRECISIONS = (4, 5, 6)
+
+
+def upgrade() -> None:
+    """Backfill vendors.geohash from location and build vendor_cell_counts."""
+    # location è nullable: i vendor senza posizione restano senza geohash
+    # e fuori dai conteggi per cella
+    op.add_column('vendors', sa.Column('geohash', sa.String(9), nullable=True))
+    op.execute("UPDATE vendors SET geohash = ST_GeoHash(location, 9) WHERE location IS NOT NULL")
+
+    op.create_table(
+        'vendor_cell_counts',
+        sa.Column('precision', sa.SmallInteger(), primary_key=True),
+        sa.Column('cell', sa.String(9), primary_key=True),
+        sa.Column(
+            'category',
+            postgresql.ENUM('haircut', 'beautician', 'plumber', 'mason', name='categoryenum', create_type=False),
+            primary_key=True,
+        ),
+        sa.Column('count', sa.Integer(), nullable=False),
+    )
+    for precision in PRECISIONS:
+        op.execute(
+            "INSERT INTO vendor_cell_counts (precision, cell, category, count) "
+            f"SELECT {precision}, left(geohash, {precision}), category, count(*) "
+            "FROM vendors WHERE geohash IS NOT NULL GROUP BY 2, 3"
+        )
+
+
+def downgrade() -> None:
+    """Drop vendor_cell_counts and vendors.geohash."""
+    op.drop_table('vendor_cell_counts')
+    op.drop_column('vendors', 'geohash')
@@ -0,0 +1,31 @@
+"""Add geocode cache table
+
+Revision ID: 5b8e1c0f4a27
+Revises: 2defae71fe7a
+Create Date: 2026-10-18 09:12:05.118342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '5b8e1c0f4a27'
+down_revision = '2defae71fe7a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Create the geocode_cache table keyed on the normalized address."""
+    op.create_table(
+        'geocode_cache',
+        sa.Column('query_key', sa.String(), primary_key=True, nullable=False),
+        sa.Column('latitude', sa.Float(), nullable=False),
+        sa.Column('longitude', sa.Float(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Drop the geocode_cache table."""
+    op.drop_table('geocode_cache')
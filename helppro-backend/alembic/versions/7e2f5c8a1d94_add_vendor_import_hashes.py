@@ -0,0 +1,46 @@
+"""Add import content hashes to vendors
+
+Revision ID: 7e2f5c8a1d94
+Revises: 4a6d0b2e9c17
+Create Date: 2026-10-18 18:47:03.552918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '7e2f5c8a1d94'
+down_revision = '4a6d0b2e9c17'
+branch_labels = None
+depends_on = None
+
+
+def _norm(column: str) -> str:
+    # come app.utils.geocode.normalize_address_key per ogni campo: strip()
+    # toglie ogni spazio bianco ai bordi (tab, a capo), non solo ' ' come btrim
+    trimmed = f"regexp_replace(lower({column}), '^\\s+|\\s+$', '', 'g')"
+    return f"btrim(regexp_replace({trimmed}, '\\s+', ' ', 'g'), ' ,.')"
+
+
+def upgrade() -> None:
+    """Add and backfill vendors.address_hash/content_hash; add bulk_jobs.skipped_rows."""
+    op.add_column('vendors', sa.Column('address_hash', sa.String(32), nullable=True))
+    op.add_column('vendors', sa.Column('content_hash', sa.String(32), nullable=True))
+    # stessi hash di crud.vendor_hashes: il primo re-import salta le righe invariate
+    op.execute(
+        "UPDATE vendors SET "
+        f"address_hash = md5(concat_ws('|', {_norm('address')}, {_norm('postcode')}, "
+        f"{_norm('city')}, {_norm('country')})), "
+        "content_hash = md5(concat_ws(chr(31), company_name, category::text, country, city, postcode, address))"
+    )
+    op.add_column(
+        'bulk_jobs',
+        sa.Column('skipped_rows', sa.Integer(), nullable=False, server_default='0'),
+    )
+
+
+def downgrade() -> None:
+    """Drop the import hash columns."""
+    op.drop_column('bulk_jobs', 'skipped_rows')
+    op.drop_column('vendors', 'content_hash')
+    op.drop_column('vendors', 'address_hash')
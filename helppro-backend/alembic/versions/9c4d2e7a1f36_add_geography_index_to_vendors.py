@@ -0,0 +1,27 @@
+"""Add geography expression index to vendors
+
+Revision ID: 9c4d2e7a1f36
+Revises: 5b8e1c0f4a27
+Create Date: 2026-10-18 10:02:41.507216
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '9c4d2e7a1f36'
+down_revision = '5b8e1c0f4a27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Index geography(location) so metre-based radius and KNN searches use GiST."""
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_vendors_location_geog "
+        "ON vendors USING gist (geography(location))"
+    )
+
+
+def downgrade() -> None:
+    """Drop the geography expression index."""
+    op.drop_index('ix_vendors_location_geog', table_name='vendors')
@@ -0,0 +1,41 @@
+"""Add trigram search indexes to vendors
+
+Revision ID: d31f7b6c0e85
+Revises: 9c4d2e7a1f36
+Create Date: 2026-10-18 11:24:13.902648
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'd31f7b6c0e85'
+down_revision = '9c4d2e7a1f36'
+branch_labels = None
+depends_on = None
+
+TRGM_COLUMNS = ('company_name', 'city', 'postcode', 'address')
+
+
+def upgrade() -> None:
+    """Enable pg_trgm and index vendor text fields for ILIKE and similarity search."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # ILIKE '%...%' e prefissi sulle singole colonne
+    for column in TRGM_COLUMNS:
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS ix_vendors_{column}_trgm "
+            f"ON vendors USING gin ({column} gin_trgm_ops)"
+        )
+    # testo combinato della ricerca ordinata (stessa espressione di crud.VENDOR_SEARCH_TEXT)
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_vendors_search_trgm ON vendors USING gin "
+        "((company_name || ' ' || city || ' ' || postcode || ' ' || address) gin_trgm_ops)"
+    )
+    op.create_index('ix_vendors_category', 'vendors', ['category'])
+
+
+def downgrade() -> None:
+    """Drop the text search indexes (the pg_trgm extension is left installed)."""
+    op.drop_index('ix_vendors_category', table_name='vendors')
+    op.drop_index('ix_vendors_search_trgm', table_name='vendors')
+    for column in TRGM_COLUMNS:
+        op.drop_index(f'ix_vendors_{column}_trgm', table_name='vendors')
@@ -0,0 +1,46 @@
+"""Add bulk upload job tables
+
+Revision ID: e8a05c93b4d1
+Revises: d31f7b6c0e85
+Create Date: 2026-10-18 13:40:52.671094
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e8a05c93b4d1'
+down_revision = 'd31f7b6c0e85'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Create bulk_jobs and bulk_job_rows for asynchronous bulk uploads."""
+    op.create_table(
+        'bulk_jobs',
+        sa.Column('id', sa.String(32), primary_key=True, nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('filename', sa.String(), nullable=True),
+        sa.Column('processed_rows', sa.Integer(), nullable=False),
+        sa.Column('succeeded_rows', sa.Integer(), nullable=False),
+        sa.Column('failed_rows', sa.Integer(), nullable=False),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_table(
+        'bulk_job_rows',
+        sa.Column('job_id', sa.String(32), sa.ForeignKey('bulk_jobs.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('row', sa.Integer(), primary_key=True),
+        sa.Column('created_id', sa.Integer(), nullable=True),
+        sa.Column('error', sa.String(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Drop the bulk upload job tables."""
+    op.drop_table('bulk_job_rows')
+    op.drop_table('bulk_jobs')
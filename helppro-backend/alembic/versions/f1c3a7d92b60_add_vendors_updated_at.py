@@ -0,0 +1,30 @@
+"""Add updated_at to vendors
+
+Revision ID: f1c3a7d92b60
+Revises: e8a05c93b4d1
+Create Date: 2026-10-18 15:02:17.334810
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'f1c3a7d92b60'
+down_revision = 'e8a05c93b4d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Add vendors.updated_at (backfilled to now()) for incremental exports."""
+    op.add_column(
+        'vendors',
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index('ix_vendors_updated_at', 'vendors', ['updated_at'])
+
+
+def downgrade() -> None:
+    """Drop vendors.updated_at."""
+    op.drop_index('ix_vendors_updated_at', table_name='vendors')
+    op.drop_column('vendors', 'updated_at')
@@ -1,12 +1,13 @@
 from datetime import timedelta, datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.responses import JSONResponse
 from jose import JWTError, jwt
 from sqlalchemy.ext.asyncio import AsyncSession
 from app import crud, schemas
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.config import settings
+from app.utils import auth_limits, user_cache
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -14,11 +15,14 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
 @router.post("/token", response_model=schemas.Token)
 async def login_for_access_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: AsyncSession = Depends(get_db)
 ):
+    # rifiuto economico prima del lookup e della verifica bcrypt
+    await auth_limits.check(request, "login", email=form_data.username)
     user = await crud.get_user_by_email(db, form_data.username)
-    if not user or not crud.pwd_context.verify(form_data.password, user.hashed_password):
+    if not user or not await crud.verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -29,8 +33,15 @@ async def login_for_access_token(
     access_token = jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
     return {"access_token": access_token, "token_type": "bearer"}
 
-@router.get("/users/me", response_model=schemas.User)
-async def read_users_me(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_read_db),
+) -> schemas.User:
+    """
+    Utente del bearer token. Il record è preso dalla cache per subject:
+    nel caso comune nessuna query (la sessione non apre connessioni finché
+    non serve).
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -43,18 +54,30 @@ async def read_users_me(token: str = Depends(oauth2_scheme), db: AsyncSession =
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = await crud.get_user_by_email(db, email)
-    if not user:
-        raise credentials_exception
+    user = await user_cache.get(email)
+    if user is None:
+        # versione letta prima della query: un'invalidazione concorrente
+        # rende subito obsoleta la voce salvata
+        version = await user_cache.version(email)
+        db_user = await crud.get_user_by_email(db, email)
+        if not db_user:
+            raise credentials_exception
+        user = schemas.User.from_orm(db_user)
+        user_cache.put(email, user, version)
     if user.disabled:
         raise HTTPException(status_code=400, detail="Inactive user")
     return user
 
+@router.get("/users/me", response_model=schemas.User)
+async def read_users_me(current_user: schemas.User = Depends(get_current_user)):
+    return current_user
+
 
 
 
 @router.post("/signup", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
-async def signup(user_in: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
+async def signup(request: Request, user_in: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
+    await auth_limits.check(request, "signup")
     # 1. Controlla duplicati
     existing = await crud.get_user_by_email(db, user_in.email)
     if existing:
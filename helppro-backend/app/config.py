@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -5,7 +7,155 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # Schema all'avvio: "create" = create_all (sviluppo), "check" = verifica
+    # che il DB sia alla head di Alembic, "skip" = nessun accesso al DB
+    STARTUP_SCHEMA: Literal["create", "check", "skip"] = "create"
+    # timeout del ping al DB di /readyz
+    READINESS_DB_TIMEOUT_S: float = 2.0
+
+    # Engine database
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_S: float = 30.0
+    DB_POOL_RECYCLE_S: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # cache dei prepared statement asyncpg per connessione
+    DB_STATEMENT_CACHE_SIZE: int = 500
+    # statement_timeout lato server (0 = nessun limite)
+    DB_STATEMENT_TIMEOUT_MS: int = 15000
+    # query più lente di così finiscono nel log (0 = disattivato)
+    SLOW_QUERY_MS: int = 500
+
+    # Replica in sola lettura per ricerche e profilo (assente = tutto sul primario)
+    DATABASE_READ_URL: str | None = None
+    DB_READ_POOL_SIZE: int = 10
+    DB_READ_MAX_OVERFLOW: int = 10
+    # dopo una scrittura, per questi secondi il client legge dal primario
+    # (cookie impostato sulla risposta; 0 = disattivato)
+    READ_AFTER_WRITE_PIN_S: int = 5
+
+    # Job asincroni dei bulk upload
+    JOB_WORKERS: int = 2
+    JOB_QUEUE_SIZE: int = 100
+    # cartella dove salvare i CSV in attesa (default: temp di sistema)
+    JOB_SPOOL_DIR: str | None = None
+
+    # Password hashing
+    BCRYPT_ROUNDS: int = 12
+    # thread per hash/verify bcrypt nelle richieste (0 = numero di CPU)
+    PASSWORD_HASH_POOL_SIZE: int = 0
+
+    # Bulk upload (modalità pipeline)
+    BULK_BATCH_SIZE: int = 500
+    GEOCODE_CONCURRENCY: int = 5
+    # processi per l'hashing bcrypt nei bulk upload (0 = numero di CPU)
+    HASH_PROCESS_POOL_SIZE: int = 0
+
+    # Export in streaming: righe lette per ogni FETCH dal cursore lato server
+    EXPORT_CHUNK_SIZE: int = 2000
+    # X-Export-Watermark = ora del primario meno questo margine: deve superare
+    # la transazione di scrittura più lunga (bulk con geocoding) più il ritardo
+    # della replica. Gli export incrementali si sovrappongono di tanto: il
+    # client deduplica per id tenendo l'updated_at più recente
+    EXPORT_WATERMARK_OVERLAP_S: float = 900.0
+
+    # Cache geocoding: LRU in memoria davanti alla tabella geocode_cache
+    GEOCODE_CACHE_SIZE: int = 10000
+    GEOCODE_CACHE_TTL_S: int = 24 * 3600
+    GEOCODE_CACHE_DB_TTL_DAYS: int = 180
+
+    # Cache token -> utente delle richieste autenticate
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL_S: int = 30
+
+    # Geocoder: "nominatim" (pubblico o self-hosted via GEOCODER_URL) oppure "fake"
+    GEOCODER_BACKEND: str = "nominatim"
+    GEOCODER_URL: str = "https://nominatim.openstreetmap.org"
+    GEOCODER_USER_AGENT: str = "HelpProApp/1.0 (+https://your.domain)"
+    GEOCODER_RATE_PER_S: float = 1.0      # 0 = nessun limite
+    GEOCODER_BURST: int = 1
+    GEOCODER_MAX_RETRIES: int = 3
+    GEOCODER_BACKOFF_S: float = 1.0
+    GEOCODER_TIMEOUT_S: float = 15.0      # budget per tentativo, attese del rate limit escluse
+    GEOCODER_REQUEST_TIMEOUT_S: float = 10.0
+    GEOCODER_MAX_CONNECTIONS: int = 10
+    GEOCODER_FAKE_LATENCY_S: float = 0.0
+
+    # Indice spaziale in memoria per /vendors/search e /vendors/nearest
+    SPATIAL_INDEX_ENABLED: bool = False
+    SPATIAL_INDEX_CELL_DEG: float = 0.05
+    # età massima dell'indice prima di tornare al DB (ricaricato ogni metà)
+    SPATIAL_INDEX_MAX_STALENESS_S: int = 300
+
+    # Precisioni geohash dei conteggi per cella (vendor_cell_counts):
+    # cambiarle richiede di ricostruire la tabella
+    GEO_CELL_PRECISIONS: list[int] = [4, 5, 6]
+
+    # Cluster della mappa (/vendors/clusters)
+    # da questo zoom in su si restituiscono i singoli vendor
+    CLUSTER_MAX_ZOOM: int = 15
+    # celle di aggregazione per lato di una tile 256px allo zoom richiesto
+    CLUSTER_CELLS_PER_TILE: int = 8
+    # massimo di celle (e quindi di cluster) per risposta: la griglia si allarga
+    CLUSTER_MAX_CELLS: int = 2500
+    # massimo di vendor singoli; oltre si risponde comunque con i cluster
+    CLUSTER_MAX_POINTS: int = 500
+
+    # Cache delle ricerche per raggio (/vendors/search)
+    SEARCH_CACHE_ENABLED: bool = True
+    SEARCH_CACHE_CELL_DEG: float = 0.01
+    SEARCH_CACHE_RADIUS_BUCKETS_KM: list[float] = [1, 2, 5, 10, 25, 50]
+    SEARCH_CACHE_TTL_S: int = 60
+    SEARCH_CACHE_SIZE: int = 5000
+    # oltre questo numero di candidati la zona non viene messa in cache
+    SEARCH_CACHE_MAX_ITEMS: int = 2000
+    # candidati in cache in totale per worker: limita la memoria, che il
+    # solo numero di voci non basta a contenere
+    SEARCH_CACHE_MAX_ROWS: int = 200000
+    # backend condiviso tra worker: redis://... oppure memory:// (test)
+    SHARED_CACHE_URL: str | None = None
+
+    # Vector tile dei vendor (/vendors/tiles/{z}/{x}/{y}.mvt)
+    TILE_CACHE_ENABLED: bool = True
+    TILE_CACHE_TTL_S: int = 600
+    # TTL senza SHARED_CACHE_URL: l'invalidazione raggiunge solo il worker
+    # che scrive, gli altri servono la tile vecchia fino alla scadenza.
+    # Con più worker configurare SHARED_CACHE_URL
+    TILE_CACHE_LOCAL_TTL_S: int = 30
+    TILE_CACHE_SIZE: int = 2000
+    # zoom massimo in cache: più in alto le tile si generano a ogni richiesta
+    # e una scrittura non ha contatori di versione da incrementare
+    TILE_CACHE_MAX_ZOOM: int = 16
+    # vendor al massimo per tile (ordinati per id)
+    TILE_MAX_FEATURES: int = 20000
+    # max-age dell'header Cache-Control delle tile
+    TILE_HTTP_MAX_AGE_S: int = 60
+
+    # Rate limit di login e signup (richieste al minuto, burst; 0 = nessun limite)
+    LOGIN_RATE_PER_IP_PER_MIN: float = 30
+    LOGIN_BURST_PER_IP: int = 10
+    LOGIN_RATE_PER_EMAIL_PER_MIN: float = 10
+    LOGIN_BURST_PER_EMAIL: int = 5
+    SIGNUP_RATE_PER_IP_PER_MIN: float = 10
+    SIGNUP_BURST_PER_IP: int = 5
+    # chiavi (IP/email) tenute in memoria per limiter
+    RATE_LIMIT_MAX_KEYS: int = 100000
+    # backend condiviso dei limiti (redis://... o memory://); assente = per worker
+    RATE_LIMIT_URL: str | None = None
+    # proxy fidati davanti all'app: l'IP del client è la voce di X-Forwarded-For
+    # in questa posizione da destra (1 = aggiunta dall'ultimo proxy).
+    # 0 = X-Forwarded-For ignorato, vale l'IP della connessione
+    TRUSTED_PROXY_HOPS: int = 0
+
+    # Compressione delle risposte (gzip, brotli se installato)
+    COMPRESSION_ENABLED: bool = True
+    # sotto questa dimensione le risposte non vengono compresse
+    COMPRESSION_MIN_SIZE: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+
     class Config:
         env_file = ".env"
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
@@ -1,20 +1,31 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import AsyncIterator, Iterable, Protocol
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import Session
-from geoalchemy2.functions import ST_DWithin
 import sqlalchemy as sa
 from sqlalchemy import func
-from geoalchemy2.shape import from_shape
-from geoalchemy2.types import Geography
-from shapely.geometry import Point
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from passlib.context import CryptContext
 from app import models, schemas
-from app.utils.geocode import geocode_address
+from app.utils.geocode import geocode_address, normalize_address_key
 from app.models import Vendor
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.utils import geohash, metrics, search_cache, spatial_index, tile_cache, user_cache
 
 
  
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
 
 
 # ——— Utility password —————————————————————————————
@@ -25,13 +36,85 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+# executor limitato per hash/verify nelle richieste: bcrypt rilascia il GIL,
+# quindi i thread lavorano in parallelo senza bloccare l'event loop
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_POOL_SIZE or os.cpu_count(),
+    thread_name_prefix="bcrypt"
+)
+hash_queue_wait = metrics.histogram(
+    "password_hash_queue_wait_seconds",
+    "Attesa in coda prima che un thread esegua hash/verify bcrypt",
+    labelnames=("op",)
+)
+
+hash_duration = metrics.histogram(
+    "password_hash_duration_seconds",
+    "Durata di hash/verify bcrypt nel thread",
+    labelnames=("op",)
+)
+
+def _run_timed(op: str, submitted: float, fn, *args):
+    start = time.perf_counter()
+    hash_queue_wait.labels(op=op).observe(start - submitted)
+    try:
+        return fn(*args)
+    finally:
+        hash_duration.labels(op=op).observe(time.perf_counter() - start)
+
+async def get_password_hash_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _hash_executor, _run_timed, "hash", time.perf_counter(), get_password_hash, password
+    )
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _hash_executor, _run_timed, "verify", time.perf_counter(),
+        verify_password, plain_password, hashed_password
+    )
+
+def shutdown_hash_executor() -> None:
+    _hash_executor.shutdown(wait=False, cancel_futures=True)
+
+
+# pool di processi per l'hashing nei bulk upload (creato alla prima richiesta).
+# "spawn": i figli partono da un interprete pulito, senza ereditare l'event
+# loop, l'engine e le connessioni aperte del processo che li crea
+_hash_process_pool: ProcessPoolExecutor | None = None
+
+def get_hash_process_pool() -> ProcessPoolExecutor:
+    global _hash_process_pool
+    if _hash_process_pool is None:
+        _hash_process_pool = ProcessPoolExecutor(
+            max_workers=settings.HASH_PROCESS_POOL_SIZE or None,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _hash_process_pool
+
+def shutdown_hash_process_pool() -> None:
+    global _hash_process_pool
+    if _hash_process_pool is not None:
+        _hash_process_pool.shutdown(wait=False, cancel_futures=True)
+        _hash_process_pool = None
+
+async def hash_passwords_parallel(passwords: list[str]) -> list[str]:
+    """Calcola gli hash bcrypt sui processi del pool senza bloccare l'event loop."""
+    loop = asyncio.get_running_loop()
+    pool = get_hash_process_pool()
+    return await asyncio.gather(
+        *(loop.run_in_executor(pool, get_password_hash, pw) for pw in passwords)
+    )
+
+
 # ——— CRUD Clienti (Users) ——————————————————————————
 async def get_user_by_email(db: AsyncSession, email: str):
     result = await db.execute(select(models.User).filter(models.User.email == email))
     return result.scalars().first()
 
 async def create_user(db: AsyncSession, user: schemas.UserCreate):
-    hashed_pw = get_password_hash(user.password)
+    hashed_pw = await get_password_hash_async(user.password)
     db_user = models.User(
         email=user.email,
         full_name=user.full_name,
@@ -39,6 +122,7 @@ async def create_user(db: AsyncSession, user: schemas.UserCreate):
     )
     db.add(db_user)
     await db.commit()
+    await user_cache.invalidate(db_user.email)
     await db.refresh(db_user)
     return db_user
 
@@ -48,7 +132,7 @@ async def get_vendor_account_by_email(db: AsyncSession, email: str):
     return result.scalars().first()
 
 async def create_vendor_account(db: AsyncSession, account: schemas.VendorAccountCreate):
-    hashed_pw = get_password_hash(account.password)
+    hashed_pw = await get_password_hash_async(account.password)
     db_account = models.VendorAccount(
         email=account.email,
         hashed_password=hashed_pw
@@ -58,7 +142,207 @@ async def create_vendor_account(db: AsyncSession, account: schemas.VendorAccount
     await db.refresh(db_account)
     return db_account
 
+
+class BatchCallback(Protocol):
+    """
+    Callback dei bulk upload a fine blocco: creati come (riga, id), errori
+    come (riga, messaggio) e, nel re-import upsert, il numero di righe
+    invariate saltate.
+    """
+
+    async def __call__(
+        self,
+        created: list[tuple[int, int]],
+        errors: list[tuple[int, str]],
+        *,
+        skipped: int = 0,
+    ) -> None: ...
+
+
+async def get_existing_vendor_account_emails(db: AsyncSession, emails: list[str]) -> set[str]:
+    """Ritorna, con una sola query, le email già registrate tra quelle date."""
+    if not emails:
+        return set()
+    result = await db.execute(
+        select(models.VendorAccount.email).where(models.VendorAccount.email.in_(emails))
+    )
+    return set(result.scalars().all())
+
+
+async def bulk_create_vendor_accounts(
+    db: AsyncSession,
+    batches: Iterable[list[tuple[int, dict]]],
+    on_batch: BatchCallback | None = None,
+) -> tuple[list[schemas.VendorAccountOut], list[str]]:
+    """
+    Creazione in blocco degli account vendor: per ogni blocco valida le righe,
+    scarta le email duplicate (nel file e già a DB, con una sola query),
+    calcola gli hash sul pool di processi e inserisce con una INSERT multi-riga.
+    Con `on_batch` gli esiti per riga di ogni blocco vanno solo al callback
+    e le liste ritornate restano vuote (memoria costante sui file grandi).
+    """
+    created: list[schemas.VendorAccountOut] = []
+    errors: list[str] = []
+    seen: set[str] = set()
+
+    for batch in batches:
+        batch_errors: list[tuple[int, str]] = []
+        batch_created: list[tuple[int, int]] = []
+
+        # 1) validazione e duplicati nel file
+        parsed: list[tuple[int, schemas.VendorAccountCreate]] = []
+        for idx, row in batch:
+            try:
+                acc_in = schemas.VendorAccountCreate(
+                    email=row["email"],
+                    password=row["password"]
+                )
+            except Exception as e:
+                batch_errors.append((idx, str(e)))
+                continue
+            if acc_in.email in seen:
+                batch_errors.append((idx, f"email {acc_in.email} duplicata nel file"))
+                continue
+            seen.add(acc_in.email)
+            parsed.append((idx, acc_in))
+
+        # 2) email già registrate
+        existing = await get_existing_vendor_account_emails(db, [a.email for _, a in parsed])
+        valid = []
+        for idx, acc_in in parsed:
+            if acc_in.email in existing:
+                batch_errors.append((idx, f"email {acc_in.email} già registrata"))
+            else:
+                valid.append((idx, acc_in))
+
+        # 3) hashing parallelo e INSERT batch
+        if valid:
+            hashes = await hash_passwords_parallel([a.password for _, a in valid])
+            stmt = (
+                sa.insert(models.VendorAccount)
+                .values([
+                    {"email": acc_in.email, "hashed_password": hashed}
+                    for (_, acc_in), hashed in zip(valid, hashes)
+                ])
+                .returning(models.VendorAccount.id, models.VendorAccount.email)
+            )
+            try:
+                result = await db.execute(stmt)
+                rows = result.all()
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                batch_errors.extend((idx, str(e)) for idx, _ in valid)
+            else:
+                if on_batch is None:
+                    created.extend(schemas.VendorAccountOut(id=acc_id, email=email) for acc_id, email in rows)
+                idx_by_email = {acc_in.email: idx for idx, acc_in in valid}
+                batch_created = [(idx_by_email[email], acc_id) for acc_id, email in rows]
+
+        if on_batch is not None:
+            await on_batch(batch_created, sorted(batch_errors))
+        else:
+            errors.extend(f"Riga {idx}: {msg}" for idx, msg in sorted(batch_errors))
+
+    return created, errors
+
 # ——— CRUD Vendor Profile ——————————————————————————
+async def _on_vendors_written(vendors: list[dict], previous_points: list[tuple[float, float]] = ()) -> None:
+    """
+    Aggiorna read model e cache dopo una scrittura di vendor.
+    `previous_points` sono le posizioni precedenti dei vendor aggiornati:
+    anche le cache di quelle zone vanno invalidate.
+    """
+    spatial_index.on_vendors_written(vendors)
+    points = [(v["latitude"], v["longitude"]) for v in vendors] + list(previous_points)
+    await search_cache.invalidate_points(points)
+    await tile_cache.invalidate_points(points)
+
+
+# ——— Conteggi per cella geohash ——————————————————————————
+def _cell_count_deltas(changes: Iterable[tuple[str | None, str, int]]) -> list[dict]:
+    """Variazioni (geohash, categoria, +1/-1) sommate per (precisione, cella, categoria)."""
+    deltas: dict[tuple[int, str, str], int] = {}
+    for gh, category, sign in changes:
+        if gh is None:
+            # vendor senza location: non è in nessuna cella
+            continue
+        category = getattr(category, "value", category)
+        for precision in settings.GEO_CELL_PRECISIONS:
+            key = (precision, gh[:precision], category)
+            deltas[key] = deltas.get(key, 0) + sign
+    # ordine fisso: transazioni concorrenti bloccano le righe nello stesso ordine
+    return [
+        {"precision": p, "cell": cell, "category": category, "count": n}
+        for (p, cell, category), n in sorted(deltas.items())
+        if n
+    ]
+
+
+async def apply_cell_counts(db: AsyncSession, changes: Iterable[tuple[str | None, str, int]]) -> None:
+    """Aggiorna vendor_cell_counts nella transazione corrente, senza commit."""
+    rows = _cell_count_deltas(changes)
+    if not rows:
+        return
+    stmt = pg_insert(models.VendorCellCount).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[
+            models.VendorCellCount.precision,
+            models.VendorCellCount.cell,
+            models.VendorCellCount.category,
+        ],
+        set_={"count": models.VendorCellCount.count + stmt.excluded.count},
+    )
+    await db.execute(stmt)
+
+
+async def get_cell_counts(
+    db: AsyncSession,
+    precision: int,
+    cells: list[str],
+    category: models.CategoryEnum | None = None,
+) -> dict[str, int]:
+    """Vendor per categoria nelle celle indicate, letti da vendor_cell_counts."""
+    stmt = (
+        select(models.VendorCellCount.category, func.sum(models.VendorCellCount.count))
+        .where(
+            models.VendorCellCount.precision == precision,
+            models.VendorCellCount.cell.in_(cells),
+        )
+        .group_by(models.VendorCellCount.category)
+    )
+    if category is not None:
+        stmt = stmt.where(models.VendorCellCount.category == category)
+    result = await db.execute(stmt)
+    return {c.value: int(n) for c, n in result.all() if n > 0}
+
+
+def vendor_hashes(vendor: dict) -> dict[str, str]:
+    """
+    address_hash e content_hash dei campi importati di un vendor.
+    address_hash cambia solo se cambia l'indirizzo normalizzato (serve un
+    nuovo geocoding); content_hash cambia con qualunque campo. Stessa formula
+    del backfill nella migrazione 7e2f5c8a1d94.
+    """
+    address_key = normalize_address_key(
+        vendor["country"], vendor["city"], vendor["postcode"], vendor["address"]
+    )
+    category = getattr(vendor["category"], "value", vendor["category"])
+    content = "\x1f".join((
+        vendor["company_name"], category, vendor["country"],
+        vendor["city"], vendor["postcode"], vendor["address"],
+    ))
+    return {
+        "address_hash": hashlib.md5(address_key.encode("utf-8")).hexdigest(),
+        "content_hash": hashlib.md5(content.encode("utf-8")).hexdigest(),
+    }
+
+
+def make_point(lat: float, lon: float):
+    """POINT PostGIS (SRID 4326) costruito in SQL, senza shapely/WKB lato Python."""
+    return func.ST_SetSRID(func.ST_MakePoint(lon, lat), 4326)
+
+
 async def create_vendor_profile(db: AsyncSession, vendor: schemas.VendorCreate, account_id: int):
     # 1) geocoding dell'indirizzo (assumi che geocode_address ritorni lat, lon)
     lat, lon = await geocode_address(
@@ -68,7 +352,7 @@ async def create_vendor_profile(db: AsyncSession, vendor: schemas.VendorCreate,
         address=vendor.address
     )
     # 2) costruisci il POINT PostGIS
-    point = from_shape(Point(lon, lat), srid=4326)
+    point = make_point(lat, lon)
 
     # 3) crea il record vendor con location
     db_vendor = models.Vendor(
@@ -79,14 +363,296 @@ async def create_vendor_profile(db: AsyncSession, vendor: schemas.VendorCreate,
         city=vendor.city,
         postcode=vendor.postcode,
         address=vendor.address,
-        location=point
+        location=point,
+        geohash=geohash.encode(lat, lon),
+        **vendor_hashes(vendor.dict())
     )
     db.add(db_vendor)
+    await apply_cell_counts(db, [(db_vendor.geohash, vendor.category, 1)])
     await db.commit()
     await db.refresh(db_vendor)
+    await _on_vendors_written([{
+        "id": db_vendor.id,
+        "account_id": account_id,
+        **vendor.dict(),
+        "latitude": lat,
+        "longitude": lon,
+    }])
     return db_vendor
 
 
+# ——— Bulk upload Vendor (pipeline) ————————————————————
+async def get_vendor_accounts_status(db: AsyncSession, account_ids: list[int]) -> dict[int, bool]:
+    """
+    Con una sola query ritorna {account_id: ha_già_un_profilo} per gli
+    account esistenti; gli id assenti dal dict non esistono.
+    """
+    if not account_ids:
+        return {}
+    stmt = (
+        select(models.VendorAccount.id, models.Vendor.id)
+        .outerjoin(models.Vendor, models.Vendor.account_id == models.VendorAccount.id)
+        .where(models.VendorAccount.id.in_(account_ids))
+    )
+    result = await db.execute(stmt)
+    return {acc_id: vendor_id is not None for acc_id, vendor_id in result.all()}
+
+
+async def bulk_insert_vendors(db: AsyncSession, rows: list[dict]) -> list[schemas.VendorOut]:
+    """
+    Inserisce i vendor con un'unica INSERT multi-riga e un solo commit.
+    Ogni riga contiene i campi di VendorCreate più account_id, latitude, longitude.
+    """
+    stmt = (
+        sa.insert(models.Vendor)
+        .values([
+            {
+                "account_id": r["account_id"],
+                "company_name": r["company_name"],
+                "category": r["category"],
+                "country": r["country"],
+                "city": r["city"],
+                "postcode": r["postcode"],
+                "address": r["address"],
+                "location": make_point(r["latitude"], r["longitude"]),
+                "geohash": geohash.encode(r["latitude"], r["longitude"]),
+                **vendor_hashes(r),
+            }
+            for r in rows
+        ])
+        .returning(models.Vendor.id, models.Vendor.account_id, models.Vendor.geohash, models.Vendor.category)
+    )
+    result = await db.execute(stmt)
+    inserted = result.all()
+    ids = {account_id: vendor_id for vendor_id, account_id, _, _ in inserted}
+    # contatori per cella nella stessa transazione dell'INSERT
+    await apply_cell_counts(db, [(gh, category, 1) for _, _, gh, category in inserted])
+    await db.commit()
+    created = [schemas.VendorOut(id=ids[r["account_id"]], **r) for r in rows]
+    await _on_vendors_written([v.dict() for v in created])
+    return created
+
+
+async def get_vendor_import_state(db: AsyncSession, account_ids: list[int]) -> dict[int, dict | None]:
+    """
+    Per i re-import: {account_id: profilo attuale o None se l'account non ne
+    ha}, con hash, categoria, geohash e coordinate. Gli account inesistenti
+    non compaiono nel dict.
+    """
+    if not account_ids:
+        return {}
+    stmt = (
+        select(
+            models.VendorAccount.id.label("account_id"),
+            models.Vendor.id,
+            models.Vendor.category,
+            models.Vendor.geohash,
+            models.Vendor.address_hash,
+            models.Vendor.content_hash,
+            func.ST_Y(models.Vendor.location).label("latitude"),
+            func.ST_X(models.Vendor.location).label("longitude"),
+        )
+        .outerjoin(models.Vendor, models.Vendor.account_id == models.VendorAccount.id)
+        .where(models.VendorAccount.id.in_(account_ids))
+    )
+    result = await db.execute(stmt)
+    return {row["account_id"]: (dict(row) if row["id"] is not None else None) for row in result.mappings()}
+
+
+async def upsert_vendors(
+    db: AsyncSession,
+    rows: list[dict],
+    previous: dict[int, dict | None],
+) -> list[schemas.VendorOut]:
+    """
+    INSERT ... ON CONFLICT (account_id) DO UPDATE dei vendor, con un solo
+    commit. `previous` è lo stato letto da get_vendor_import_state e serve
+    ad aggiornare i conteggi per cella di chi cambia posizione o categoria.
+    """
+    values = [
+        {
+            "account_id": r["account_id"],
+            "company_name": r["company_name"],
+            "category": r["category"],
+            "country": r["country"],
+            "city": r["city"],
+            "postcode": r["postcode"],
+            "address": r["address"],
+            "location": make_point(r["latitude"], r["longitude"]),
+            "geohash": geohash.encode(r["latitude"], r["longitude"]),
+            **vendor_hashes(r),
+        }
+        for r in rows
+    ]
+    stmt = pg_insert(models.Vendor).values(values)
+    stmt = (
+        stmt.on_conflict_do_update(
+            index_elements=[models.Vendor.account_id],
+            set_={
+                **{
+                    c: stmt.excluded[c]
+                    for c in ("company_name", "category", "country", "city", "postcode", "address",
+                              "location", "geohash", "address_hash", "content_hash")
+                },
+                "updated_at": func.now(),
+            },
+        )
+        .returning(models.Vendor.id, models.Vendor.account_id)
+    )
+    result = await db.execute(stmt)
+    ids = {account_id: vendor_id for vendor_id, account_id in result.all()}
+
+    changes = []
+    previous_points = []
+    for v in values:
+        old = previous.get(v["account_id"])
+        if old is not None:
+            changes.append((old["geohash"], old["category"], -1))
+            previous_points.append((old["latitude"], old["longitude"]))
+        changes.append((v["geohash"], v["category"], 1))
+    await apply_cell_counts(db, changes)
+    await db.commit()
+
+    written = [schemas.VendorOut(id=ids[r["account_id"]], **r) for r in rows]
+    await _on_vendors_written([v.dict() for v in written], previous_points)
+    return written
+
+
+async def bulk_create_vendor_profiles(
+    db: AsyncSession,
+    batches: Iterable[list[tuple[int, dict]]],
+    concurrency: int | None = None,
+    on_batch: BatchCallback | None = None,
+    upsert: bool = False,
+) -> tuple[list[schemas.VendorOut], list[str], int]:
+    """
+    Pipeline di creazione vendor da righe CSV già suddivise in blocchi.
+    Per ogni blocco: validazione, un'unica query sugli account_id,
+    geocoding concorrente (max `concurrency` richieste) e INSERT batch.
+    Gli errori sono riportati per riga come nel caricamento riga per riga.
+    Con `on_batch` gli esiti per riga di ogni blocco vanno solo al callback
+    e le liste ritornate restano vuote (memoria costante sui file grandi).
+
+    Con `upsert` il file è un re-import completo: le righe con content_hash
+    invariato sono saltate (e contate), quelle con lo stesso indirizzo
+    riusano le coordinate salvate, solo le altre vengono geocodificate;
+    la scrittura è un INSERT ... ON CONFLICT (account_id) DO UPDATE.
+    Ritorna (creati/aggiornati, errori, righe saltate).
+    """
+    sem = asyncio.Semaphore(concurrency or settings.GEOCODE_CONCURRENCY)
+    created: list[schemas.VendorOut] = []
+    errors: list[str] = []
+    skipped = 0
+    seen: set[int] = set()
+
+    async def _geocode(vin: schemas.VendorCreate) -> tuple[float, float]:
+        async with sem:
+            return await geocode_address(
+                country=vin.country,
+                city=vin.city,
+                postcode=vin.postcode,
+                address=vin.address
+            )
+
+    for batch in batches:
+        batch_errors: list[tuple[int, str]] = []
+        batch_created: list[tuple[int, int]] = []
+        batch_skipped = 0
+
+        # 1) validazione delle righe
+        parsed: list[tuple[int, int, schemas.VendorCreate]] = []
+        for idx, row in batch:
+            try:
+                account_id = int(row["account_id"])
+                vin = schemas.VendorCreate(
+                    company_name=row["company_name"],
+                    category=row["category"],
+                    country=row["country"],
+                    city=row["city"],
+                    postcode=row["postcode"],
+                    address=row["address"]
+                )
+            except Exception as e:
+                batch_errors.append((idx, str(e)))
+                continue
+            if account_id in seen:
+                batch_errors.append((idx, f"account_id {account_id} duplicato nel file"))
+                continue
+            seen.add(account_id)
+            parsed.append((idx, account_id, vin))
+
+        # 2) verifica account (e, in upsert, profilo attuale) con una sola query
+        account_ids = [p[1] for p in parsed]
+        if upsert:
+            state = await get_vendor_import_state(db, account_ids)
+        else:
+            state = await get_vendor_accounts_status(db, account_ids)
+        # coordinate già note (indirizzo invariato) oppure None = da geocodificare
+        valid: list[tuple[int, int, schemas.VendorCreate, tuple[float, float] | None]] = []
+        for idx, account_id, vin in parsed:
+            if account_id not in state:
+                batch_errors.append((idx, f"account_id {account_id} non trovato"))
+            elif upsert:
+                current = state[account_id]
+                hashes = vendor_hashes(vin.dict())
+                if current is None:
+                    valid.append((idx, account_id, vin, None))
+                elif current["content_hash"] == hashes["content_hash"]:
+                    batch_skipped += 1
+                elif current["address_hash"] == hashes["address_hash"]:
+                    valid.append((idx, account_id, vin, (current["latitude"], current["longitude"])))
+                else:
+                    valid.append((idx, account_id, vin, None))
+            elif state[account_id]:
+                batch_errors.append((idx, f"account_id {account_id} ha già un profilo vendor"))
+            else:
+                valid.append((idx, account_id, vin, None))
+
+        # 3) geocoding concorrente, solo degli indirizzi nuovi o cambiati
+        geocoded = iter(await asyncio.gather(
+            *(_geocode(vin) for _, _, vin, coords in valid if coords is None),
+            return_exceptions=True
+        ))
+        rows: list[dict] = []
+        row_ids: list[int] = []
+        for idx, account_id, vin, coords in valid:
+            res = coords if coords is not None else next(geocoded)
+            if isinstance(res, Exception):
+                batch_errors.append((idx, str(res)))
+                continue
+            lat, lon = res
+            rows.append({
+                "account_id": account_id,
+                **vin.dict(),
+                "latitude": lat,
+                "longitude": lon,
+            })
+            row_ids.append(idx)
+
+        # 4) scrittura batch
+        if rows:
+            try:
+                if upsert:
+                    inserted = await upsert_vendors(db, rows, state)
+                else:
+                    inserted = await bulk_insert_vendors(db, rows)
+            except Exception as e:
+                await db.rollback()
+                batch_errors.extend((idx, str(e)) for idx in row_ids)
+            else:
+                if on_batch is None:
+                    created.extend(inserted)
+                batch_created = [(idx, v.id) for idx, v in zip(row_ids, inserted)]
+
+        skipped += batch_skipped
+        if on_batch is not None:
+            await on_batch(batch_created, sorted(batch_errors), skipped=batch_skipped)
+        else:
+            errors.extend(f"Riga {idx}: {msg}" for idx, msg in sorted(batch_errors))
+
+    return created, errors, skipped
+
+
 async def get_vendor_profile_by_account_id(db: AsyncSession, account_id: int):
     result = await db.execute(select(models.Vendor).filter(models.Vendor.account_id == account_id))
     return result.scalars().first()
@@ -111,37 +677,359 @@ async def search_vendors(
     result = await db.execute(stmt)
     return result.scalars().all()
 
+# colonne di VendorOut lette direttamente, con lat/lon calcolate in SQL:
+# niente oggetti ORM né parsing WKB per riga
+VENDOR_OUT_COLUMNS = (
+    Vendor.id,
+    Vendor.account_id,
+    Vendor.company_name,
+    Vendor.category,
+    Vendor.country,
+    Vendor.city,
+    Vendor.postcode,
+    Vendor.address,
+    func.ST_Y(Vendor.location).label("latitude"),
+    func.ST_X(Vendor.location).label("longitude"),
+)
+
+
 async def get_vendors_in_radius(
     db: AsyncSession,
     lat: float,
     lon: float,
     radius_km: float,
-) -> list[Vendor]:
+    limit: int | None = None,
+    after_id: int | None = None,
+) -> list[dict]:
+    """
+    Vendor entro `radius_km` dal punto, ordinati per id, come dict con i
+    campi di VendorOut. Paginazione keyset: `after_id` è l'ultimo id della
+    pagina precedente.
+    """
     # converto raggio in metri
     radius_m = radius_km * 1000
 
-    # punto di ricerca in geometry
-    point_geom = func.ST_SetSRID(
-        func.ST_MakePoint(lon, lat),
-        4326
+    # punto di ricerca in Geography
+    point_geog = func.geography(make_point(lat, lon))
+
+    stmt = (
+        select(*VENDOR_OUT_COLUMNS)
+        # geography(location) è la stessa espressione dell'indice
+        # ix_vendors_location_geog, quindi ST_DWithin usa il GiST
+        .where(func.ST_DWithin(func.geography(Vendor.location), point_geog, radius_m))
+        .order_by(Vendor.id)
     )
+    if after_id is not None:
+        stmt = stmt.where(Vendor.id > after_id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
 
-    # lo casto in Geography
-    point_geog = point_geom.cast(Geography)
+    result = await db.execute(stmt)
+    return [dict(row) for row in result.mappings()]
 
-    stmt = (
-        select(Vendor)
-        # scarto quelli senza posizione
-        .where(Vendor.location != None)
-        # castto la colonna geometry in Geography e filtro per distanza
-        .where(
-            func.ST_DWithin(
-                Vendor.location.cast(Geography),
-                point_geog,
-                radius_m
+
+async def get_vendors_in_radius_cached(
+    db: AsyncSession,
+    lat: float,
+    lon: float,
+    radius_km: float,
+    limit: int,
+    after_id: int | None = None,
+    db_is_primary: bool = True,
+) -> list[dict]:
+    """
+    Come get_vendors_in_radius, passando dalla cache per cella/raggio:
+    le ricerche vicine riusano gli stessi candidati senza andare a DB.
+
+    Se `db` è la replica la cache si riempie dal primario: le versioni
+    lette in prepare() sono quelle correnti, e candidati di una replica
+    in ritardo resterebbero in cache come validi fino alla prossima scrittura.
+    """
+    cache = search_cache.get_cache()
+    cache_key = cache.key_for(lat, lon, radius_km) if cache is not None else None
+    if cache_key is None:
+        search_cache.search_cache_requests.labels(result="bypass").inc()
+        return await get_vendors_in_radius(db, lat, lon, radius_km, limit=limit, after_id=after_id)
+
+    key, center_lat, center_lon, candidates_km = cache_key
+    candidates = await cache.get(key)
+    if candidates is search_cache.TOO_DENSE:
+        search_cache.search_cache_requests.labels(result="bypass").inc()
+        return await get_vendors_in_radius(db, lat, lon, radius_km, limit=limit, after_id=after_id)
+    if candidates is not None:
+        search_cache.search_cache_requests.labels(result="hit").inc()
+        return search_cache.filter_candidates(candidates, lat, lon, radius_km, limit, after_id)
+
+    tiles, versions = await cache.prepare(center_lat, center_lon, candidates_km)
+    max_items = settings.SEARCH_CACHE_MAX_ITEMS
+    if db_is_primary:
+        candidates = await get_vendors_in_radius(db, center_lat, center_lon, candidates_km, limit=max_items + 1)
+    else:
+        async with AsyncSessionLocal() as primary:
+            candidates = await get_vendors_in_radius(
+                primary, center_lat, center_lon, candidates_km, limit=max_items + 1
             )
+    if len(candidates) > max_items:
+        # zona troppo densa per la cache: lo si ricorda per il TTL, così le
+        # prossime ricerche non rileggono i candidati solo per scartarli
+        search_cache.search_cache_requests.labels(result="bypass").inc()
+        await cache.store_dense(key)
+        return await get_vendors_in_radius(db, lat, lon, radius_km, limit=limit, after_id=after_id)
+    search_cache.search_cache_requests.labels(result="miss").inc()
+    await cache.store(key, tiles, versions, candidates)
+    return search_cache.filter_candidates(candidates, lat, lon, radius_km, limit, after_id)
+
+
+async def get_nearest_vendors(
+    db: AsyncSession,
+    lat: float,
+    lon: float,
+    k: int,
+    category: models.CategoryEnum | None = None,
+    max_radius_km: float | None = None,
+) -> list[dict]:
+    """
+    I `k` vendor più vicini al punto, come dict con i campi di VendorOut
+    più distance_m. L'ordinamento KNN (<->) su geography(location) percorre
+    l'indice GiST ix_vendors_location_geog invece di ordinare tutte le righe.
+    """
+    point_geog = func.geography(make_point(lat, lon))
+    location_geog = func.geography(Vendor.location)
+
+    stmt = (
+        select(*VENDOR_OUT_COLUMNS, func.ST_Distance(location_geog, point_geog).label("distance_m"))
+        .order_by(location_geog.op("<->")(point_geog))
+        .limit(k)
+    )
+    if category is not None:
+        stmt = stmt.where(Vendor.category == category)
+    if max_radius_km is not None:
+        stmt = stmt.where(func.ST_DWithin(location_geog, point_geog, max_radius_km * 1000))
+
+    result = await db.execute(stmt)
+    return [dict(row) for row in result.mappings()]
+
+
+# ——— Cluster per la mappa ——————————————————————————————
+def _bbox_filter(bbox: tuple[float, float, float, float]):
+    # && sulla geometria usa l'indice GiST di vendors.location
+    return Vendor.location.op("&&")(func.ST_MakeEnvelope(*bbox, 4326))
+
+
+async def get_vendors_in_bbox(
+    db: AsyncSession,
+    bbox: tuple[float, float, float, float],
+    limit: int,
+) -> list[dict]:
+    """Vendor nel rettangolo (min_lon, min_lat, max_lon, max_lat), per id."""
+    stmt = select(*VENDOR_OUT_COLUMNS).where(_bbox_filter(bbox)).order_by(Vendor.id).limit(limit)
+    result = await db.execute(stmt)
+    return [dict(row) for row in result.mappings()]
+
+
+async def get_vendor_clusters(
+    db: AsyncSession,
+    bbox: tuple[float, float, float, float],
+    grid_deg: float,
+) -> list[dict]:
+    """
+    Vendor nel rettangolo aggregati per cella di `grid_deg` gradi:
+    baricentro, totale e conteggi per categoria, calcolati in SQL.
+    """
+    lat, lon = func.ST_Y(Vendor.location), func.ST_X(Vendor.location)
+    cy, cx = func.floor(lat / grid_deg), func.floor(lon / grid_deg)
+    stmt = (
+        select(
+            func.avg(lat).label("latitude"),
+            func.avg(lon).label("longitude"),
+            func.count().label("count"),
+            *(
+                func.count().filter(Vendor.category == c).label(c.value)
+                for c in models.CategoryEnum
+            ),
+        )
+        .where(_bbox_filter(bbox))
+        .group_by(cy, cx)
+    )
+    result = await db.execute(stmt)
+    return [
+        {
+            "latitude": row["latitude"],
+            "longitude": row["longitude"],
+            "count": row["count"],
+            "categories": {c.value: row[c.value] for c in models.CategoryEnum if row[c.value]},
+        }
+        for row in result.mappings()
+    ]
+
+
+# ——— Vector tile ———————————————————————————————————————
+MVT_EXTENT = 4096
+MVT_BUFFER = 64
+
+
+async def get_vendor_tile(db: AsyncSession, z: int, x: int, y: int) -> bytes:
+    """
+    Tile Mapbox Vector Tile (layer "vendors", proprietà id e category)
+    generata da PostGIS con ST_AsMVTGeom/ST_AsMVT.
+    """
+    bounds = func.ST_TileEnvelope(z, x, y)
+    features = (
+        select(
+            func.ST_AsMVTGeom(
+                func.ST_Transform(Vendor.location, 3857), bounds, MVT_EXTENT, MVT_BUFFER, True
+            ).label("geom"),
+            Vendor.id,
+            sa.cast(Vendor.category, sa.String).label("category"),
         )
+        # && con l'envelope in 4326 usa l'indice GiST di vendors.location
+        .where(Vendor.location.op("&&")(func.ST_Transform(bounds, 4326)))
+        .order_by(Vendor.id)
+        .limit(settings.TILE_MAX_FEATURES)
+        .subquery("mvt")
     )
+    stmt = select(func.ST_AsMVT(sa.literal_column("mvt"), "vendors", MVT_EXTENT, "geom")).select_from(features)
+    tile = (await db.execute(stmt)).scalar()
+    return bytes(tile) if tile else b""
+
+
+async def get_vendor_tile_cached(db: AsyncSession, z: int, x: int, y: int) -> bytes:
+    cache = tile_cache.get_cache()
+    if cache is None or not cache.cacheable(z):
+        return await get_vendor_tile(db, z, x, y)
+    tile = await cache.get(z, x, y)
+    if tile is not None:
+        tile_cache.tile_cache_requests.labels(result="hit").inc()
+        return tile
+    tile_cache.tile_cache_requests.labels(result="miss").inc()
+    # versione letta prima della query: una scrittura concorrente
+    # renderà la tile subito obsoleta
+    version = await cache.version(z, x, y)
+    tile = await get_vendor_tile(db, z, x, y)
+    await cache.store(z, x, y, version, tile)
+    return tile
+
+
+# ——— Ricerca testuale ————————————————————————————————
+# etichette con cui gli utenti cercano le categorie (oltre al valore inglese)
+CATEGORY_SEARCH_LABELS = {
+    models.CategoryEnum.haircut: ("haircut", "parrucchiere", "barbiere", "capelli"),
+    models.CategoryEnum.beautician: ("beautician", "estetista", "estetica"),
+    models.CategoryEnum.plumber: ("plumber", "idraulico"),
+    models.CategoryEnum.mason: ("mason", "muratore", "edile"),
+}
+
+# stessa espressione dell'indice GIN ix_vendors_search_trgm: i separatori
+# devono restare letterali (non parametri) perché il planner la riconosca.
+# Tra parentesi: `<%` e `||` hanno la stessa precedenza in PostgreSQL, senza
+# raggruppamento `q <% a || ' ' || b` diventerebbe `((q <% a) || ' ') || b`
+_SP = sa.literal_column("' '", sa.String)
+VENDOR_SEARCH_TEXT = (
+    Vendor.company_name + _SP + Vendor.city + _SP + Vendor.postcode + _SP + Vendor.address
+).self_group()
+
+
+# lunghezza minima dell'autocompletamento: un trigramma, il minimo che
+# gli indici GIN gin_trgm_ops possono usare per ILIKE 'abc%'
+PREFIX_MIN_LENGTH = 3
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _split_category_terms(q: str) -> tuple[set[models.CategoryEnum], str]:
+    """
+    Separa dalla query le parole che indicano una categoria. Solo etichette
+    intere: un prefisso ("Este", "Cap") può essere un nome o una città.
+    """
+    categories: set[models.CategoryEnum] = set()
+    rest = []
+    for word in q.split():
+        matched = [
+            cat for cat, labels in CATEGORY_SEARCH_LABELS.items()
+            if word.lower() in labels
+        ]
+        if matched:
+            categories.update(matched)
+        else:
+            rest.append(word)
+    return categories, " ".join(rest)
+
+
+async def text_search_vendors(
+    db: AsyncSession,
+    q: str,
+    limit: int,
+    category: models.CategoryEnum | None = None,
+    prefix: bool = False,
+) -> list[dict]:
+    """
+    Ricerca testuale su nome, città, CAP, indirizzo e categoria.
+    - ranked: le parole che indicano una categoria diventano un filtro, il resto
+      è confrontato con word_similarity (indice trigram) e ordina i risultati
+    - prefix: autocompletamento, nome o città che iniziano con `q`
+    """
+    stmt = select(*VENDOR_OUT_COLUMNS).limit(limit)
+    if category is not None:
+        stmt = stmt.where(Vendor.category == category)
+
+    if prefix:
+        pattern = _escape_like(q.strip()) + "%"
+        return [
+            dict(row) for row in (await db.execute(
+                stmt.where(sa.or_(
+                    Vendor.company_name.ilike(pattern, escape="\\"),
+                    Vendor.city.ilike(pattern, escape="\\"),
+                ))
+                .order_by(Vendor.company_name, Vendor.id)
+            )).mappings()
+        ]
+
+    categories, text = _split_category_terms(q)
+    if categories:
+        stmt = stmt.where(Vendor.category.in_(categories))
+    if text:
+        stmt = (
+            stmt.where(sa.literal(text).op("<%")(VENDOR_SEARCH_TEXT))
+            .order_by(func.word_similarity(text, VENDOR_SEARCH_TEXT).desc(), Vendor.id)
+        )
+    elif categories or category is not None:
+        stmt = stmt.order_by(Vendor.company_name, Vendor.id)
+    else:
+        return []
 
     result = await db.execute(stmt)
-    return result.scalars().all()
\ No newline at end of file
+    return [dict(row) for row in result.mappings()]
+
+
+# ——— Export ——————————————————————————————————————————————
+VENDOR_EXPORT_COLUMNS = (*VENDOR_OUT_COLUMNS, Vendor.updated_at)
+
+
+async def iter_vendors_export(
+    db: AsyncSession,
+    chunk_size: int,
+    category: models.CategoryEnum | None = None,
+    country: str | None = None,
+    bbox: tuple[float, float, float, float] | None = None,
+    updated_since=None,
+) -> AsyncIterator[list[dict]]:
+    """
+    Vendor in ordine di id, a blocchi di `chunk_size` righe letti da un
+    cursore lato server: la memoria usata non dipende dal numero di vendor.
+    `bbox` è (min_lon, min_lat, max_lon, max_lat).
+    """
+    stmt = select(*VENDOR_EXPORT_COLUMNS).order_by(Vendor.id)
+    if category is not None:
+        stmt = stmt.where(Vendor.category == category)
+    if country:
+        stmt = stmt.where(Vendor.country == country)
+    if bbox is not None:
+        stmt = stmt.where(_bbox_filter(bbox))
+    if updated_since is not None:
+        stmt = stmt.where(Vendor.updated_at >= updated_since)
+
+    result = await db.stream(stmt.execution_options(yield_per=chunk_size))
+    async for partition in result.mappings().partitions():
+        yield [dict(row) for row in partition]
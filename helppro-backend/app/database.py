@@ -1,17 +1,250 @@
+import asyncio
+import logging
+import time
+from pathlib import Path
+
+from fastapi import Request
+
+from sqlalchemy import event, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.config import settings
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+db_query_duration = metrics.histogram(
+    "db_query_duration_seconds",
+    "Durata delle query SQL per tipo di statement",
+    labelnames=("statement",),
+)
+db_pool_checkout = metrics.histogram(
+    "db_pool_checkout_seconds",
+    "Attesa per ottenere una connessione dal pool (nuove connessioni incluse)",
+)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Pool che misura il tempo di checkout delle connessioni."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_checkout.observe(time.perf_counter() - start)
+
+
+def _engine_options(
+    url: str,
+    pool_size: int,
+    max_overflow: int,
+    application_name: str = "helppro-backend",
+) -> dict:
+    """Opzioni dell'engine da Settings (pool, cache degli statement, timeout)."""
+    options = {
+        "echo": settings.DB_ECHO,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE_S,
+    }
+    if not url.startswith("sqlite"):
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=settings.DB_POOL_TIMEOUT_S,
+        )
+    if url.startswith("postgresql+asyncpg"):
+        server_settings = {"application_name": application_name}
+        if settings.DB_STATEMENT_TIMEOUT_MS:
+            server_settings["statement_timeout"] = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        options["connect_args"] = {
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "server_settings": server_settings,
+        }
+    return options
+
 
 # Async engine per PostgreSQL
-engine = create_async_engine(settings.DATABASE_URL, echo=True)
+engine = create_async_engine(
+    settings.DATABASE_URL,
+    **_engine_options(settings.DATABASE_URL, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW)
+)
 AsyncSessionLocal = sessionmaker(
     bind=engine,
     class_=AsyncSession,
     expire_on_commit=False
 )
+# replica in sola lettura, con pool proprio; senza DATABASE_READ_URL
+# le sessioni di lettura usano il primario
+read_engine = None
+if settings.DATABASE_READ_URL:
+    read_engine = create_async_engine(
+        settings.DATABASE_READ_URL,
+        **_engine_options(
+            settings.DATABASE_READ_URL,
+            settings.DB_READ_POOL_SIZE,
+            settings.DB_READ_MAX_OVERFLOW,
+            application_name="helppro-backend-read",
+        )
+    )
+AsyncReadSessionLocal = sessionmaker(
+    bind=read_engine or engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+)
 Base = declarative_base()
 
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    db_query_duration.labels(statement=kind).observe(elapsed)
+    if settings.SLOW_QUERY_MS and elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        logger.warning("Query lenta (%.0f ms): %s", elapsed * 1000, statement[:1000])
+
+
+def _handle_error(context):
+    # la query fallita non arriva ad after_cursor_execute
+    conn = context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+
+for _engine in (engine, read_engine):
+    if _engine is not None:
+        event.listen(_engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(_engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(_engine.sync_engine, "handle_error", _handle_error)
+
+
+def _pool_value(eng, name: str) -> float:
+    return getattr(eng.sync_engine.pool, name, lambda: 0)()
+
+
+metrics.gauge("db_pool_size", "Connessioni nel pool", function=lambda: _pool_value(engine, "size"))
+metrics.gauge("db_pool_checked_out", "Connessioni in uso", function=lambda: _pool_value(engine, "checkedout"))
+metrics.gauge("db_pool_overflow", "Connessioni oltre pool_size", function=lambda: _pool_value(engine, "overflow"))
+if read_engine is not None:
+    metrics.gauge(
+        "db_read_pool_checked_out",
+        "Connessioni in uso nel pool della replica",
+        function=lambda: _pool_value(read_engine, "checkedout")
+    )
+
+
+def _pool_status(eng) -> dict:
+    pool = eng.sync_engine.pool
+    status = {"status": pool.status()}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            status[name] = getattr(pool, name)()
+    return status
+
+
+def pool_status() -> dict:
+    """Utilizzo corrente del pool di connessioni di questo worker."""
+    status = _pool_status(engine)
+    if read_engine is not None:
+        status["read"] = _pool_status(read_engine)
+    return status
+
+
+async def check_schema_at_head() -> None:
+    """RuntimeError se il DB non è alla revisione head delle migrazioni Alembic."""
+    # import qui: alembic serve solo con STARTUP_SCHEMA=check
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    heads = set(ScriptDirectory.from_config(Config(str(ALEMBIC_INI))).get_heads())
+    async with engine.connect() as conn:
+        try:
+            current = set((await conn.execute(text("SELECT version_num FROM alembic_version"))).scalars())
+        except Exception as e:
+            raise RuntimeError("Schema non gestito da Alembic: eseguire 'alembic upgrade head'") from e
+    if current != heads:
+        raise RuntimeError(
+            f"Schema alla revisione {sorted(current)}, attesa {sorted(heads)}: eseguire 'alembic upgrade head'"
+        )
+
+
+async def ping_db(timeout: float, eng=None) -> bool:
+    """True se il DB (default: il primario) risponde a SELECT 1 entro `timeout` secondi."""
+    async def ping() -> None:
+        async with (eng or engine).connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    try:
+        await asyncio.wait_for(ping(), timeout)
+        return True
+    except Exception:
+        logger.warning("Ping del database fallito", exc_info=True)
+        return False
+
+
 # Dependency per FastAPI
 async def get_db():
     async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+# ——— Letture su replica ————————————————————————————————
+PRIMARY_PIN_COOKIE = "helppro_primary"
+PRIMARY_PIN_HEADER = "x-read-primary"
+
+
+def wants_primary(request: Request) -> bool:
+    """Letture da servire dal primario: client appena scritto o richiesta esplicita."""
+    return (
+        read_engine is None
+        or PRIMARY_PIN_COOKIE in request.cookies
+        or request.headers.get(PRIMARY_PIN_HEADER) == "1"
+    )
+
+
+# Dependency per le route di sola lettura (ricerche, profilo)
+async def get_read_db(request: Request):
+    factory = AsyncSessionLocal if wants_primary(request) else AsyncReadSessionLocal
+    async with factory() as session:
+        yield session
+
+
+class ReadAfterWriteMiddleware:
+    """
+    Dopo una richiesta di scrittura riuscita imposta un cookie che per
+    READ_AFTER_WRITE_PIN_S secondi fa leggere lo stesso client dal primario,
+    così vede subito i propri dati nonostante il ritardo della replica.
+    """
+
+    WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or read_engine is None
+            or not settings.READ_AFTER_WRITE_PIN_S
+            or scope["method"] not in self.WRITE_METHODS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        cookie = (
+            f"{PRIMARY_PIN_COOKIE}=1; Max-Age={settings.READ_AFTER_WRITE_PIN_S}; Path=/; HttpOnly; SameSite=Lax"
+        ).encode("latin-1")
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie)]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,162 @@
+# app/jobs.py
+"""
+Job asincroni per i bulk upload: il CSV viene salvato su disco, il job
+registrato in bulk_jobs e messo in coda; un numero fisso di worker
+(JOB_WORKERS) lo elabora con la pipeline a blocchi, salvando gli esiti
+per riga in bulk_job_rows. La coda è del processo: i job ancora in coda
+a uno shutdown restano nello stato "queued".
+"""
+import asyncio
+import functools
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from typing import BinaryIO
+
+import sqlalchemy as sa
+from fastapi import HTTPException, UploadFile, status
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app import crud, models
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.utils.csv_stream import iter_csv_batches
+
+logger = logging.getLogger(__name__)
+
+JOB_KINDS = {
+    "vendors": crud.bulk_create_vendor_profiles,
+    "vendors_upsert": functools.partial(crud.bulk_create_vendor_profiles, upsert=True),
+    "vendor_accounts": crud.bulk_create_vendor_accounts,
+}
+
+_queue: asyncio.Queue | None = None
+# posti in coda prenotati da submit_job in corso
+_reserved = 0
+_workers: list[asyncio.Task] = []
+
+
+def _spool(fileobj: BinaryIO) -> str:
+    fd, path = tempfile.mkstemp(prefix="bulk-", suffix=".csv", dir=settings.JOB_SPOOL_DIR)
+    with os.fdopen(fd, "wb") as out:
+        fileobj.seek(0)
+        shutil.copyfileobj(fileobj, out)
+    return path
+
+
+async def submit_job(db: AsyncSession, kind: str, upload: UploadFile) -> models.BulkJob:
+    """Salva il file, registra il job e lo mette in coda."""
+    global _reserved
+    if _queue is None or (_queue.maxsize > 0 and _queue.qsize() + _reserved >= _queue.maxsize):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Coda dei job piena, riprovare più tardi"
+        )
+    # il posto in coda si prenota prima delle attese: richieste concorrenti
+    # non possono riempire la coda tra il controllo e il put_nowait
+    _reserved += 1
+    try:
+        path = await run_in_threadpool(_spool, upload.file)
+        try:
+            job = models.BulkJob(
+                id=uuid.uuid4().hex,
+                kind=kind,
+                status="queued",
+                filename=upload.filename,
+                processed_rows=0,
+                succeeded_rows=0,
+                failed_rows=0,
+                skipped_rows=0,
+            )
+            db.add(job)
+            await db.commit()
+        except BaseException:
+            os.remove(path)
+            raise
+        _queue.put_nowait((job.id, kind, path))
+    finally:
+        _reserved -= 1
+    return job
+
+
+async def _set_job(db: AsyncSession, job_id: str, **values) -> None:
+    await db.execute(sa.update(models.BulkJob).where(models.BulkJob.id == job_id).values(**values))
+    await db.commit()
+
+
+async def _run_job(job_id: str, kind: str, path: str) -> None:
+    async with AsyncSessionLocal() as db:
+        await _set_job(db, job_id, status="running", started_at=func.now())
+
+        async def on_batch(
+            created: list[tuple[int, int]],
+            errors: list[tuple[int, str]],
+            *,
+            skipped: int = 0,
+        ) -> None:
+            rows = [{"job_id": job_id, "row": idx, "created_id": cid, "error": None} for idx, cid in created]
+            rows += [{"job_id": job_id, "row": idx, "created_id": None, "error": msg} for idx, msg in errors]
+            if rows:
+                await db.execute(sa.insert(models.BulkJobRow).values(rows))
+            await _set_job(
+                db, job_id,
+                processed_rows=models.BulkJob.processed_rows + len(rows) + skipped,
+                succeeded_rows=models.BulkJob.succeeded_rows + len(created),
+                failed_rows=models.BulkJob.failed_rows + len(errors),
+                skipped_rows=models.BulkJob.skipped_rows + skipped,
+            )
+
+        try:
+            with open(path, "rb") as f:
+                await JOB_KINDS[kind](db, iter_csv_batches(f, settings.BULK_BATCH_SIZE), on_batch=on_batch)
+        except Exception as e:
+            logger.exception("Job %s fallito", job_id)
+            await db.rollback()
+            await _set_job(db, job_id, status="failed", error=str(e), finished_at=func.now())
+        else:
+            await _set_job(db, job_id, status="done", finished_at=func.now())
+        finally:
+            os.remove(path)
+
+
+async def _worker() -> None:
+    while True:
+        job_id, kind, path = await _queue.get()
+        try:
+            await _run_job(job_id, kind, path)
+        except Exception:
+            logger.exception("Errore nel worker dei job (%s)", job_id)
+        finally:
+            _queue.task_done()
+
+
+async def get_job(db: AsyncSession, job_id: str, offset: int, limit: int) -> models.BulkJob | None:
+    job = await db.get(models.BulkJob, job_id)
+    if job is None:
+        return None
+    result = await db.execute(
+        sa.select(models.BulkJobRow)
+        .where(models.BulkJobRow.job_id == job_id)
+        .order_by(models.BulkJobRow.row)
+        .offset(offset)
+        .limit(limit)
+    )
+    job.rows = result.scalars().all()
+    return job
+
+
+def start() -> None:
+    global _queue
+    _queue = asyncio.Queue(maxsize=settings.JOB_QUEUE_SIZE)
+    _workers.extend(asyncio.create_task(_worker()) for _ in range(settings.JOB_WORKERS))
+
+
+async def stop() -> None:
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
@@ -1,18 +1,117 @@
+import logging
+import time
+
+# durata degli import dell'app, misurata dal primo import di app.main
+_import_start = time.perf_counter()
+
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app import crud, jobs
 from app.config import settings
-from app.database import engine, Base
+from app.database import (
+    engine, read_engine, Base, ReadAfterWriteMiddleware, check_schema_at_head, ping_db, pool_status
+)
 from app.auth import router as auth_router
-from app.routers import vendors, vendors_accounts
+from app.routers import jobs as jobs_router, vendors, vendors_accounts
+from app.utils import auth_limits, compression, geocoder, metrics, search_cache, spatial_index, tile_cache, user_cache
+
+logger = logging.getLogger(__name__)
+
+app_import_seconds = metrics.gauge("app_import_seconds", "Durata degli import del modulo app.main")
+app_startup_seconds = metrics.gauge("app_startup_seconds", "Durata dell'evento di startup")
+app_import_seconds.set(time.perf_counter() - _import_start)
 
 app = FastAPI(title="HelpPro Backend")
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(ReadAfterWriteMiddleware)
+app.add_middleware(compression.CompressionMiddleware)
+
+# impostato a fine startup; /readyz risponde 503 finché è False
+_started = False
 
 @app.on_event("startup")
 async def on_startup():
-    # Crea le tabelle al riavvio senza bloccare l'event loop
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    global _started
+    t0 = time.perf_counter()
+    if settings.STARTUP_SCHEMA == "create":
+        # Crea le tabelle al riavvio senza bloccare l'event loop
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    elif settings.STARTUP_SCHEMA == "check":
+        # lo schema lo gestisce Alembic: qui si verifica soltanto
+        await check_schema_at_head()
+    # client di geocoding condiviso (pool di connessioni + rate limit)
+    geocoder.start_geocoder()
+    # read model in memoria per le ricerche geografiche (se abilitato),
+    # caricato in background
+    await spatial_index.start()
+    search_cache.start()
+    tile_cache.start()
+    user_cache.start()
+    # worker dei bulk upload asincroni
+    jobs.start()
+    # rate limit di login e signup
+    auth_limits.start()
+    app_startup_seconds.set(time.perf_counter() - t0)
+    _started = True
+    logger.info(
+        "Avvio completato: import %.3f s, startup %.3f s",
+        app_import_seconds.get(), app_startup_seconds.get()
+    )
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    global _started
+    _started = False
+    await jobs.stop()
+    crud.shutdown_hash_process_pool()
+    crud.shutdown_hash_executor()
+    await geocoder.stop_geocoder()
+    await spatial_index.stop()
+    await search_cache.stop()
+    await tile_cache.stop()
+    await user_cache.stop()
+    await auth_limits.stop()
+
+@app.get("/healthz", tags=["health"])
+async def liveness():
+    # liveness: il processo risponde, nessuna dipendenza esterna
+    return {"status": "ok"}
+
+@app.get("/readyz", tags=["health"])
+async def readiness():
+    checks = {
+        "startup": _started,
+        "database": await ping_db(settings.READINESS_DB_TIMEOUT_S),
+        "spatial_index": spatial_index.is_ready(),
+    }
+    if read_engine is not None:
+        checks["read_database"] = await ping_db(settings.READINESS_DB_TIMEOUT_S, read_engine)
+    ready = all(checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "checks": checks,
+            "db_pool": pool_status(),
+            "import_seconds": round(app_import_seconds.get(), 3),
+            "startup_seconds": round(app_startup_seconds.get(), 3),
+        },
+    )
+
+@app.get("/health/db-pool", tags=["health"])
+async def db_pool_status():
+    return pool_status()
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(
+        metrics.render_prometheus(),
+        media_type="text/plain; version=0.0.4"
+    )
 
 # Monta il router di auth
 app.include_router(auth_router)
 app.include_router(vendors.router)
-app.include_router(vendors_accounts.router)
\ No newline at end of file
+app.include_router(vendors_accounts.router)
+app.include_router(jobs_router.router)
@@ -1,6 +1,6 @@
 # app/models.py
 
-from sqlalchemy import Column, Integer, String, Boolean, Enum, ForeignKey
+from sqlalchemy import Column, Integer, SmallInteger, String, Boolean, Enum, ForeignKey, Float, DateTime, Index, func
 from sqlalchemy.orm import relationship
 import enum
 from geoalchemy2 import Geometry
@@ -58,4 +58,68 @@ class Vendor(Base):
     postcode    = Column(String, nullable=False)
     address     = Column(String, nullable=False)
     account = relationship("VendorAccount", back_populates="vendor_profile")
-    location    = Column(Geometry("POINT", srid=4326), nullable=False, index=True)
\ No newline at end of file
+    location    = Column(Geometry("POINT", srid=4326), nullable=False, index=True)
+    # per l'export incrementale (updated_since)
+    updated_at  = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(),
+                         nullable=False, index=True)
+    # geohash a precisione 9: i prefissi sono le celle più grosse (app.utils.geohash);
+    # NULL per i vendor storici senza location
+    geohash     = Column(String(9), nullable=True)
+    # hash (md5) dei campi importati, per i re-import incrementali (crud.vendor_hashes)
+    address_hash = Column(String(32), nullable=True)
+    content_hash = Column(String(32), nullable=True)
+
+
+# indice GiST sull'espressione geography(location): serve ST_DWithin in metri
+# e l'ordinamento KNN senza cast della colonna che escluderebbe l'indice
+Index("ix_vendors_location_geog", func.geography(Vendor.location), postgresql_using="gist")
+
+
+# — Conteggio vendor per cella geohash e categoria —
+class VendorCellCount(Base):
+    __tablename__ = "vendor_cell_counts"
+
+    # lunghezza del prefisso di geohash (una delle GEO_CELL_PRECISIONS)
+    precision   = Column(SmallInteger, primary_key=True)
+    cell        = Column(String(9), primary_key=True)
+    category    = Column(Enum(CategoryEnum), primary_key=True)
+    count       = Column(Integer, nullable=False)
+
+
+# — Cache persistente del geocoding —
+class GeocodeCache(Base):
+    __tablename__ = "geocode_cache"
+
+    # indirizzo normalizzato: "address|postcode|city|country"
+    query_key   = Column(String, primary_key=True)
+    latitude    = Column(Float, nullable=False)
+    longitude   = Column(Float, nullable=False)
+    created_at  = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+# — Job asincroni dei bulk upload —
+class BulkJob(Base):
+    __tablename__ = "bulk_jobs"
+
+    id              = Column(String(32), primary_key=True)
+    kind            = Column(String, nullable=False)        # "vendors" | "vendor_accounts"
+    status          = Column(String, nullable=False)        # queued | running | done | failed
+    filename        = Column(String, nullable=True)
+    processed_rows  = Column(Integer, nullable=False, default=0)
+    succeeded_rows  = Column(Integer, nullable=False, default=0)
+    failed_rows     = Column(Integer, nullable=False, default=0)
+    # righe invariate saltate dai re-import (upsert)
+    skipped_rows    = Column(Integer, nullable=False, default=0)
+    error           = Column(String, nullable=True)
+    created_at      = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    started_at      = Column(DateTime(timezone=True), nullable=True)
+    finished_at     = Column(DateTime(timezone=True), nullable=True)
+
+
+class BulkJobRow(Base):
+    __tablename__ = "bulk_job_rows"
+
+    job_id      = Column(String(32), ForeignKey("bulk_jobs.id", ondelete="CASCADE"), primary_key=True)
+    row         = Column(Integer, primary_key=True)
+    created_id  = Column(Integer, nullable=True)
+    error       = Column(String, nullable=True)
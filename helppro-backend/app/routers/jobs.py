@@ -0,0 +1,26 @@
+# app/routers/jobs.py
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import jobs, schemas
+from app.database import get_db
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get(
+    "/{job_id}",
+    response_model=schemas.JobOut,
+    summary="Stato, avanzamento ed esiti per riga di un bulk upload asincrono",
+)
+async def get_job(
+    job_id: str,
+    offset: int = Query(0, ge=0, description="Prima riga degli esiti restituiti"),
+    limit: int = Query(1000, ge=0, le=10000, description="Numero massimo di esiti per riga"),
+    db: AsyncSession = Depends(get_db),
+):
+    job = await jobs.get_job(db, job_id, offset, limit)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job non trovato")
+    return job
@@ -1,30 +1,52 @@
 # app/routers/vendors.py
 
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
-from fastapi import Query
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Request, status
+from fastapi import Path, Query
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from typing import List, Tuple
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Literal, Tuple
 import csv
+import math
 from io import StringIO
 
-from app import crud, schemas
-from app.database import get_db
+from app import crud, jobs, schemas
+from app.config import settings
+from app.database import AsyncReadSessionLocal, AsyncSessionLocal, get_db, get_read_db, wants_primary
 from app.models import VendorAccount
-from geoalchemy2.shape import to_shape
+from app.utils import geohash, spatial_index
+from app.utils.csv_stream import iter_csv_batches
+from app.utils.fastjson import dumps, json_response, rows_response
 
 router = APIRouter(prefix="/vendors", tags=["vendors"])
 
+# raggio massimo di /search e /nearest: oltre, la ricerca copre mezza nazione
+MAX_RADIUS_KM = 500.0
+
 @router.post(
     "/bulk-upload",
     response_model=List[schemas.VendorOut],
     status_code=status.HTTP_201_CREATED
 )
 async def bulk_upload_vendors(
+    request: Request,
     file: UploadFile = File(
         ...,
         description="CSV file with header: account_id,company_name,category,country,city,postcode,address"
     ),
+    mode: Literal["row", "pipeline", "upsert"] = Query(
+        "row",
+        description=(
+            "row: una riga alla volta; pipeline: lettura a blocchi, geocoding concorrente e INSERT batch; "
+            "upsert: re-import completo per account_id, solo le righe cambiate vengono scritte"
+        )
+    ),
+    background: bool = Query(
+        False,
+        description="Elabora il file in un job (pipeline) e risponde subito 202 con l'URL di stato"
+    ),
     db: AsyncSession = Depends(get_db)
 ):
     if not file.filename.lower().endswith(".csv"):
@@ -33,6 +55,27 @@ async def bulk_upload_vendors(
             detail="È richiesto un file .csv"
         )
 
+    if background:
+        job = await jobs.submit_job(db, "vendors_upsert" if mode == "upsert" else "vendors", file)
+        accepted = schemas.JobAccepted(job_id=job.id, status=job.status, status_url=f"/jobs/{job.id}")
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=accepted.dict())
+
+    if mode in ("pipeline", "upsert"):
+        created, errors, skipped = await crud.bulk_create_vendor_profiles(
+            db, iter_csv_batches(file.file, settings.BULK_BATCH_SIZE), upsert=mode == "upsert"
+        )
+        if errors:
+            raise HTTPException(
+                status_code=status.HTTP_207_MULTI_STATUS,
+                detail={"created": [v.id for v in created], "skipped": skipped, "errors": errors}
+            )
+        return rows_response(
+            request,
+            [v.dict() for v in created],
+            status_code=status.HTTP_201_CREATED,
+            headers={"X-Skipped-Rows": str(skipped)},
+        )
+
     text = (await file.read()).decode("utf-8")
     reader = csv.DictReader(StringIO(text))
 
@@ -77,29 +120,270 @@ async def bulk_upload_vendors(
     summary="Cerca professionisti nel raggio specificato",
 )
 async def search_vendors(
-    lat: float = Query(..., description="Latitudine"),
-    lon: float = Query(..., description="Longitudine"),
-    radius_km: float = Query(5.0, gt=0.0, description="Raggio di ricerca in km"),
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    lat: float = Query(..., ge=-90, le=90, description="Latitudine"),
+    lon: float = Query(..., ge=-180, le=180, description="Longitudine"),
+    radius_km: float = Query(5.0, gt=0.0, le=MAX_RADIUS_KM, description="Raggio di ricerca in km"),
+    limit: int = Query(100, ge=1, le=1000, description="Numero massimo di risultati"),
+    cursor: int | None = Query(
+        None,
+        description="Valore dell'header X-Next-Cursor della pagina precedente"
+    ),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    vendors = await crud.get_vendors_in_radius(db, lat, lon, radius_km)
-    out: List[schemas.VendorOut] = []
-    for v in vendors:
-        if v.location is None:
-            continue
-        # to_shape converte il GeometryElement in uno shape shapely, 
-        # ma puoi pure usare v.location.x / .y se funziona
-        geom = to_shape(v.location)
-        out.append(schemas.VendorOut(
-            id=v.id,
-            account_id=v.account_id,
-            company_name=v.company_name,
-            category=v.category,
-            country=v.country,
-            city=v.city,
-            postcode=v.postcode,
-            address=v.address,
-            latitude=geom.y,    # latitudine
-            longitude=geom.x,   # longitudine
+    index = spatial_index.get_index()
+    if index is not None:
+        rows = index.radius(lat, lon, radius_km, limit, after_id=cursor)
+    else:
+        rows = await crud.get_vendors_in_radius_cached(
+            db, lat, lon, radius_km, limit, after_id=cursor, db_is_primary=wants_primary(request)
+        )
+    # pagina piena: il client può chiedere la successiva
+    headers = {"X-Next-Cursor": str(rows[-1]["id"])} if len(rows) == limit else None
+    # le righe hanno già i campi di VendorOut: serializzazione diretta,
+    # in JSON o nella codifica compatta chiesta con Accept
+    return rows_response(request, rows, headers=headers)
+
+
+@router.get(
+    "/nearest",
+    response_model=List[schemas.VendorNearOut],
+    summary="I professionisti più vicini, ordinati per distanza",
+)
+async def nearest_vendors(
+    request: Request,
+    lat: float = Query(..., ge=-90, le=90, description="Latitudine"),
+    lon: float = Query(..., ge=-180, le=180, description="Longitudine"),
+    k: int = Query(20, ge=1, le=100, description="Numero di risultati"),
+    category: schemas.CategoryEnum | None = Query(None, description="Filtra per categoria"),
+    max_radius_km: float | None = Query(None, gt=0.0, le=MAX_RADIUS_KM, description="Distanza massima in km"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    index = spatial_index.get_index()
+    if index is not None:
+        rows = [
+            {**r, "distance_m": distance_m}
+            for r, distance_m in index.nearest(lat, lon, k, category=category, max_radius_km=max_radius_km)
+        ]
+    else:
+        rows = await crud.get_nearest_vendors(db, lat, lon, k, category=category, max_radius_km=max_radius_km)
+    return rows_response(request, rows)
+
+
+@router.get(
+    "/text-search",
+    response_model=List[schemas.VendorOut],
+    summary="Ricerca testuale (nome, categoria, città, CAP, indirizzo)",
+)
+async def text_search_vendors(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100, description="Testo cercato"),
+    mode: Literal["ranked", "prefix"] = Query(
+        "ranked",
+        description=(
+            "ranked: risultati ordinati per somiglianza; "
+            "prefix: autocompletamento su nome e città (almeno 3 caratteri)"
+        )
+    ),
+    category: schemas.CategoryEnum | None = Query(None, description="Filtra per categoria"),
+    limit: int = Query(20, ge=1, le=100, description="Numero massimo di risultati"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    if mode == "prefix" and len(q.strip()) < crud.PREFIX_MIN_LENGTH:
+        # con meno di 3 caratteri il pattern non ha trigrammi: gli indici
+        # pg_trgm non servono e la query scorrerebbe tutta la tabella
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"L'autocompletamento richiede almeno {crud.PREFIX_MIN_LENGTH} caratteri",
+        )
+    rows = await crud.text_search_vendors(db, q, limit, category=category, prefix=mode == "prefix")
+    return rows_response(request, rows)
+
+
+@router.get(
+    "/cell-counts",
+    summary="Quanti professionisti per categoria nella zona del punto (conteggi precalcolati)",
+)
+async def vendor_cell_counts(
+    lat: float = Query(..., ge=-90, le=90, description="Latitudine"),
+    lon: float = Query(..., ge=-180, le=180, description="Longitudine"),
+    precision: int = Query(5, description="Precisione geohash della cella (vedi GEO_CELL_PRECISIONS)"),
+    neighbors: bool = Query(True, description="Includi le 8 celle adiacenti"),
+    category: schemas.CategoryEnum | None = Query(None, description="Solo questa categoria"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    if precision not in settings.GEO_CELL_PRECISIONS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"precision deve essere una di {settings.GEO_CELL_PRECISIONS}"
+        )
+    if neighbors:
+        cells = geohash.with_neighbors(lat, lon, precision)
+    else:
+        cells = [geohash.encode(lat, lon, precision)]
+    counts = await crud.get_cell_counts(db, precision, cells, category=category)
+    return json_response({
+        "precision": precision,
+        "cells": cells,
+        "total": sum(counts.values()),
+        "categories": counts,
+        "available": sorted(counts),
+    })
+
+
+def _parse_bbox(bbox: str) -> tuple[float, float, float, float]:
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="bbox deve essere min_lon,min_lat,max_lon,max_lat"
+        )
+    if min_lon > max_lon or min_lat > max_lat:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="bbox con minimi maggiori dei massimi"
+        )
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def _cluster_grid_deg(zoom: int, bbox: tuple[float, float, float, float]) -> float:
+    """
+    Lato della cella di aggregazione: una frazione della tile allo zoom
+    richiesto, allargata finché il rettangolo non supera CLUSTER_MAX_CELLS celle.
+    """
+    grid = 360 / (2 ** zoom) / settings.CLUSTER_CELLS_PER_TILE
+    min_lon, min_lat, max_lon, max_lat = bbox
+    cells = ((max_lon - min_lon) / grid + 1) * ((max_lat - min_lat) / grid + 1)
+    if cells > settings.CLUSTER_MAX_CELLS:
+        grid *= math.sqrt(cells / settings.CLUSTER_MAX_CELLS)
+    return grid
+
+
+@router.get(
+    "/clusters",
+    response_model=schemas.VendorClustersOut,
+    summary="Vendor del riquadro della mappa aggregati in cluster (o singoli agli zoom alti)",
+)
+async def vendor_clusters(
+    bbox: str = Query(..., description="min_lon,min_lat,max_lon,max_lat del riquadro visibile"),
+    zoom: int = Query(..., ge=0, le=22, description="Livello di zoom della mappa"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    box = _parse_bbox(bbox)
+    index = spatial_index.get_index()
+    if zoom >= settings.CLUSTER_MAX_ZOOM:
+        # uno in più del massimo: se ci sono, i vendor sono troppi da mostrare singolarmente
+        limit = settings.CLUSTER_MAX_POINTS + 1
+        if index is not None:
+            rows = index.in_bbox(box, limit)
+        else:
+            rows = await crud.get_vendors_in_bbox(db, box, limit)
+        if len(rows) < limit:
+            return json_response({"zoom": zoom, "grid_deg": None, "clusters": [], "vendors": rows})
+
+    grid_deg = _cluster_grid_deg(zoom, box)
+    if index is not None:
+        clusters = index.clusters(box, grid_deg)
+    else:
+        clusters = await crud.get_vendor_clusters(db, box, grid_deg)
+    return json_response({"zoom": zoom, "grid_deg": grid_deg, "clusters": clusters, "vendors": []})
+
+
+@router.get(
+    "/tiles/{z}/{x}/{y}.mvt",
+    summary="Vector tile (Mapbox Vector Tile) delle posizioni dei vendor",
+    response_class=Response,
+    responses={200: {"content": {"application/vnd.mapbox-vector-tile": {}}}},
+)
+async def vendor_tile(
+    z: int = Path(..., ge=0, le=22),
+    x: int = Path(..., ge=0),
+    y: int = Path(..., ge=0),
+    db: AsyncSession = Depends(get_read_db),
+):
+    if x >= 2 ** z or y >= 2 ** z:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tile fuori dai limiti")
+    tile = await crud.get_vendor_tile_cached(db, z, x, y)
+    return Response(
+        tile,
+        media_type="application/vnd.mapbox-vector-tile",
+        headers={"Cache-Control": f"public, max-age={settings.TILE_HTTP_MAX_AGE_S}"},
+    )
+
+
+EXPORT_FIELDS = (
+    "id", "account_id", "company_name", "category", "country", "city",
+    "postcode", "address", "latitude", "longitude", "updated_at",
+)
+
+
+def _encode_csv(rows: list[dict], header: bool) -> bytes:
+    buf = StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+    for r in rows:
+        writer.writerow((
+            r["id"], r["account_id"], r["company_name"], r["category"].value, r["country"], r["city"],
+            r["postcode"], r["address"], r["latitude"], r["longitude"], r["updated_at"].isoformat(),
         ))
-    return out
\ No newline at end of file
+    return buf.getvalue().encode("utf-8")
+
+
+def _encode_ndjson(rows: list[dict]) -> bytes:
+    return b"".join(dumps(r) + b"\n" for r in rows)
+
+
+@router.get(
+    "/export",
+    summary="Export in streaming di tutti i vendor (CSV o NDJSON)",
+    response_class=StreamingResponse,
+)
+async def export_vendors(
+    format: Literal["csv", "ndjson"] = Query("ndjson", description="Formato delle righe"),
+    category: schemas.CategoryEnum | None = Query(None, description="Filtra per categoria"),
+    country: str | None = Query(None, description="Filtra per paese"),
+    bbox: str | None = Query(None, description="min_lon,min_lat,max_lon,max_lat"),
+    updated_since: datetime | None = Query(
+        None,
+        description=(
+            "Solo i vendor modificati da questo istante (valore di X-Export-Watermark di un export "
+            "precedente). Export consecutivi si sovrappongono: deduplicare per id"
+        )
+    ),
+):
+    box = _parse_bbox(bbox) if bbox else None
+    # watermark dal primario, prima che l'export apra il suo snapshot.
+    # updated_at è l'inizio della transazione di chi scrive, che può
+    # committare molto dopo (geocoding nei bulk) e arrivare in ritardo sulla
+    # replica: il margine fa rileggere al prossimo export anche quelle righe
+    async with AsyncSessionLocal() as primary:
+        now = (await primary.execute(select(func.clock_timestamp()))).scalar_one()
+    watermark = now - timedelta(seconds=settings.EXPORT_WATERMARK_OVERLAP_S)
+    # sessione propria (sulla replica, se configurata): deve restare aperta
+    # per tutta la risposta, oltre la durata delle dipendenze della richiesta
+    db = AsyncReadSessionLocal()
+
+    async def body() -> AsyncIterator[bytes]:
+        try:
+            header = True
+            async for rows in crud.iter_vendors_export(
+                db, settings.EXPORT_CHUNK_SIZE,
+                category=category, country=country, bbox=box, updated_since=updated_since,
+            ):
+                if format == "csv":
+                    yield _encode_csv(rows, header)
+                    header = False
+                else:
+                    yield _encode_ndjson(rows)
+            if format == "csv" and header:
+                yield _encode_csv([], header)
+        finally:
+            await db.close()
+
+    return StreamingResponse(
+        body(),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers={"X-Export-Watermark": watermark.isoformat()},
+    )
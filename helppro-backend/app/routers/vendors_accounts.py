@@ -1,13 +1,18 @@
 # app/routers/vendor_accounts.py
 
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Request, status
+from fastapi import Query
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Literal
 import csv
 from io import StringIO
 
-from app import crud, schemas
+from app import crud, jobs, schemas
+from app.config import settings
 from app.database import get_db
+from app.utils.csv_stream import iter_csv_batches
+from app.utils.fastjson import rows_response
 
 router = APIRouter(
     prefix="/vendors/accounts",
@@ -20,7 +25,16 @@ router = APIRouter(
     status_code=status.HTTP_201_CREATED
 )
 async def bulk_upload_vendor_accounts(
+    request: Request,
     file: UploadFile = File(..., description="CSV header: email,password"),
+    mode: Literal["row", "pipeline"] = Query(
+        "row",
+        description="row: una riga alla volta; pipeline: hashing su pool di processi e INSERT batch"
+    ),
+    background: bool = Query(
+        False,
+        description="Elabora il file in un job (pipeline) e risponde subito 202 con l'URL di stato"
+    ),
     db: AsyncSession = Depends(get_db)
 ):
     if not file.filename.lower().endswith(".csv"):
@@ -29,6 +43,22 @@ async def bulk_upload_vendor_accounts(
             detail="Richiesto file .csv"
         )
 
+    if background:
+        job = await jobs.submit_job(db, "vendor_accounts", file)
+        accepted = schemas.JobAccepted(job_id=job.id, status=job.status, status_url=f"/jobs/{job.id}")
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=accepted.dict())
+
+    if mode == "pipeline":
+        created, errors = await crud.bulk_create_vendor_accounts(
+            db, iter_csv_batches(file.file, settings.BULK_BATCH_SIZE)
+        )
+        if errors:
+            raise HTTPException(
+                status_code=status.HTTP_207_MULTI_STATUS,
+                detail={"created": [a.id for a in created], "errors": errors}
+            )
+        return rows_response(request, [a.dict() for a in created], status_code=status.HTTP_201_CREATED)
+
     content = await file.read()
     text = content.decode("utf-8")
     reader = csv.DictReader(StringIO(text))
@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel, EmailStr
 from typing import Literal, Tuple
 from typing import Optional
@@ -48,6 +49,24 @@ class VendorOut(BaseModel):
     class Config:
         orm_mode = True
 
+class VendorNearOut(VendorOut):
+    distance_m: float
+
+class VendorCluster(BaseModel):
+    latitude: float
+    longitude: float
+    count: int
+    # solo le categorie presenti nel cluster
+    categories: dict[CategoryEnum, int]
+
+class VendorClustersOut(BaseModel):
+    zoom: int
+    # lato della cella di aggregazione; None se sono restituiti i singoli vendor
+    grid_deg: Optional[float] = None
+    clusters: list[VendorCluster] = []
+    vendors: list[VendorOut] = []
+
+
 #################
 # --- Schemi profilo Utente ---
 #################
@@ -75,3 +94,37 @@ class TokenData(BaseModel):
     email: Optional[str] = None
 
 
+#################
+# --- Schemi job bulk upload ---
+#################
+
+class JobAccepted(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+
+class JobRowOut(BaseModel):
+    row: int
+    created_id: Optional[int] = None
+    error: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+
+class JobOut(BaseModel):
+    id: str
+    kind: str
+    status: str
+    filename: Optional[str] = None
+    processed_rows: int
+    succeeded_rows: int
+    failed_rows: int
+    skipped_rows: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    rows: list[JobRowOut] = []
+
+    class Config:
+        orm_mode = True
@@ -0,0 +1,76 @@
+# app/utils/auth_limits.py
+"""
+Limiti di richieste davanti a /auth/token e /auth/signup: il rifiuto costa
+un lookup in memoria, mentre ogni tentativo ammesso costa un hash o una
+verifica bcrypt. Login limitato per IP e per email, signup per IP.
+"""
+from fastapi import HTTPException, Request, status
+
+from app.config import settings
+from app.utils import metrics
+from app.utils.ratelimit import KeyedRateLimiter
+from app.utils.shared_cache import build_shared_backend
+
+auth_rate_limited = metrics.counter(
+    "auth_rate_limited_total",
+    "Richieste di autenticazione rifiutate dal rate limit",
+    labelnames=("limiter",)
+)
+
+_limiters: dict[str, KeyedRateLimiter] = {}
+_shared = None
+
+
+def client_ip(request: Request) -> str:
+    """
+    IP del client. Le voci a sinistra di X-Forwarded-For le sceglie il client:
+    vale solo quella aggiunta dal primo dei TRUSTED_PROXY_HOPS proxy fidati,
+    contando da destra.
+    """
+    hops = settings.TRUSTED_PROXY_HOPS
+    if hops > 0:
+        forwarded = [ip.strip() for ip in request.headers.get("x-forwarded-for", "").split(",")]
+        forwarded = [ip for ip in forwarded if ip]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.client.host if request.client else "unknown"
+
+
+async def check(request: Request, endpoint: str, email: str | None = None) -> None:
+    """HTTP 429 se la richiesta supera uno dei limiti di `endpoint` ("login" o "signup")."""
+    keys = [(f"{endpoint}_ip", client_ip(request))]
+    if email:
+        keys.append((f"{endpoint}_email", email.strip().lower()))
+    for name, key in keys:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            continue
+        retry_after = await limiter.hit(key)
+        if retry_after > 0:
+            auth_rate_limited.labels(limiter=name).inc()
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Troppi tentativi, riprovare più tardi",
+                headers={"Retry-After": str(max(int(retry_after + 0.999), 1))},
+            )
+
+
+def start() -> None:
+    global _shared
+    _shared = build_shared_backend(settings.RATE_LIMIT_URL)
+    for name, per_min, burst in (
+        ("login_ip", settings.LOGIN_RATE_PER_IP_PER_MIN, settings.LOGIN_BURST_PER_IP),
+        ("login_email", settings.LOGIN_RATE_PER_EMAIL_PER_MIN, settings.LOGIN_BURST_PER_EMAIL),
+        ("signup_ip", settings.SIGNUP_RATE_PER_IP_PER_MIN, settings.SIGNUP_BURST_PER_IP),
+    ):
+        _limiters[name] = KeyedRateLimiter(
+            name, per_min / 60, burst, settings.RATE_LIMIT_MAX_KEYS, shared=_shared
+        )
+
+
+async def stop() -> None:
+    global _shared
+    _limiters.clear()
+    if _shared is not None:
+        await _shared.aclose()
+        _shared = None
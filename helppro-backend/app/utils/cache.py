@@ -0,0 +1,63 @@
+# app/utils/cache.py
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class TTLCache:
+    """
+    Cache LRU in-process con scadenza per voce.
+    Pensata per l'event loop: non è thread-safe.
+
+    Con `maxweight` le voci hanno un peso (es. numero di righe) e si
+    scartano le meno recenti finché il totale non rientra nel limite.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, maxweight: int | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxweight = maxweight
+        self.weight = 0
+        self._data: OrderedDict[Hashable, tuple[Any, float, int]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return default
+        value, expires_at, _ = item
+        if expires_at < time.monotonic():
+            self.pop(key)
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None, weight: int = 1) -> None:
+        if self.maxsize <= 0:
+            return
+        if self.maxweight is not None and weight > self.maxweight:
+            # da sola sfratterebbe tutta la cache
+            self.pop(key)
+            return
+        self.pop(key)
+        self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl), weight)
+        self.weight += weight
+        while len(self._data) > self.maxsize or (self.maxweight is not None and self.weight > self.maxweight):
+            _, (_, _, evicted) = self._data.popitem(last=False)
+            self.weight -= evicted
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.pop(key, None)
+        if item is None:
+            return default
+        self.weight -= item[2]
+        return item[0]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.weight = 0
+
+    def keys(self) -> list[Hashable]:
+        return list(self._data.keys())
+
+    def __len__(self) -> int:
+        return len(self._data)
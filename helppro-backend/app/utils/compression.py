@@ -0,0 +1,149 @@
+# app/utils/compression.py
+"""
+Compressione delle risposte (brotli se disponibile e accettato, altrimenti
+gzip). Le risposte in un solo blocco sotto COMPRESSION_MIN_SIZE byte passano
+invariate: su payload piccoli il costo CPU supera il risparmio. Le risposte
+in streaming (export) sono compresse blocco per blocco.
+"""
+import time
+import zlib
+
+from app.config import settings
+from app.utils import metrics
+
+try:
+    import brotli
+except ImportError:  # brotli è opzionale: senza, solo gzip
+    brotli = None
+
+compression_bytes = metrics.counter(
+    "response_compression_bytes_total",
+    "Byte delle risposte compresse, prima (in) e dopo (out)",
+    labelnames=("encoding", "direction")
+)
+compression_duration = metrics.histogram(
+    "response_compression_seconds",
+    "Tempo CPU di compressione per risposta",
+    labelnames=("encoding",),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
+# già compressi o binari non comprimibili
+_SKIP_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip")
+
+
+class _Gzip:
+    name = "gzip"
+
+    def __init__(self):
+        self._obj = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def process(self, data: bytes) -> bytes:
+        # flush a ogni blocco: in streaming il client riceve subito i dati
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+class _Brotli:
+    name = "br"
+
+    def __init__(self):
+        self._obj = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+    def process(self, data: bytes) -> bytes:
+        return self._obj.process(data) + self._obj.flush()
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+
+def _choose(accept_encoding: str):
+    offered = {p.split(";", 1)[0].strip().lower() for p in accept_encoding.split(",")}
+    if brotli is not None and "br" in offered:
+        return _Brotli
+    if "gzip" in offered:
+        return _Gzip
+    return None
+
+
+class CompressionMiddleware:
+    """Middleware ASGI puro: Content-Encoding negoziato con Accept-Encoding."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        codec_cls = _choose(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if codec_cls is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        codec = None
+        elapsed = 0.0
+        size_in = size_out = 0
+
+        async def send_wrapper(message):
+            nonlocal start_message, codec, elapsed, size_in, size_out
+            if message["type"] == "http.response.start":
+                # si decide al primo blocco del body, quando si conosce la dimensione
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                response_headers = {k.lower(): v for k, v in start_message.get("headers", [])}
+                content_type = response_headers.get(b"content-type", b"").decode("latin-1")
+                skip = (
+                    b"content-encoding" in response_headers
+                    or content_type.startswith(_SKIP_TYPES)
+                    or (not more_body and len(body) < settings.COMPRESSION_MIN_SIZE)
+                )
+                if not skip:
+                    codec = codec_cls()
+                    new_headers = [
+                        (k, v) for k, v in start_message.get("headers", [])
+                        if k.lower() != b"content-length"
+                    ]
+                    new_headers.append((b"content-encoding", codec.name.encode()))
+                    new_headers.append((b"vary", b"Accept-Encoding"))
+                    start_message = {**start_message, "headers": new_headers}
+                    if not more_body:
+                        t0 = time.perf_counter()
+                        compressed = codec.process(body) + codec.finish()
+                        elapsed += time.perf_counter() - t0
+                        size_in, size_out = len(body), len(compressed)
+                        start_message["headers"].append((b"content-length", str(len(compressed)).encode()))
+                        await send(start_message)
+                        await send({"type": "http.response.body", "body": compressed})
+                        return
+                await send(start_message)
+                start_message = None
+
+            if codec is None:
+                await send(message)
+                return
+            t0 = time.perf_counter()
+            out = codec.process(body) if body else b""
+            if not more_body:
+                out += codec.finish()
+            elapsed += time.perf_counter() - t0
+            size_in += len(body)
+            size_out += len(out)
+            await send({"type": "http.response.body", "body": out, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+        if codec is not None:
+            compression_duration.labels(encoding=codec.name).observe(elapsed)
+            compression_bytes.labels(encoding=codec.name, direction="in").inc(size_in)
+            compression_bytes.labels(encoding=codec.name, direction="out").inc(size_out)
@@ -0,0 +1,29 @@
+# app/utils/csv_stream.py
+import csv
+import io
+from typing import BinaryIO, Iterator
+
+
+def iter_csv_batches(
+    fileobj: BinaryIO,
+    batch_size: int
+) -> Iterator[list[tuple[int, dict]]]:
+    """
+    Legge un CSV (con header) riga per riga dal file binario e lo restituisce
+    a blocchi di `batch_size` righe come coppie (numero_riga, riga).
+    In memoria resta al massimo un blocco alla volta.
+    """
+    text = io.TextIOWrapper(fileobj, encoding="utf-8", newline="")
+    try:
+        reader = csv.DictReader(text)
+        batch: list[tuple[int, dict]] = []
+        for idx, row in enumerate(reader, start=1):
+            batch.append((idx, row))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        # non chiudere il file dell'UploadFile insieme al wrapper
+        text.detach()
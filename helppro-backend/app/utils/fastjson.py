@@ -0,0 +1,86 @@
+# app/utils/fastjson.py
+import json
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from app.utils import metrics
+
+try:
+    import orjson
+except ImportError:  # orjson è opzionale: senza, si usa il modulo json
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack è opzionale: senza, la codifica non viene offerta
+    msgpack = None
+
+MEDIA_JSON = "application/json"
+# stessi dati come oggetto di array paralleli: {"id": [...], "city": [...], ...}
+MEDIA_COLUMNS = "application/vnd.helppro.columns+json"
+# layout a colonne codificato in MessagePack
+MEDIA_MSGPACK = "application/msgpack"
+
+serialize_duration = metrics.histogram(
+    "response_serialize_seconds",
+    "Durata della serializzazione JSON delle risposte veloci",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+response_encoding = metrics.counter(
+    "response_encoding_total",
+    "Risposte a lista per codifica negoziata con Accept",
+    labelnames=("media_type",)
+)
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def json_response(content, status_code: int = 200, headers: dict | None = None) -> Response:
+    """Serializza direttamente in bytes, senza validazione Pydantic della risposta."""
+    with serialize_duration.time():
+        body = dumps(content)
+    return Response(body, status_code=status_code, headers=headers, media_type=MEDIA_JSON)
+
+
+def to_columns(rows: list[dict]) -> dict[str, list]:
+    """Righe omogenee come array paralleli: i nomi dei campi compaiono una volta sola."""
+    if not rows:
+        return {}
+    return {field: [r[field] for r in rows] for field in rows[0]}
+
+
+def negotiate(accept: str | None) -> str:
+    """Codifica scelta dall'header Accept; JSON a righe se nessuna compatta è richiesta."""
+    if accept:
+        for part in accept.split(","):
+            media = part.split(";", 1)[0].strip().lower()
+            if media == MEDIA_COLUMNS:
+                return MEDIA_COLUMNS
+            if media == MEDIA_MSGPACK and msgpack is not None:
+                return MEDIA_MSGPACK
+    return MEDIA_JSON
+
+
+def rows_response(
+    request: Request,
+    rows: list[dict],
+    status_code: int = 200,
+    headers: dict | None = None,
+) -> Response:
+    """Come json_response per una lista di righe, con la codifica negoziata dal client."""
+    media = negotiate(request.headers.get("accept"))
+    response_encoding.labels(media_type=media).inc()
+    headers = {**(headers or {}), "Vary": "Accept"}
+    with serialize_duration.time():
+        if media == MEDIA_JSON:
+            body = dumps(rows)
+        elif media == MEDIA_COLUMNS:
+            body = dumps(to_columns(rows))
+        else:
+            body = msgpack.packb(to_columns(rows), default=str)
+    return Response(body, status_code=status_code, headers=headers, media_type=media)
@@ -1,5 +1,100 @@
 # app/utils/geocode.py
-import httpx
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.future import select
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import GeocodeCache
+from app.utils import metrics
+from app.utils.cache import TTLCache
+from app.utils.geocoder import get_geocoder
+
+logger = logging.getLogger(__name__)
+
+# LRU in memoria davanti alla tabella geocode_cache
+_memory_cache = TTLCache(settings.GEOCODE_CACHE_SIZE, settings.GEOCODE_CACHE_TTL_S)
+# lookup in corso: richieste identiche concorrenti attendono lo stesso task
+_inflight: dict[str, asyncio.Future] = {}
+
+geocode_cache_requests = metrics.counter(
+    "geocode_cache_requests_total",
+    "Lookup di geocoding per esito della cache (hit_memory, hit_db, miss, merged)",
+    labelnames=("result",)
+)
+geocode_duration = metrics.histogram(
+    "geocode_duration_seconds",
+    "Durata di geocode_address, cache inclusa",
+)
+geocode_upstream_duration = metrics.histogram(
+    "geocode_upstream_duration_seconds",
+    "Durata delle chiamate al geocoder esterno, retry e rate limit inclusi",
+)
+
+
+def normalize_address_key(country: str, city: str, postcode: str, address: str) -> str:
+    """Chiave di cache: campi in minuscolo, spazi compattati, unita da '|'."""
+    parts = (address, postcode, city, country)
+    return "|".join(re.sub(r"\s+", " ", (p or "").strip().lower()).strip(" ,.") for p in parts)
+
+
+def geocode_cache_stats() -> dict[str, int]:
+    """Contatori hit/miss della cache e dimensione dell'LRU."""
+    stats = {
+        labels["result"]: int(child.value)
+        for labels, child in geocode_cache_requests.series()
+    }
+    stats["memory_size"] = len(_memory_cache)
+    return stats
+
+
+async def _db_cache_get(key: str) -> tuple[float, float] | None:
+    min_created = datetime.now(timezone.utc) - timedelta(days=settings.GEOCODE_CACHE_DB_TTL_DAYS)
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(GeocodeCache.latitude, GeocodeCache.longitude)
+                .where(GeocodeCache.query_key == key)
+                .where(GeocodeCache.created_at >= min_created)
+            )
+            row = result.first()
+    except Exception:
+        # la cache non deve mai far fallire il geocoding
+        logger.warning("Lettura geocode_cache fallita per %r", key, exc_info=True)
+        return None
+    return (row[0], row[1]) if row else None
+
+
+async def _db_cache_set(key: str, lat: float, lon: float) -> None:
+    stmt = pg_insert(GeocodeCache).values(query_key=key, latitude=lat, longitude=lon)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[GeocodeCache.query_key],
+        set_={"latitude": lat, "longitude": lon, "created_at": stmt.excluded.created_at},
+    )
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(stmt)
+            await db.commit()
+    except Exception:
+        logger.warning("Scrittura geocode_cache fallita per %r", key, exc_info=True)
+
+
+async def _lookup(key: str, country: str, city: str, postcode: str, address: str) -> tuple[float, float]:
+    coords = await _db_cache_get(key)
+    if coords is not None:
+        geocode_cache_requests.labels(result="hit_db").inc()
+    else:
+        geocode_cache_requests.labels(result="miss").inc()
+        with geocode_upstream_duration.time():
+            coords = await get_geocoder().geocode(country, city, postcode, address)
+        await _db_cache_set(key, *coords)
+    _memory_cache.set(key, coords)
+    return coords
+
 
 async def geocode_address(
     country: str,
@@ -8,24 +103,28 @@ async def geocode_address(
     address: str
 ) -> tuple[float, float]:
     """
-    Geocodifica un indirizzo completo usando Nominatim e ritorna (lat, lon).
+    Geocodifica un indirizzo completo con il geocoder configurato e ritorna (lat, lon).
+    Passa prima dalla cache in memoria e da quella a DB; richieste identiche
+    concorrenti condividono un'unica chiamata esterna.
     Solleva un’eccezione se non trova risultati.
     """
-    query = f"{address}, {postcode} {city}, {country}"
-    url = "https://nominatim.openstreetmap.org/search"
-    params = {
-        "q": query,
-        "format": "json",
-        "limit": 1,
-    }
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.get(url, params=params, headers={
-            "User-Agent": "HelpProApp/1.0 (+https://your.domain)"
-        })
-        resp.raise_for_status()
-        data = resp.json()
-        if not data:
-            raise ValueError(f"Indirizzo non trovato: {query}")
-        lat = float(data[0]["lat"])
-        lon = float(data[0]["lon"])
-        return lat, lon
+    with geocode_duration.time():
+        return await _geocode_cached(country, city, postcode, address)
+
+
+async def _geocode_cached(country: str, city: str, postcode: str, address: str) -> tuple[float, float]:
+    key = normalize_address_key(country, city, postcode, address)
+    coords = _memory_cache.get(key)
+    if coords is not None:
+        geocode_cache_requests.labels(result="hit_memory").inc()
+        return coords
+
+    task = _inflight.get(key)
+    if task is not None:
+        geocode_cache_requests.labels(result="merged").inc()
+    else:
+        task = asyncio.ensure_future(_lookup(key, country, city, postcode, address))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # shield: se un chiamante viene cancellato gli altri continuano ad attendere
+    return await asyncio.shield(task)
@@ -0,0 +1,187 @@
+# app/utils/geocoder.py
+"""
+Servizio di geocoding condiviso: un client HTTP con pool di connessioni,
+rate limit token bucket, retry con backoff e budget di tempo per ogni chiamata al backend.
+Il backend è scelto con GEOCODER_BACKEND:
+- "nominatim": API Nominatim all'indirizzo GEOCODER_URL (pubblica o self-hosted)
+- "fake": coordinate deterministiche locali, per test e benchmark
+"""
+import asyncio
+import hashlib
+import logging
+import random
+
+import httpx
+
+from app.config import settings
+from app.utils.ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class AddressNotFound(ValueError):
+    pass
+
+
+class GeocoderBackend:
+    name = ""
+
+    async def geocode(self, country: str, city: str, postcode: str, address: str) -> tuple[float, float]:
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        pass
+
+
+class NominatimBackend(GeocoderBackend):
+    name = "nominatim"
+
+    def __init__(self, base_url: str, user_agent: str, request_timeout: float, max_connections: int):
+        self.url = base_url.rstrip("/") + "/search"
+        self.client = httpx.AsyncClient(
+            timeout=request_timeout,
+            headers={"User-Agent": user_agent},
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            ),
+        )
+
+    async def geocode(self, country: str, city: str, postcode: str, address: str) -> tuple[float, float]:
+        query = f"{address}, {postcode} {city}, {country}"
+        params = {
+            "q": query,
+            "format": "json",
+            "limit": 1,
+        }
+        resp = await self.client.get(self.url, params=params)
+        resp.raise_for_status()
+        data = resp.json()
+        if not data:
+            raise AddressNotFound(f"Indirizzo non trovato: {query}")
+        return float(data[0]["lat"]), float(data[0]["lon"])
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+class FakeBackend(GeocoderBackend):
+    """Coordinate stabili derivate dall'hash dell'indirizzo, dentro l'Italia."""
+    name = "fake"
+
+    def __init__(self, latency_s: float = 0.0):
+        self.latency_s = latency_s
+
+    async def geocode(self, country: str, city: str, postcode: str, address: str) -> tuple[float, float]:
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        digest = hashlib.sha256(f"{address}|{postcode}|{city}|{country}".lower().encode()).digest()
+        lat = 37.0 + int.from_bytes(digest[:4], "big") / 2**32 * 9.0
+        lon = 7.0 + int.from_bytes(digest[4:8], "big") / 2**32 * 11.0
+        return lat, lon
+
+
+class GeocoderService:
+    def __init__(
+        self,
+        backend: GeocoderBackend,
+        rate_per_s: float,
+        burst: int,
+        max_retries: int,
+        backoff_s: float,
+        timeout_s: float,
+    ):
+        self.backend = backend
+        self.bucket = TokenBucket(rate_per_s, burst)
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.timeout_s = timeout_s
+
+    async def geocode(self, country: str, city: str, postcode: str, address: str) -> tuple[float, float]:
+        for attempt in range(self.max_retries + 1):
+            # l'attesa del rate limit non consuma il budget della richiesta:
+            # con molti upload sul bucket condiviso le righe restano in coda,
+            # non falliscono
+            await self.bucket.acquire()
+            try:
+                return await self._attempt(country, city, postcode, address)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                    raise
+                delay = _retry_after(e.response) or self._backoff(attempt)
+            except (httpx.TransportError, TimeoutError):
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            logger.info("Geocoding ritentato tra %.1fs (tentativo %d)", delay, attempt + 1)
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    async def _attempt(self, country: str, city: str, postcode: str, address: str) -> tuple[float, float]:
+        """Una singola chiamata al backend, entro timeout_s."""
+        try:
+            return await asyncio.wait_for(
+                self.backend.geocode(country, city, postcode, address),
+                timeout=self.timeout_s
+            )
+        except asyncio.TimeoutError:
+            raise TimeoutError(
+                f"Geocoding oltre {self.timeout_s:g}s: {address}, {postcode} {city}, {country}"
+            ) from None
+
+    def _backoff(self, attempt: int) -> float:
+        return self.backoff_s * 2 ** attempt * (0.5 + random.random())
+
+    async def aclose(self) -> None:
+        await self.backend.aclose()
+
+
+def _retry_after(resp: httpx.Response) -> float | None:
+    try:
+        return float(resp.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+def build_backend(name: str) -> GeocoderBackend:
+    if name == "nominatim":
+        return NominatimBackend(
+            settings.GEOCODER_URL,
+            settings.GEOCODER_USER_AGENT,
+            settings.GEOCODER_REQUEST_TIMEOUT_S,
+            settings.GEOCODER_MAX_CONNECTIONS,
+        )
+    if name == "fake":
+        return FakeBackend(settings.GEOCODER_FAKE_LATENCY_S)
+    raise ValueError(f"GEOCODER_BACKEND sconosciuto: {name}")
+
+
+_geocoder: GeocoderService | None = None
+
+
+def start_geocoder(backend: GeocoderBackend | None = None) -> GeocoderService:
+    """Crea il servizio condiviso (chiamato allo startup dell'app)."""
+    global _geocoder
+    _geocoder = GeocoderService(
+        backend or build_backend(settings.GEOCODER_BACKEND),
+        rate_per_s=settings.GEOCODER_RATE_PER_S,
+        burst=settings.GEOCODER_BURST,
+        max_retries=settings.GEOCODER_MAX_RETRIES,
+        backoff_s=settings.GEOCODER_BACKOFF_S,
+        timeout_s=settings.GEOCODER_TIMEOUT_S,
+    )
+    return _geocoder
+
+
+async def stop_geocoder() -> None:
+    global _geocoder
+    if _geocoder is not None:
+        await _geocoder.aclose()
+        _geocoder = None
+
+
+def get_geocoder() -> GeocoderService:
+    # fuori dall'app (script, test) il servizio viene creato al primo uso
+    return _geocoder or start_geocoder()
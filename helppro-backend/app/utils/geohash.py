@@ -0,0 +1,66 @@
+# app/utils/geohash.py
+"""
+Geohash dei vendor. vendors.geohash ha precisione STORED_PRECISION: il
+prefisso di lunghezza p è la cella a precisione p (4 ≈ 39 km, 5 ≈ 4,9 km,
+6 ≈ 1,2 km di lato). Stessa codifica di ST_GeoHash di PostGIS, usata dalla
+migrazione per il backfill.
+"""
+STORED_PRECISION = 9
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def encode(lat: float, lon: float, precision: int = STORED_PRECISION) -> str:
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # i bit pari sono di longitudine
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                value = value * 2 + 1
+                lon_lo = mid
+            else:
+                value *= 2
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value = value * 2 + 1
+                lat_lo = mid
+            else:
+                value *= 2
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> tuple[float, float]:
+    """(altezza, larghezza) in gradi di una cella a `precision`."""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def with_neighbors(lat: float, lon: float, precision: int) -> list[str]:
+    """La cella del punto e le 8 adiacenti (meno ai poli)."""
+    dlat, dlon = cell_size(precision)
+    cells = []
+    for dy in (-1, 0, 1):
+        y = lat + dy * dlat
+        if not -90 <= y <= 90:
+            continue
+        for dx in (-1, 0, 1):
+            x = (lon + dx * dlon + 180) % 360 - 180
+            cell = encode(y, x, precision)
+            if cell not in cells:
+                cells.append(cell)
+    return cells
@@ -0,0 +1,251 @@
+# app/utils/metrics.py
+"""
+Metriche in-process minimali (counter, gauge e istogrammi con label) e
+middleware ASGI per le latenze delle route.
+Gli aggiornamenti costano un lock e qualche somma; il formato testuale
+Prometheus viene prodotto solo quando qualcuno legge /metrics.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._children: dict[tuple[str, ...], "_Metric"] = {}
+
+    def labels(self, **labels: str):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def series(self) -> list[tuple[dict[str, str], "_Metric"]]:
+        """Ritorna le coppie (label, valore) di tutte le serie."""
+        if not self.labelnames:
+            return [({}, self)]
+        return [
+            (dict(zip(self.labelnames, key)), child)
+            for key, child in list(self._children.items())
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, doc, labelnames)
+        self.value = 0.0
+
+    def _new_child(self):
+        return Counter(self.name, self.doc)
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        doc: str,
+        labelnames: tuple[str, ...] = (),
+        function: Callable[[], float] | None = None,
+    ):
+        super().__init__(name, doc, labelnames)
+        self.value = 0.0
+        # se presente, il valore è letto al momento dello scrape
+        self.function = function
+
+    def _new_child(self):
+        return Gauge(self.name, self.doc)
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        doc: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, doc, labelnames)
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def _new_child(self):
+        return Histogram(self.name, self.doc, buckets=self.buckets)
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> "_Timer":
+        """Context manager che osserva la durata del blocco in secondi."""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+REGISTRY: dict[str, _Metric] = {}
+
+
+def counter(name: str, doc: str, labelnames: tuple[str, ...] = ()) -> Counter:
+    return REGISTRY.setdefault(name, Counter(name, doc, labelnames))
+
+
+def histogram(
+    name: str,
+    doc: str,
+    labelnames: tuple[str, ...] = (),
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+) -> Histogram:
+    return REGISTRY.setdefault(name, Histogram(name, doc, labelnames, buckets))
+
+
+def gauge(
+    name: str,
+    doc: str,
+    labelnames: tuple[str, ...] = (),
+    function: Callable[[], float] | None = None,
+) -> Gauge:
+    return REGISTRY.setdefault(name, Gauge(name, doc, labelnames, function))
+
+
+# ——— Esposizione in formato testo Prometheus ——————————————
+def _fmt_labels(labels: dict[str, str], extra: dict[str, str] | None = None) -> str:
+    items = {**labels, **(extra or {})}
+    if not items:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in items.items()
+    )
+    return "{" + body + "}"
+
+
+def _fmt_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def render_prometheus() -> str:
+    lines: list[str] = []
+    for metric in list(REGISTRY.values()):
+        lines.append(f"# HELP {metric.name} {metric.doc}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for labels, child in metric.series():
+            if isinstance(child, Histogram):
+                cumulative = 0
+                for bound, count in zip(child.buckets, child.counts):
+                    cumulative += count
+                    lines.append(f"{metric.name}_bucket{_fmt_labels(labels, {'le': repr(bound)})} {cumulative}")
+                lines.append(f"{metric.name}_bucket{_fmt_labels(labels, {'le': '+Inf'})} {child.count}")
+                lines.append(f"{metric.name}_sum{_fmt_labels(labels)} {_fmt_value(child.sum)}")
+                lines.append(f"{metric.name}_count{_fmt_labels(labels)} {child.count}")
+            elif isinstance(child, Gauge):
+                lines.append(f"{metric.name}{_fmt_labels(labels)} {_fmt_value(child.get())}")
+            else:
+                lines.append(f"{metric.name}{_fmt_labels(labels)} {_fmt_value(child.value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ——— Middleware HTTP ——————————————————————————————————
+http_request_duration = histogram(
+    "http_request_duration_seconds",
+    "Latenza delle richieste HTTP per route",
+    labelnames=("method", "route"),
+)
+http_requests = counter(
+    "http_requests_total",
+    "Richieste HTTP per route e status",
+    labelnames=("method", "route", "status"),
+)
+http_in_flight = gauge(
+    "http_requests_in_flight",
+    "Richieste HTTP in corso",
+)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI puro: latenza per route (template del path) e richieste in corso."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec()
+            # il router di FastAPI salva la route trovata nello scope
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_request_duration.labels(method=method, route=path).observe(elapsed)
+            http_requests.labels(method=method, route=path, status=str(status)).inc()
@@ -0,0 +1,77 @@
+# app/utils/ratelimit.py
+import asyncio
+import math
+import time
+
+from app.utils.cache import TTLCache
+
+
+class TokenBucket:
+    """
+    Token bucket: `rate` token al secondo fino a un massimo di `capacity`.
+    rate <= 0 disattiva il limite.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """Preleva i token se disponibili; altrimenti ritorna i secondi da attendere."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return 0.0
+        return (tokens - self._tokens) / self.rate
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        # il lock mantiene l'ordine di arrivo tra i chiamanti in attesa
+        async with self._lock:
+            wait = self.try_acquire(tokens)
+            while wait > 0:
+                await asyncio.sleep(wait)
+                wait = self.try_acquire(tokens)
+
+
+class KeyedRateLimiter:
+    """
+    Un TokenBucket per chiave (IP, email, ...), in memoria e con numero di
+    chiavi limitato. Con un backend condiviso (app.utils.shared_cache) il
+    limite vale per tutti i worker e diventa a finestra fissa: al massimo
+    `capacity` richieste ogni capacity / rate secondi.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: float, max_keys: int, shared=None):
+        self.name = name
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self.shared = shared
+        # capacity / rate secondi dopo l'ultima richiesta un bucket è di nuovo
+        # pieno: inutile tenerlo
+        self._buckets = TTLCache(max_keys, self.capacity / rate if rate > 0 else 0)
+
+    async def hit(self, key: str) -> float:
+        """Consuma un token per `key`: 0 se permesso, altrimenti i secondi da attendere."""
+        if self.rate <= 0:
+            return 0.0
+        if self.shared is not None:
+            window = self.capacity / self.rate
+            slot = math.floor(time.time() / window)
+            count = await self.shared.incr(f"ratelimit:{self.name}:{key}:{slot}", ttl=window)
+            if count <= self.capacity:
+                return 0.0
+            return (slot + 1) * window - time.time()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.capacity)
+        # scadenza rinnovata a ogni richiesta: un client che insiste non
+        # deve ritrovarsi un bucket nuovo capacity / rate secondi dopo il primo
+        self._buckets.set(key, bucket)
+        return bucket.try_acquire()
@@ -0,0 +1,207 @@
+# app/utils/search_cache.py
+"""
+Cache delle ricerche per raggio.
+La chiave è (cella di SEARCH_CACHE_CELL_DEG gradi, raggio arrotondato al
+bucket superiore). Il valore sono i vendor nel raggio del bucket, allargato
+di mezza diagonale di cella, attorno al centro della cella: contiene quindi
+tutti i risultati di qualunque ricerca della stessa cella e raggio <= bucket,
+che vengono poi filtrati esattamente per la richiesta.
+
+Ogni voce ricorda la versione delle tessere grossolane (TILE_DEG) che copre.
+Una scrittura di vendor incrementa la versione della sua tessera e
+invalida così solo le voci delle zone interessate.
+
+Le zone con più di SEARCH_CACHE_MAX_ITEMS candidati non entrano in cache:
+per la durata del TTL la chiave ricorda solo che la zona è troppo densa,
+e le ricerche vanno direttamente a DB. L'LRU locale pesa le voci per numero
+di candidati e ne tiene al massimo SEARCH_CACHE_MAX_ROWS.
+"""
+import logging
+import math
+
+from app.config import settings
+from app.utils import metrics
+from app.utils.cache import TTLCache
+from app.utils.fastjson import dumps
+from app.utils.shared_cache import build_shared_backend
+from app.utils.spatial_index import METERS_PER_DEG, haversine_m
+
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
+logger = logging.getLogger(__name__)
+
+TILE_DEG = 0.5
+
+# esito di SearchCache.get per le zone troppo dense per la cache
+TOO_DENSE = object()
+
+search_cache_requests = metrics.counter(
+    "search_cache_requests_total",
+    "Ricerche per raggio per esito della cache (hit, miss, bypass)",
+    labelnames=("result",)
+)
+
+
+def _tile_key(ty: int, tx: int) -> str:
+    return f"search:tile:{ty}:{tx}"
+
+
+def _weight(entry: dict) -> int:
+    return 1 + len(entry.get("vendors", ()))
+
+
+class SearchCache:
+    def __init__(
+        self,
+        cell_deg: float,
+        buckets_km: list[float],
+        ttl: float,
+        size: int,
+        shared=None,
+        max_rows: int | None = None,
+    ):
+        self.cell_deg = cell_deg
+        self.buckets_km = sorted(buckets_km)
+        self.ttl = ttl
+        self.lru = TTLCache(size, ttl, maxweight=max_rows)
+        self.shared = shared
+        self._local_versions: dict[str, int] = {}
+
+    def key_for(self, lat: float, lon: float, radius_km: float) -> tuple[str, float, float, float] | None:
+        """(chiave, lat centro, lon centro, raggio candidati km) oppure None se non cacheabile."""
+        bucket = next((b for b in self.buckets_km if b >= radius_km), None)
+        if bucket is None:
+            return None
+        cy, cx = math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+        center_lat = (cy + 0.5) * self.cell_deg
+        center_lon = (cx + 0.5) * self.cell_deg
+        half_diag_km = self.cell_deg * METERS_PER_DEG * math.sqrt(2) / 2 / 1000
+        return f"search:{cy}:{cx}:{bucket:g}", center_lat, center_lon, bucket + half_diag_km
+
+    @staticmethod
+    def _tiles(lat: float, lon: float, radius_km: float) -> list[str]:
+        dlat = radius_km * 1000 / METERS_PER_DEG
+        dlon = dlat / max(math.cos(math.radians(min(abs(lat) + dlat, 89.9))), 1e-6)
+        return [
+            _tile_key(ty, tx)
+            for ty in range(math.floor((lat - dlat) / TILE_DEG), math.floor((lat + dlat) / TILE_DEG) + 1)
+            for tx in range(math.floor((lon - dlon) / TILE_DEG), math.floor((lon + dlon) / TILE_DEG) + 1)
+        ]
+
+    async def _versions(self, tiles: list[str]) -> list[int]:
+        if self.shared is not None:
+            return await self.shared.get_counters(tiles)
+        return [self._local_versions.get(t, 0) for t in tiles]
+
+    async def get(self, key: str) -> list[dict] | object | None:
+        """Candidati in cache, TOO_DENSE per le zone da non cacheare, None se assente."""
+        entry = self.lru.get(key)
+        if entry is None and self.shared is not None:
+            raw = await self.shared.get(key)
+            if raw is not None:
+                entry = _json.loads(raw)
+                self.lru.set(key, entry, weight=_weight(entry))
+        if entry is None:
+            return None
+        if entry.get("dense"):
+            # la densità non cambia a ogni scrittura: il marker vale per tutto il TTL
+            return TOO_DENSE
+        if await self._versions(entry["tiles"]) != entry["versions"]:
+            self.lru.pop(key)
+            return None
+        return entry["vendors"]
+
+    async def prepare(self, center_lat: float, center_lon: float, radius_km: float) -> tuple[list[str], list[int]]:
+        """
+        Tessere e versioni da salvare con la voce, lette prima della query:
+        una scrittura concorrente renderà la voce subito obsoleta.
+        """
+        tiles = self._tiles(center_lat, center_lon, radius_km)
+        return tiles, await self._versions(tiles)
+
+    async def store(self, key: str, tiles: list[str], versions: list[int], vendors: list[dict]) -> None:
+        entry = {"tiles": tiles, "versions": versions, "vendors": vendors}
+        self.lru.set(key, entry, weight=_weight(entry))
+        if self.shared is not None:
+            await self.shared.set(key, dumps(entry), ttl=self.ttl)
+
+    async def store_dense(self, key: str) -> None:
+        """Segna la chiave come troppo densa: fino al TTL niente query dei candidati."""
+        entry = {"dense": True}
+        self.lru.set(key, entry)
+        if self.shared is not None:
+            await self.shared.set(key, dumps(entry), ttl=self.ttl)
+
+    async def invalidate_points(self, points: list[tuple[float, float]]) -> None:
+        """Invalida le voci che coprono le tessere dei punti indicati."""
+        tiles = {_tile_key(math.floor(lat / TILE_DEG), math.floor(lon / TILE_DEG)) for lat, lon in points}
+        for tile in tiles:
+            if self.shared is not None:
+                await self.shared.incr(tile)
+            else:
+                self._local_versions[tile] = self._local_versions.get(tile, 0) + 1
+
+    async def aclose(self) -> None:
+        if self.shared is not None:
+            await self.shared.aclose()
+
+
+def filter_candidates(
+    vendors: list[dict],
+    lat: float,
+    lon: float,
+    radius_km: float,
+    limit: int,
+    after_id: int | None = None,
+) -> list[dict]:
+    """Risultato esatto della richiesta a partire dai candidati in cache (ordinati per id)."""
+    radius_m = radius_km * 1000
+    out = []
+    for v in vendors:
+        if after_id is not None and v["id"] <= after_id:
+            continue
+        if haversine_m(lat, lon, v["latitude"], v["longitude"]) <= radius_m:
+            out.append(v)
+            if len(out) == limit:
+                break
+    return out
+
+
+_cache: SearchCache | None = None
+
+
+def get_cache() -> SearchCache | None:
+    return _cache
+
+
+def start() -> None:
+    global _cache
+    if not settings.SEARCH_CACHE_ENABLED:
+        return
+    _cache = SearchCache(
+        settings.SEARCH_CACHE_CELL_DEG,
+        settings.SEARCH_CACHE_RADIUS_BUCKETS_KM,
+        settings.SEARCH_CACHE_TTL_S,
+        settings.SEARCH_CACHE_SIZE,
+        shared=build_shared_backend(settings.SHARED_CACHE_URL),
+        max_rows=settings.SEARCH_CACHE_MAX_ROWS,
+    )
+
+
+async def stop() -> None:
+    global _cache
+    if _cache is not None:
+        await _cache.aclose()
+        _cache = None
+
+
+async def invalidate_points(points: list[tuple[float, float]]) -> None:
+    if _cache is None or not points:
+        return
+    try:
+        await _cache.invalidate_points(points)
+    except Exception:
+        logger.warning("Invalidazione cache ricerche fallita", exc_info=True)
@@ -0,0 +1,132 @@
+# app/utils/shared_cache.py
+"""
+Backend chiave/valore condiviso tra i worker, scelto con SHARED_CACHE_URL:
+- "redis://..." usa Redis (pacchetto `redis`, opzionale)
+- "memory://" usa un dizionario in-process con la stessa interfaccia,
+  da usare nei test o con un solo worker
+"""
+import time
+from typing import Iterable
+
+
+class LocalBackend:
+    def __init__(self):
+        self._data: dict[str, tuple[bytes, float | None]] = {}
+        self._counters: dict[str, int] = {}
+        self._expiry: dict[str, float] = {}
+
+    def _get(self, key: str) -> bytes | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def get(self, key: str) -> bytes | None:
+        return self._get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float | None = None) -> None:
+        self._data[key] = (value, None if ttl is None else time.monotonic() + ttl)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._data.pop(key, None)
+
+    async def incr(self, key: str, ttl: float | None = None) -> int:
+        now = time.monotonic()
+        expires_at = self._expiry.get(key)
+        if expires_at is not None and expires_at < now:
+            self._counters.pop(key, None)
+            del self._expiry[key]
+        self._counters[key] = self._counters.get(key, 0) + 1
+        if ttl is not None and key not in self._expiry:
+            self._expiry[key] = now + ttl
+            self._purge_expired(now)
+        return self._counters[key]
+
+    async def incr_many(self, keys: Iterable[str], ttl: float) -> None:
+        """Incrementa le chiavi e ne rinnova la scadenza a `ttl` secondi da ora."""
+        now = time.monotonic()
+        before = len(self._expiry)
+        for key in keys:
+            expires_at = self._expiry.get(key)
+            if expires_at is not None and expires_at < now:
+                self._counters.pop(key, None)
+            self._counters[key] = self._counters.get(key, 0) + 1
+            self._expiry[key] = now + ttl
+        if len(self._expiry) // 1024 != before // 1024:
+            self._purge_expired(now, force=True)
+
+    def _purge_expired(self, now: float, force: bool = False) -> None:
+        # i contatori con scadenza (rate limit, versioni) vanno rimossi
+        # o crescono senza limite
+        if not force and len(self._expiry) % 1024:
+            return
+        for key in [k for k, exp in self._expiry.items() if exp < now]:
+            self._counters.pop(key, None)
+            del self._expiry[key]
+
+    async def get_counters(self, keys: list[str]) -> list[int]:
+        now = time.monotonic()
+        return [
+            0 if self._expiry.get(k, now) < now else self._counters.get(k, 0)
+            for k in keys
+        ]
+
+    async def aclose(self) -> None:
+        pass
+
+
+class RedisBackend:
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("SHARED_CACHE_URL redis:// richiede il pacchetto 'redis'") from e
+        self.client = redis.from_url(url)
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float | None = None) -> None:
+        await self.client.set(key, value, px=None if ttl is None else int(ttl * 1000))
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.client.delete(*keys)
+
+    async def incr(self, key: str, ttl: float | None = None) -> int:
+        if ttl is None:
+            return await self.client.incr(key)
+        async with self.client.pipeline(transaction=True) as pipe:
+            # SET NX: la scadenza parte dal primo incremento della chiave
+            _, count = await pipe.set(key, 0, px=int(ttl * 1000), nx=True).incr(key).execute()
+        return count
+
+    async def incr_many(self, keys: Iterable[str], ttl: float) -> None:
+        # un solo round trip per tutte le chiavi
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.incr(key).pexpire(key, int(ttl * 1000))
+            await pipe.execute()
+
+    async def get_counters(self, keys: list[str]) -> list[int]:
+        if not keys:
+            return []
+        return [int(v or 0) for v in await self.client.mget(keys)]
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+def build_shared_backend(url: str | None):
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return LocalBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"SHARED_CACHE_URL non supportato: {url}")
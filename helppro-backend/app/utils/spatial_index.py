@@ -0,0 +1,307 @@
+# app/utils/spatial_index.py
+"""
+Read model in memoria dei vendor per le ricerche geografiche.
+Coordinate, id e categorie stanno in array compatti, indicizzati da una
+griglia di celle di SPATIAL_INDEX_CELL_DEG gradi; i campi di visualizzazione
+sono tuple. L'indice viene caricato allo startup, aggiornato dalle scritture
+di questo worker e ricaricato periodicamente per vedere quelle degli altri.
+Se è più vecchio di SPATIAL_INDEX_MAX_STALENESS_S le ricerche tornano al DB.
+"""
+import asyncio
+import heapq
+import logging
+import math
+import time
+from array import array
+
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import CategoryEnum, Vendor
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEG = math.pi * EARTH_RADIUS_M / 180
+CATEGORIES = [c.value for c in CategoryEnum]
+_CATEGORY_CODE = {c: i for i, c in enumerate(CATEGORIES)}
+# campi restituiti oltre a id, category, latitude, longitude
+DISPLAY_FIELDS = ("account_id", "company_name", "country", "city", "postcode", "address")
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+class VendorSpatialIndex:
+    def __init__(self, cell_deg: float):
+        self.cell_deg = cell_deg
+        self.ids = array("q")
+        self.lats = array("d")
+        self.lons = array("d")
+        self.categories = array("b")
+        self.display: list[tuple] = []
+        self.pos_by_id: dict[int, int] = {}
+        self.cells: dict[tuple[int, int], list[int]] = {}
+        # estensione delle celle occupate: (min_y, max_y, min_x, max_x)
+        self.extent: tuple[int, int, int, int] | None = None
+        self.loaded_at: float | None = None
+
+    def __len__(self) -> int:
+        return len(self.pos_by_id)
+
+    def _cell(self, lat: float, lon: float) -> tuple[int, int]:
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def upsert(self, vendor: dict) -> None:
+        """Aggiunge o aggiorna un vendor (dict con i campi di VendorOut)."""
+        lat, lon = vendor["latitude"], vendor["longitude"]
+        display = tuple(vendor[f] for f in DISPLAY_FIELDS)
+        category = _CATEGORY_CODE[str(getattr(vendor["category"], "value", vendor["category"]))]
+        pos = self.pos_by_id.get(vendor["id"])
+        if pos is None:
+            pos = len(self.ids)
+            self.ids.append(vendor["id"])
+            self.lats.append(lat)
+            self.lons.append(lon)
+            self.categories.append(category)
+            self.display.append(display)
+            self.pos_by_id[vendor["id"]] = pos
+        else:
+            old_cell = self._cell(self.lats[pos], self.lons[pos])
+            self.cells[old_cell].remove(pos)
+            self.lats[pos], self.lons[pos] = lat, lon
+            self.categories[pos] = category
+            self.display[pos] = display
+        cy, cx = self._cell(lat, lon)
+        self.cells.setdefault((cy, cx), []).append(pos)
+        if self.extent is None:
+            self.extent = (cy, cy, cx, cx)
+        else:
+            y0, y1, x0, x1 = self.extent
+            self.extent = (min(y0, cy), max(y1, cy), min(x0, cx), max(x1, cx))
+
+    def _row(self, pos: int) -> dict:
+        row = dict(zip(DISPLAY_FIELDS, self.display[pos]))
+        row.update(
+            id=self.ids[pos],
+            category=CATEGORIES[self.categories[pos]],
+            latitude=self.lats[pos],
+            longitude=self.lons[pos],
+        )
+        return row
+
+    def _cells_in_bbox(self, lat: float, lon: float, radius_m: float):
+        if self.extent is None:
+            return
+        dlat = radius_m / METERS_PER_DEG
+        dlon = radius_m / (METERS_PER_DEG * max(math.cos(math.radians(min(abs(lat) + dlat, 89.9))), 1e-6))
+        c0 = self._cell(lat - dlat, lon - dlon)
+        c1 = self._cell(lat + dlat, lon + dlon)
+        # solo le celle occupate: vicino ai poli dlon cresce senza limite
+        y0, y1, x0, x1 = self.extent
+        for cy in range(max(c0[0], y0), min(c1[0], y1) + 1):
+            for cx in range(max(c0[1], x0), min(c1[1], x1) + 1):
+                positions = self.cells.get((cy, cx))
+                if positions:
+                    yield positions
+
+    def radius(
+        self,
+        lat: float,
+        lon: float,
+        radius_km: float,
+        limit: int,
+        after_id: int | None = None,
+    ) -> list[dict]:
+        """Stessa semantica di crud.get_vendors_in_radius: ordine per id, keyset su after_id."""
+        radius_m = radius_km * 1000
+        found = []
+        for positions in self._cells_in_bbox(lat, lon, radius_m):
+            for pos in positions:
+                vid = self.ids[pos]
+                if after_id is not None and vid <= after_id:
+                    continue
+                if haversine_m(lat, lon, self.lats[pos], self.lons[pos]) <= radius_m:
+                    found.append((vid, pos))
+        return [self._row(pos) for _, pos in heapq.nsmallest(limit, found)]
+
+    def nearest(
+        self,
+        lat: float,
+        lon: float,
+        k: int,
+        category: str | None = None,
+        max_radius_km: float | None = None,
+    ) -> list[tuple[dict, float]]:
+        """I `k` più vicini, esplorando la griglia ad anelli concentrici."""
+        if self.extent is None:
+            return []
+        code = None if category is None else _CATEGORY_CODE[str(getattr(category, "value", category))]
+        max_m = math.inf if max_radius_km is None else max_radius_km * 1000
+        cy0, cx0 = self._cell(lat, lon)
+        y0, y1, x0, x1 = self.extent
+        max_ring = max(abs(cy0 - y0), abs(cy0 - y1), abs(cx0 - x0), abs(cx0 - x1))
+
+        best: list[tuple[float, int]] = []  # max-heap (-distanza, pos)
+        for ring in range(max_ring + 1):
+            # tra il punto e l'anello ci sono almeno ring-1 celle intere,
+            # larghe al minimo quanto alla latitudine più lontana dall'equatore
+            far_lat = min(abs(lat) + ring * self.cell_deg, 89.9)
+            lower_bound = (ring - 1) * self.cell_deg * METERS_PER_DEG * math.cos(math.radians(far_lat))
+            if lower_bound > max_m or (len(best) == k and lower_bound > -best[0][0]):
+                break
+            # l'anello ristretto all'estensione delle celle occupate: da un
+            # punto lontano i primi anelli non costano nulla
+            for cy in range(max(cy0 - ring, y0), min(cy0 + ring, y1) + 1):
+                if abs(cy - cy0) == ring:
+                    xs = range(max(cx0 - ring, x0), min(cx0 + ring, x1) + 1)
+                else:
+                    xs = [cx for cx in (cx0 - ring, cx0 + ring) if x0 <= cx <= x1]
+                for cx in xs:
+                    for pos in self.cells.get((cy, cx), ()):
+                        if code is not None and self.categories[pos] != code:
+                            continue
+                        d = haversine_m(lat, lon, self.lats[pos], self.lons[pos])
+                        if d > max_m:
+                            continue
+                        if len(best) < k:
+                            heapq.heappush(best, (-d, pos))
+                        elif d < -best[0][0]:
+                            heapq.heapreplace(best, (-d, pos))
+        return [(self._row(pos), -neg_d) for neg_d, pos in sorted(best, reverse=True)]
+
+    def _positions_in_bbox(self, bbox: tuple[float, float, float, float]):
+        if self.extent is None:
+            return
+        min_lon, min_lat, max_lon, max_lat = bbox
+        y0, y1, x0, x1 = self.extent
+        c0y, c0x = self._cell(min_lat, min_lon)
+        c1y, c1x = self._cell(max_lat, max_lon)
+        for cy in range(max(c0y, y0), min(c1y, y1) + 1):
+            for cx in range(max(c0x, x0), min(c1x, x1) + 1):
+                for pos in self.cells.get((cy, cx), ()):
+                    if min_lat <= self.lats[pos] <= max_lat and min_lon <= self.lons[pos] <= max_lon:
+                        yield pos
+
+    def in_bbox(self, bbox: tuple[float, float, float, float], limit: int) -> list[dict]:
+        """Stessa semantica di crud.get_vendors_in_bbox."""
+        found = heapq.nsmallest(limit, ((self.ids[pos], pos) for pos in self._positions_in_bbox(bbox)))
+        return [self._row(pos) for _, pos in found]
+
+    def clusters(self, bbox: tuple[float, float, float, float], grid_deg: float) -> list[dict]:
+        """Stessa semantica di crud.get_vendor_clusters."""
+        acc: dict[tuple[int, int], list] = {}
+        for pos in self._positions_in_bbox(bbox):
+            lat, lon = self.lats[pos], self.lons[pos]
+            key = (math.floor(lat / grid_deg), math.floor(lon / grid_deg))
+            cell = acc.get(key)
+            if cell is None:
+                cell = acc[key] = [0.0, 0.0, 0, [0] * len(CATEGORIES)]
+            cell[0] += lat
+            cell[1] += lon
+            cell[2] += 1
+            cell[3][self.categories[pos]] += 1
+        return [
+            {
+                "latitude": sum_lat / n,
+                "longitude": sum_lon / n,
+                "count": n,
+                "categories": {CATEGORIES[i]: c for i, c in enumerate(counts) if c},
+            }
+            for sum_lat, sum_lon, n, counts in acc.values()
+        ]
+
+
+async def load_index(cell_deg: float) -> VendorSpatialIndex:
+    index = VendorSpatialIndex(cell_deg)
+    stmt = select(
+        Vendor.id,
+        Vendor.category,
+        func.ST_Y(Vendor.location).label("latitude"),
+        func.ST_X(Vendor.location).label("longitude"),
+        *(getattr(Vendor, f) for f in DISPLAY_FIELDS),
+    ).where(Vendor.location.isnot(None))
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=5000))
+        async for partition in result.mappings().partitions():
+            for row in partition:
+                index.upsert(row)
+    index.loaded_at = time.monotonic()
+    return index
+
+
+_index: VendorSpatialIndex | None = None
+# scritture arrivate durante un ricaricamento, da riapplicare dopo lo swap
+_pending: list[dict] | None = None
+_refresh_task: asyncio.Task | None = None
+
+
+def get_index() -> VendorSpatialIndex | None:
+    """L'indice se abilitato e abbastanza recente, altrimenti None (usa il DB)."""
+    if _index is None or _index.loaded_at is None:
+        return None
+    if time.monotonic() - _index.loaded_at > settings.SPATIAL_INDEX_MAX_STALENESS_S:
+        return None
+    return _index
+
+
+def on_vendors_written(vendors: list[dict]) -> None:
+    """Aggiornamento incrementale dopo create_vendor_profile e bulk upload."""
+    # anche durante il primo caricamento, quando _index è ancora None
+    if _pending is not None:
+        _pending.extend(vendors)
+    if _index is None:
+        return
+    for v in vendors:
+        _index.upsert(v)
+
+
+async def refresh() -> None:
+    global _index, _pending
+    _pending = []
+    try:
+        index = await load_index(settings.SPATIAL_INDEX_CELL_DEG)
+        for v in _pending:
+            index.upsert(v)
+        _index = index
+        logger.info("Indice spaziale caricato: %d vendor", len(index))
+    finally:
+        _pending = None
+
+
+async def _refresh_loop() -> None:
+    # il primo caricamento avviene qui e non blocca l'avvio:
+    # finché non è pronto le ricerche usano il DB
+    interval = max(settings.SPATIAL_INDEX_MAX_STALENESS_S / 2, 1)
+    while True:
+        try:
+            await refresh()
+        except Exception:
+            logger.warning("Caricamento indice spaziale fallito", exc_info=True)
+        await asyncio.sleep(interval)
+
+
+def is_ready() -> bool:
+    """True se l'indice è disabilitato oppure caricato e recente."""
+    return not settings.SPATIAL_INDEX_ENABLED or get_index() is not None
+
+
+async def start() -> None:
+    global _refresh_task
+    if not settings.SPATIAL_INDEX_ENABLED:
+        return
+    _refresh_task = asyncio.create_task(_refresh_loop())
+
+
+async def stop() -> None:
+    global _index, _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        _refresh_task = None
+    _index = None
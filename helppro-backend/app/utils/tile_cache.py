@@ -0,0 +1,146 @@
+# app/utils/tile_cache.py
+"""
+Cache delle vector tile dei vendor (/vendors/tiles/{z}/{x}/{y}.mvt), fino
+allo zoom TILE_CACHE_MAX_ZOOM: oltre, le tile sono piccole e si generano
+a ogni richiesta.
+Con SHARED_CACHE_URL tile e versioni sono condivise tra i worker: ogni tile
+ha un contatore di versione, una scrittura di vendor incrementa (in un solo
+round trip) quelli delle tile che contengono i punti e le tile in cache con
+versione diversa vengono rigenerate. I contatori scadono dopo due TTL delle
+tile dall'ultimo incremento: a quel punto nessuna tile salvata prima
+dell'incremento è ancora in cache. Senza backend condiviso le tile
+interessate sono semplicemente rimosse dall'LRU del worker che scrive:
+gli altri worker le vedono aggiornate solo alla scadenza, per questo il
+TTL scende a TILE_CACHE_LOCAL_TTL_S. Con più worker serve SHARED_CACHE_URL.
+"""
+import logging
+import math
+
+from app.config import settings
+from app.utils import metrics
+from app.utils.cache import TTLCache
+from app.utils.shared_cache import build_shared_backend
+
+logger = logging.getLogger(__name__)
+
+MAX_ZOOM = 22
+# latitudine massima della proiezione Web Mercator
+MAX_LAT = 85.0511287798
+
+tile_cache_requests = metrics.counter(
+    "tile_cache_requests_total",
+    "Richieste di vector tile per esito della cache (hit, miss)",
+    labelnames=("result",)
+)
+
+
+def tile_for_point(lat: float, lon: float, z: int) -> tuple[int, int]:
+    """(x, y) della tile XYZ di zoom `z` che contiene il punto."""
+    n = 2 ** z
+    lat = max(-MAX_LAT, min(MAX_LAT, lat))
+    x = math.floor((lon + 180) / 360 * n)
+    y = math.floor((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def _key(z: int, x: int, y: int) -> str:
+    return f"mvt:{z}:{x}:{y}"
+
+
+def _version_key(z: int, x: int, y: int) -> str:
+    return f"mvt:ver:{z}:{x}:{y}"
+
+
+class TileCache:
+    def __init__(self, ttl: float, size: int, max_zoom: int = MAX_ZOOM, shared=None):
+        self.ttl = ttl
+        self.lru = TTLCache(size, ttl)
+        self.max_zoom = min(max_zoom, MAX_ZOOM)
+        self.shared = shared
+
+    def cacheable(self, z: int) -> bool:
+        return z <= self.max_zoom
+
+    async def version(self, z: int, x: int, y: int) -> int:
+        if self.shared is None:
+            return 0
+        return (await self.shared.get_counters([_version_key(z, x, y)]))[0]
+
+    async def get(self, z: int, x: int, y: int) -> bytes | None:
+        key = _key(z, x, y)
+        entry = self.lru.get(key)
+        if entry is None and self.shared is not None:
+            raw = await self.shared.get(key)
+            if raw is not None:
+                # versione (8 byte) seguita dal contenuto della tile
+                entry = (int.from_bytes(raw[:8], "big"), raw[8:])
+                self.lru.set(key, entry)
+        if entry is None:
+            return None
+        version, tile = entry
+        if await self.version(z, x, y) != version:
+            self.lru.pop(key)
+            return None
+        return tile
+
+    async def store(self, z: int, x: int, y: int, version: int, tile: bytes) -> None:
+        key = _key(z, x, y)
+        self.lru.set(key, (version, tile))
+        if self.shared is not None:
+            await self.shared.set(key, version.to_bytes(8, "big") + tile, ttl=self.ttl)
+
+    async def invalidate_points(self, points: list[tuple[float, float]]) -> None:
+        """Invalida, a ogni zoom in cache, le tile che contengono i punti indicati."""
+        tiles = {
+            (z, *tile_for_point(lat, lon, z))
+            for lat, lon in points
+            for z in range(self.max_zoom + 1)
+        }
+        if self.shared is None:
+            for tile in tiles:
+                self.lru.pop(_key(*tile))
+            return
+        await self.shared.incr_many([_version_key(*tile) for tile in tiles], ttl=2 * self.ttl)
+
+    async def aclose(self) -> None:
+        if self.shared is not None:
+            await self.shared.aclose()
+
+
+_cache: TileCache | None = None
+
+
+def get_cache() -> TileCache | None:
+    return _cache
+
+
+def start() -> None:
+    global _cache
+    if not settings.TILE_CACHE_ENABLED:
+        return
+    shared = build_shared_backend(settings.SHARED_CACHE_URL)
+    ttl = settings.TILE_CACHE_TTL_S
+    if shared is None:
+        ttl = min(ttl, settings.TILE_CACHE_LOCAL_TTL_S)
+    _cache = TileCache(
+        ttl,
+        settings.TILE_CACHE_SIZE,
+        max_zoom=settings.TILE_CACHE_MAX_ZOOM,
+        shared=shared,
+    )
+
+
+async def stop() -> None:
+    global _cache
+    if _cache is not None:
+        await _cache.aclose()
+        _cache = None
+
+
+async def invalidate_points(points: list[tuple[float, float]]) -> None:
+    if _cache is None or not points:
+        return
+    try:
+        await _cache.invalidate_points(points)
+    except Exception:
+        logger.warning("Invalidazione cache tile fallita", exc_info=True)
@@ -0,0 +1,78 @@
+# app/utils/user_cache.py
+"""
+Cache degli utenti autenticati, per subject del token (email).
+TTL breve: una modifica all'utente (es. `disabled`) è vista dalle richieste
+già autenticate al più dopo USER_CACHE_TTL_S secondi.
+
+Con SHARED_CACHE_URL ogni email ha un contatore di versione condiviso:
+le scritture lo incrementano con invalidate() e le voci salvate con una
+versione diversa vengono scartate subito su tutti i worker. Senza backend
+condiviso invalidate() vale solo per il worker che scrive.
+"""
+import logging
+
+from app import schemas
+from app.config import settings
+from app.utils import metrics
+from app.utils.cache import TTLCache
+from app.utils.shared_cache import build_shared_backend
+
+logger = logging.getLogger(__name__)
+
+_cache = TTLCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL_S)
+_shared = None
+
+user_cache_requests = metrics.counter(
+    "user_cache_requests_total",
+    "Risoluzioni token -> utente per esito della cache (hit, miss)",
+    labelnames=("result",)
+)
+
+
+def _version_key(email: str) -> str:
+    return f"user:version:{email}"
+
+
+async def version(email: str) -> int:
+    """Versione corrente dell'utente, da leggere prima della query e passare a put()."""
+    if _shared is None:
+        return 0
+    return (await _shared.get_counters([_version_key(email)]))[0]
+
+
+async def get(email: str) -> schemas.User | None:
+    entry = _cache.get(email)
+    if entry is not None and await version(email) != entry[0]:
+        _cache.pop(email)
+        entry = None
+    user_cache_requests.labels(result="miss" if entry is None else "hit").inc()
+    return None if entry is None else entry[1]
+
+
+def put(email: str, user: schemas.User, version: int = 0) -> None:
+    _cache.set(email, (version, user))
+
+
+async def invalidate(email: str) -> None:
+    """Da chiamare dopo ogni scrittura dell'utente."""
+    _cache.pop(email)
+    if _shared is None:
+        return
+    try:
+        # senza scadenza, come le versioni della cache ricerche: un contatore
+        # ripartito da 0 riconvaliderebbe voci vecchie
+        await _shared.incr(_version_key(email))
+    except Exception:
+        logger.warning("Invalidazione cache utenti fallita", exc_info=True)
+
+
+def start() -> None:
+    global _shared
+    _shared = build_shared_backend(settings.SHARED_CACHE_URL)
+
+
+async def stop() -> None:
+    global _shared
+    if _shared is not None:
+        await _shared.aclose()
+        _shared = None
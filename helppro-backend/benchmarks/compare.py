@@ -0,0 +1,57 @@
+# benchmarks/compare.py
+"""
+Confronta due report di benchmarks.load.
+
+Uso:
+    python -m benchmarks.compare base.json head.json [--threshold 10]
+Stampa le variazioni percentuali per endpoint ed esce con codice 1 se
+una latenza p95 peggiora oltre la soglia.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ("rps", "p50_ms", "p95_ms", "p99_ms", "errors")
+
+
+def pct(old: float, new: float) -> float | None:
+    if not old:
+        return None
+    return round((new - old) / old * 100, 1)
+
+
+def compare(base: dict, head: dict) -> dict:
+    out = {}
+    for name, new in head["endpoints"].items():
+        old = base["endpoints"].get(name)
+        if old is None:
+            continue
+        out[name] = {m: {"base": old[m], "head": new[m], "change_pct": pct(old[m], new[m])} for m in METRICS}
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0, help="peggioramento p95 tollerato in %%")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    diff = compare(base, head)
+    print(json.dumps({"base": base.get("commit"), "head": head.get("commit"), "endpoints": diff}, indent=2))
+    regressions = [
+        name for name, d in diff.items()
+        if d["p95_ms"]["change_pct"] is not None and d["p95_ms"]["change_pct"] > args.threshold
+    ]
+    if regressions:
+        print(f"Regressioni p95: {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
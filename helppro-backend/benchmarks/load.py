@@ -0,0 +1,237 @@
+# benchmarks/load.py
+"""
+Benchmark di carico delle route principali, con risultati in JSON
+confrontabili tra commit (vedi benchmarks/compare.py).
+
+Uso (da helppro-backend/, dopo benchmarks.seed):
+    python -m benchmarks.load --requests 2000 --concurrency 50 --out bench.json
+In assenza di --base-url l'app gira in-process (httpx ASGITransport) con
+GEOCODER_BACKEND=fake; contro un server avviato a parte, lanciarlo con
+GEOCODER_BACKEND=fake e GEOCODER_RATE_PER_S=0 per non chiamare Nominatim né
+misurare il token bucket del geocoder (e LOGIN_RATE_PER_IP_PER_MIN=0,
+LOGIN_RATE_PER_EMAIL_PER_MIN=0, SIGNUP_RATE_PER_IP_PER_MIN=0 per non misurare
+il rate limit di login):
+    python -m benchmarks.load --base-url http://localhost:8000
+
+Per ogni endpoint: richieste, errori, throughput e latenze p50/p95/p99 in ms.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import statistics
+import subprocess
+import time
+import uuid
+
+import httpx
+
+# prima di importare l'app: in-process il geocoding usa il backend finto,
+# senza il limite di 1 richiesta/s pensato per Nominatim (bulk_vendors
+# misurerebbe il token bucket invece della pipeline)
+os.environ.setdefault("GEOCODER_BACKEND", "fake")
+os.environ.setdefault("GEOCODER_RATE_PER_S", "0")
+# ...e senza rate limit di login: tutte le richieste partono dallo stesso IP
+for _name in ("LOGIN_RATE_PER_IP_PER_MIN", "LOGIN_RATE_PER_EMAIL_PER_MIN", "SIGNUP_RATE_PER_IP_PER_MIN"):
+    os.environ.setdefault(_name, "0")
+
+from benchmarks.seed import BENCH_PASSWORD, user_email
+
+ENDPOINTS = ("search", "auth_token", "users_me", "bulk_accounts", "bulk_vendors")
+
+
+class Scenario:
+    def __init__(self, client: httpx.AsyncClient, args: argparse.Namespace):
+        self.client = client
+        self.args = args
+        self.rnd = random.Random(args.seed)
+        self.tokens: list[str] = []
+
+    def _user(self) -> str:
+        return user_email(self.rnd.randrange(self.args.users))
+
+    async def setup(self) -> None:
+        # un token per utente campionato, per /auth/users/me
+        for _ in range(min(self.args.users, 20)):
+            resp = await self.client.post(
+                "/auth/token", data={"username": self._user(), "password": BENCH_PASSWORD}
+            )
+            resp.raise_for_status()
+            self.tokens.append(resp.json()["access_token"])
+
+    async def search(self) -> httpx.Response:
+        a = self.args
+        return await self.client.get("/vendors/search", params={
+            "lat": a.center_lat + self.rnd.uniform(-a.spread_deg, a.spread_deg),
+            "lon": a.center_lon + self.rnd.uniform(-a.spread_deg, a.spread_deg),
+            "radius_km": self.rnd.choice((1, 2, 5, 10)),
+        })
+
+    async def auth_token(self) -> httpx.Response:
+        return await self.client.post(
+            "/auth/token", data={"username": self._user(), "password": BENCH_PASSWORD}
+        )
+
+    async def users_me(self) -> httpx.Response:
+        token = self.rnd.choice(self.tokens)
+        return await self.client.get("/auth/users/me", headers={"Authorization": f"Bearer {token}"})
+
+    def _accounts_csv(self) -> bytes:
+        run = uuid.uuid4().hex[:12]
+        lines = ["email,password"] + [
+            f"load-{run}-{i}@example.com,{BENCH_PASSWORD}" for i in range(self.args.bulk_rows)
+        ]
+        return "\n".join(lines).encode()
+
+    async def _upload_accounts(self) -> httpx.Response:
+        return await self.client.post(
+            "/vendors/accounts/bulk-upload",
+            params={"mode": self.args.bulk_mode},
+            files={"file": ("accounts.csv", self._accounts_csv(), "text/csv")},
+        )
+
+    async def bulk_accounts(self) -> httpx.Response:
+        return await self._upload_accounts()
+
+    async def bulk_vendors(self) -> tuple[httpx.Response, float]:
+        # account creati prima e fuori dalla misura
+        accounts = await self._upload_accounts()
+        accounts.raise_for_status()
+        lines = ["account_id,company_name,category,country,city,postcode,address"] + [
+            f"{acc['id']},Load {acc['id']},{self.rnd.choice(('haircut', 'beautician', 'plumber', 'mason'))},"
+            f"Italia,Milano,20100,Via Carico {acc['id']}"
+            for acc in accounts.json()
+        ]
+        t0 = time.perf_counter()
+        resp = await self.client.post(
+            "/vendors/bulk-upload",
+            params={"mode": self.args.bulk_mode},
+            files={"file": ("vendors.csv", "\n".join(lines).encode(), "text/csv")},
+        )
+        return resp, time.perf_counter() - t0
+
+
+async def run_endpoint(scenario: Scenario, name: str, requests: int, concurrency: int) -> dict:
+    call = getattr(scenario, name)
+    latencies: list[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            t0 = time.perf_counter()
+            try:
+                result = await call()
+                if isinstance(result, tuple):
+                    resp, elapsed = result
+                else:
+                    resp, elapsed = result, time.perf_counter() - t0
+                if resp.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+                elapsed = time.perf_counter() - t0
+            latencies.append(elapsed)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+    wall = time.perf_counter() - t0
+    return summarize(latencies, errors, wall)
+
+
+def summarize(latencies: list[float], errors: int, wall: float) -> dict:
+    ms = sorted(x * 1000 for x in latencies)
+    if len(ms) >= 2:
+        q = statistics.quantiles(ms, n=100, method="inclusive")
+        p50, p95, p99 = q[49], q[94], q[98]
+    else:
+        p50 = p95 = p99 = ms[0] if ms else 0.0
+    return {
+        "requests": len(ms),
+        "errors": errors,
+        "rps": round(len(ms) / wall, 2) if wall else 0.0,
+        "p50_ms": round(p50, 2),
+        "p95_ms": round(p95, 2),
+        "p99_ms": round(p99, 2),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def run(args: argparse.Namespace) -> dict:
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout)
+        lifespan = contextlib.nullcontext()
+    else:
+        from app.main import app
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=args.timeout
+        )
+        # startup e shutdown come sotto uvicorn, handler on_event inclusi
+        lifespan = app.router.lifespan_context(app)
+
+    results = {}
+    async with lifespan, client:
+        scenario = Scenario(client, args)
+        await scenario.setup()
+        for name in args.endpoints:
+            bulk = name.startswith("bulk_")
+            results[name] = await run_endpoint(
+                scenario,
+                name,
+                args.bulk_requests if bulk else args.requests,
+                args.bulk_concurrency if bulk else args.concurrency,
+            )
+
+    return {
+        "commit": git_commit(),
+        "timestamp": int(time.time()),
+        "config": {
+            k: getattr(args, k)
+            for k in ("base_url", "requests", "concurrency", "bulk_requests",
+                      "bulk_concurrency", "bulk_rows", "bulk_mode", "seed")
+        },
+        "endpoints": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--requests", type=int, default=1000, help="richieste per endpoint")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--bulk-requests", type=int, default=5)
+    parser.add_argument("--bulk-concurrency", type=int, default=1)
+    parser.add_argument("--bulk-rows", type=int, default=200)
+    parser.add_argument("--bulk-mode", choices=("row", "pipeline"), default="pipeline")
+    parser.add_argument("--users", type=int, default=100, help="utenti creati da benchmarks.seed")
+    parser.add_argument("--center-lat", type=float, default=45.4642)
+    parser.add_argument("--center-lon", type=float, default=9.19)
+    parser.add_argument("--spread-deg", type=float, default=0.3)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=None, help="file JSON di output (default stdout)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
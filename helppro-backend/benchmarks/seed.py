@@ -0,0 +1,122 @@
+# benchmarks/seed.py
+"""
+Popola il database locale (DATABASE_URL) con dati sintetici per i benchmark:
+account vendor con profilo, utenti clienti con password nota.
+
+Uso (da helppro-backend/):
+    python -m benchmarks.seed --vendors 100000 --users 1000
+Tutti gli account e gli utenti hanno password BENCH_PASSWORD; l'hash bcrypt
+viene calcolato una volta sola. Le coordinate sono generate localmente,
+senza geocoding.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app import crud, models
+from app.database import AsyncSessionLocal, Base, engine
+from app.utils import geohash
+
+BENCH_PASSWORD = "benchpass"
+USER_EMAIL = "bench-user-{i}@example.com"
+
+
+def user_email(i: int) -> str:
+    return USER_EMAIL.format(i=i)
+
+
+async def seed(
+    vendors: int,
+    users: int,
+    center_lat: float,
+    center_lon: float,
+    spread_deg: float,
+    batch_size: int,
+    seed_value: int,
+    tag: str,
+) -> dict:
+    rnd = random.Random(seed_value)
+    hashed = crud.get_password_hash(BENCH_PASSWORD)
+    categories = list(models.CategoryEnum)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with AsyncSessionLocal() as db:
+        for start in range(0, users, batch_size):
+            await db.execute(
+                pg_insert(models.User)
+                .values([
+                    {"email": user_email(i), "full_name": f"Bench {i}", "hashed_password": hashed,
+                     "disabled": False, "role": models.RoleEnum.client}
+                    for i in range(start, min(start + batch_size, users))
+                ])
+                .on_conflict_do_nothing(index_elements=[models.User.email])
+            )
+
+        for start in range(0, vendors, batch_size):
+            n = min(batch_size, vendors - start)
+            result = await db.execute(
+                sa.insert(models.VendorAccount)
+                .values([
+                    {"email": f"bench-{tag}-{start + i}@example.com", "hashed_password": hashed}
+                    for i in range(n)
+                ])
+                .returning(models.VendorAccount.id)
+            )
+            account_ids = result.scalars().all()
+            rows = []
+            for i, account_id in enumerate(account_ids):
+                # stesso ordine di estrazione delle versioni precedenti: stesso dataset
+                category = rnd.choice(categories)
+                postcode = f"20{rnd.randint(100, 199)}"
+                lon = center_lon + rnd.uniform(-spread_deg, spread_deg)
+                lat = center_lat + rnd.uniform(-spread_deg, spread_deg)
+                rows.append({
+                    "account_id": account_id,
+                    "company_name": f"Bench {tag} {start + i}",
+                    "category": category,
+                    "country": "Italia",
+                    "city": "Milano",
+                    "postcode": postcode,
+                    "address": f"Via Benchmark {start + i}",
+                    "location": crud.make_point(lat, lon),
+                    "geohash": geohash.encode(lat, lon),
+                })
+            for r in rows:
+                r.update(crud.vendor_hashes(r))
+            await db.execute(sa.insert(models.Vendor).values(rows))
+            await crud.apply_cell_counts(db, [(r["geohash"], r["category"], 1) for r in rows])
+            await db.commit()
+
+    return {"vendors": vendors, "users": users, "tag": tag}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vendors", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--center-lat", type=float, default=45.4642)
+    parser.add_argument("--center-lon", type=float, default=9.19)
+    parser.add_argument("--spread-deg", type=float, default=0.3)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tag", default=str(int(time.time())), help="suffisso delle email generate")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    summary = asyncio.run(seed(
+        args.vendors, args.users, args.center_lat, args.center_lon,
+        args.spread_deg, args.batch_size, args.seed, args.tag,
+    ))
+    summary["seconds"] = round(time.perf_counter() - t0, 2)
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
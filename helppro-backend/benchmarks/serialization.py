@@ -0,0 +1,147 @@
+# benchmarks/serialization.py
+"""
+Confronta la serializzazione di una risposta di /vendors/search:
+- "orm": oggetto per riga con location WKB, to_shape, VendorOut e
+  validazione/encoding della risposta come fa FastAPI con response_model
+- "fast": dict con lat/lon già calcolate in SQL, serializzati in bytes
+
+Per la risposta "fast" confronta anche le codifiche negoziabili con Accept
+(JSON a righe, JSON a colonne, MessagePack) e la compressione gzip/brotli:
+byte prodotti e tempo CPU di codifica e compressione.
+
+Uso (da helppro-backend/):
+    python -m benchmarks.serialization --rows 2000 --repeat 20
+Stampa un JSON con i tempi medi per risposta.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+import zlib
+from types import SimpleNamespace
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from geoalchemy2.shape import from_shape, to_shape
+from pydantic import TypeAdapter
+from shapely.geometry import Point
+
+from app import schemas
+from app.config import settings
+from app.utils.compression import brotli
+from app.utils.fastjson import dumps, msgpack, to_columns
+
+
+def make_rows(n: int) -> list[dict]:
+    categories = [c.value for c in schemas.CategoryEnum]
+    return [
+        {
+            "id": i,
+            "account_id": i,
+            "company_name": f"Studio {i}",
+            "category": random.choice(categories),
+            "country": "Italia",
+            "city": "Milano",
+            "postcode": "20100",
+            "address": f"Via Roma {i}",
+            "latitude": 45.4 + random.random() / 10,
+            "longitude": 9.1 + random.random() / 10,
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def orm_path(objs: list, adapter: TypeAdapter) -> bytes:
+    out = []
+    for v in objs:
+        geom = to_shape(v.location)
+        out.append(schemas.VendorOut(
+            id=v.id,
+            account_id=v.account_id,
+            company_name=v.company_name,
+            category=v.category,
+            country=v.country,
+            city=v.city,
+            postcode=v.postcode,
+            address=v.address,
+            latitude=geom.y,
+            longitude=geom.x,
+        ))
+    # come FastAPI con response_model: nuova validazione e poi encoding
+    validated = adapter.validate_python(out, from_attributes=True)
+    return json.dumps(jsonable_encoder(validated)).encode("utf-8")
+
+
+def fast_path(rows: list[dict]) -> bytes:
+    return dumps(rows)
+
+
+def encodings(rows: list[dict]) -> dict:
+    out = {
+        "json": lambda: dumps(rows),
+        "columns": lambda: dumps(to_columns(rows)),
+    }
+    if msgpack is not None:
+        out["msgpack"] = lambda: msgpack.packb(to_columns(rows), default=str)
+    return out
+
+
+def compressors() -> dict:
+    out = {"gzip": lambda b: zlib.compress(b, settings.COMPRESSION_GZIP_LEVEL)}
+    if brotli is not None:
+        out["br"] = lambda b: brotli.compress(b, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return out
+
+
+def encoding_report(rows: list[dict], repeat: int) -> dict:
+    """Per codifica: byte e ms di encoding, poi byte e ms aggiuntivi per compressione."""
+    report = {}
+    for name, encode in encodings(rows).items():
+        body = encode()
+        entry = {"bytes": len(body), "encode_ms": round(timed(encode, (), repeat) * 1000, 3)}
+        for cname, compress in compressors().items():
+            entry[f"{cname}_bytes"] = len(compress(body))
+            entry[f"{cname}_ms"] = round(timed(compress, (body,), repeat) * 1000, 3)
+        report[name] = entry
+    return report
+
+
+def timed(fn, arg, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(*arg)
+        samples.append(time.perf_counter() - t0)
+    return statistics.mean(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    objs = [
+        SimpleNamespace(
+            **{k: v for k, v in r.items() if k not in ("latitude", "longitude")},
+            location=from_shape(Point(r["longitude"], r["latitude"]), srid=4326),
+        )
+        for r in rows
+    ]
+    adapter = TypeAdapter(List[schemas.VendorOut])
+
+    orm_s = timed(orm_path, (objs, adapter), args.repeat)
+    fast_s = timed(fast_path, (rows,), args.repeat)
+    print(json.dumps({
+        "rows": args.rows,
+        "orm_ms": round(orm_s * 1000, 3),
+        "fast_ms": round(fast_s * 1000, 3),
+        "speedup": round(orm_s / fast_s, 1),
+        "encodings": encoding_report(rows, args.repeat),
+    }))
+
+
+if __name__ == "__main__":
+    main()
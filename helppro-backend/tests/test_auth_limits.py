@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.utils import auth_limits, ratelimit
+from app.utils.ratelimit import KeyedRateLimiter
+from app.utils.shared_cache import LocalBackend
+
+
+def make_request(forwarded_for=None, peer="10.0.0.1"):
+    headers = []
+    if forwarded_for is not None:
+        headers.append((b"x-forwarded-for", forwarded_for.encode()))
+    return Request({
+        "type": "http", "method": "POST", "path": "/auth/token",
+        "headers": headers, "client": (peer, 12345),
+    })
+
+
+def test_forwarded_for_ignored_without_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(auth_limits.settings, "TRUSTED_PROXY_HOPS", 0)
+    assert auth_limits.client_ip(make_request("1.2.3.4")) == "10.0.0.1"
+
+
+@pytest.mark.parametrize("hops, header, expected", [
+    (1, "6.6.6.6, 203.0.113.7", "203.0.113.7"),
+    (1, "203.0.113.7", "203.0.113.7"),
+    (2, "6.6.6.6, 203.0.113.7, 10.1.1.1", "203.0.113.7"),
+    # meno voci dei proxy configurati: header non affidabile
+    (2, "203.0.113.7", "10.0.0.1"),
+    (1, "", "10.0.0.1"),
+])
+def test_client_ip_counts_trusted_hops_from_the_right(monkeypatch, hops, header, expected):
+    monkeypatch.setattr(auth_limits.settings, "TRUSTED_PROXY_HOPS", hops)
+    assert auth_limits.client_ip(make_request(header)) == expected
+
+
+def test_spoofed_forwarded_for_shares_one_bucket(monkeypatch):
+    monkeypatch.setattr(auth_limits.settings, "TRUSTED_PROXY_HOPS", 1)
+    monkeypatch.setattr(auth_limits, "_limiters", {
+        "signup_ip": KeyedRateLimiter("signup_ip", rate=1 / 60, capacity=5, max_keys=100),
+    })
+
+    async def run():
+        allowed = 0
+        for i in range(50):
+            request = make_request(f"198.51.100.{i}, 203.0.113.7")
+            try:
+                await auth_limits.check(request, "signup")
+                allowed += 1
+            except HTTPException as e:
+                assert e.status_code == 429
+        return allowed
+
+    assert asyncio.run(run()) == 5
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_keyed_limiter_is_per_key(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", clock)
+    limiter = KeyedRateLimiter("t", rate=1.0, capacity=2, max_keys=10)
+
+    async def run():
+        assert [await limiter.hit("a") for _ in range(2)] == [0.0, 0.0]
+        assert await limiter.hit("a") > 0
+        assert await limiter.hit("b") == 0.0
+        clock.now += 1
+        assert await limiter.hit("a") == 0.0
+
+    asyncio.run(run())
+
+
+def test_keyed_limiter_keeps_the_bucket_of_an_active_key(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", clock)
+    # bucket pieno di nuovo dopo capacity / rate = 20 s
+    limiter = KeyedRateLimiter("t", rate=0.1, capacity=2, max_keys=10)
+
+    async def run():
+        assert [await limiter.hit("a") for _ in range(2)] == [0.0, 0.0]
+        clock.now += 19
+        assert await limiter.hit("a") == 0.0
+        # 21 s dal primo hit: il bucket è lo stesso, non uno nuovo e pieno
+        clock.now += 2
+        assert await limiter.hit("a") == 0.0
+        assert await limiter.hit("a") > 0
+
+    asyncio.run(run())
+
+
+def test_keyed_limiter_with_shared_backend_uses_fixed_window(monkeypatch):
+    monkeypatch.setattr(ratelimit.time, "time", lambda: 1000.5)
+    limiter = KeyedRateLimiter("t", rate=1.0, capacity=3, max_keys=10, shared=LocalBackend())
+
+    async def run():
+        return [await limiter.hit("a") for _ in range(4)]
+
+    # finestra di capacity / rate = 3 s: [999, 1002)
+    assert asyncio.run(run()) == [0.0, 0.0, 0.0, pytest.approx(1.5)]
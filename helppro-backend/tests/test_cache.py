@@ -0,0 +1,69 @@
+from app.utils import cache
+from app.utils.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_get_returns_default_when_missing():
+    c = TTLCache(maxsize=2, ttl=10)
+    assert c.get("a") is None
+    assert c.get("a", 5) == 5
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    c = TTLCache(maxsize=4, ttl=10)
+    c.set("a", 1)
+    c.set("b", 2, ttl=30)
+    clock.now += 11
+    assert c.get("a") is None
+    assert c.get("b") == 2
+    # la voce scaduta viene rimossa alla lettura
+    assert c.keys() == ["b"]
+
+
+def test_evicts_least_recently_used():
+    c = TTLCache(maxsize=2, ttl=10)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == 1
+    c.set("c", 3)
+    assert c.get("b") is None
+    assert c.keys() == ["a", "c"]
+
+
+def test_zero_maxsize_disables_cache():
+    c = TTLCache(maxsize=0, ttl=10)
+    c.set("a", 1)
+    assert len(c) == 0
+
+
+def test_pop_and_clear():
+    c = TTLCache(maxsize=2, ttl=10)
+    c.set("a", 1)
+    assert c.pop("a") == 1
+    assert c.pop("a", "x") == "x"
+    c.set("b", 2)
+    c.clear()
+    assert len(c) == 0
+
+
+def test_maxweight_evicts_until_the_total_fits():
+    c = TTLCache(maxsize=10, ttl=10, maxweight=10)
+    c.set("a", 1, weight=4)
+    c.set("b", 2, weight=4)
+    c.set("c", 3, weight=4)
+    assert c.keys() == ["b", "c"]
+    c.set("b", 2, weight=1)
+    assert c.weight == 5
+    # più pesante dell'intera cache: non entra
+    c.set("d", 4, weight=11)
+    assert c.get("d") is None
+    assert c.weight == 5
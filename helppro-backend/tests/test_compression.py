@@ -0,0 +1,110 @@
+import asyncio
+import gzip
+import json
+import zlib
+
+import pytest
+from starlette.requests import Request
+
+from app.utils import compression, fastjson
+from app.utils.compression import CompressionMiddleware
+
+ROWS = [{"id": i, "city": "Milano", "category": "plumber"} for i in range(3)]
+
+
+def test_to_columns():
+    assert fastjson.to_columns(ROWS) == {
+        "id": [0, 1, 2], "city": ["Milano"] * 3, "category": ["plumber"] * 3,
+    }
+    assert fastjson.to_columns([]) == {}
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, fastjson.MEDIA_JSON),
+    ("*/*", fastjson.MEDIA_JSON),
+    ("application/vnd.helppro.columns+json", fastjson.MEDIA_COLUMNS),
+    ("text/html, application/msgpack;q=0.9", fastjson.MEDIA_MSGPACK),
+])
+def test_negotiate(accept, expected):
+    assert fastjson.negotiate(accept) == expected
+
+
+def test_negotiate_without_msgpack_falls_back_to_json(monkeypatch):
+    monkeypatch.setattr(fastjson, "msgpack", None)
+    assert fastjson.negotiate("application/msgpack") == fastjson.MEDIA_JSON
+
+
+def rows_response(accept):
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": [(b"accept", accept.encode())]})
+    return fastjson.rows_response(request, ROWS)
+
+
+def test_rows_response_encodings():
+    response = rows_response(fastjson.MEDIA_COLUMNS)
+    assert response.headers["vary"] == "Accept"
+    assert json.loads(response.body) == fastjson.to_columns(ROWS)
+    msgpack = pytest.importorskip("msgpack")
+    assert msgpack.unpackb(rows_response(fastjson.MEDIA_MSGPACK).body) == fastjson.to_columns(ROWS)
+
+
+def run(chunks, accept_encoding="gzip", content_type=b"application/json"):
+    """Esegue il middleware su una risposta a blocchi; ritorna (header, body)."""
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type)]})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    asyncio.run(CompressionMiddleware(app)(scope, None, send))
+    headers = dict(sent[0]["headers"])
+    return headers, b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def test_large_body_is_gzipped_with_length():
+    body = b'{"city":"Milano"}' * 200
+    headers, out = run([body])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert headers[b"content-length"] == str(len(out)).encode()
+    assert gzip.decompress(out) == body
+
+
+def test_small_or_binary_bodies_pass_through():
+    headers, out = run([b"{}"])
+    assert b"content-encoding" not in headers and out == b"{}"
+    image = b"\x89PNG" * 1000
+    headers, out = run([image], content_type=b"image/png")
+    assert b"content-encoding" not in headers and out == image
+
+
+def test_no_accepted_encoding_passes_through():
+    body = b"x" * 5000
+    headers, out = run([body], accept_encoding="identity")
+    assert b"content-encoding" not in headers and out == body
+
+
+def test_streamed_chunks_are_compressed_incrementally():
+    chunks = [b'{"id":%d}\n' % i * 50 for i in range(5)]
+    headers, out = run(chunks)
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+    assert zlib.decompress(out, 31) == b"".join(chunks)
+
+
+def test_brotli_preferred_when_available():
+    brotli = pytest.importorskip("brotli")
+    body = b"a" * 5000
+    headers, out = run([body], accept_encoding="gzip, br")
+    assert headers[b"content-encoding"] == b"br"
+    assert brotli.decompress(out) == body
+
+
+def test_disabled_by_setting(monkeypatch):
+    monkeypatch.setattr(compression.settings, "COMPRESSION_ENABLED", False)
+    headers, out = run([b"a" * 5000])
+    assert b"content-encoding" not in headers
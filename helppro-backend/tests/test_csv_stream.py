@@ -0,0 +1,25 @@
+import io
+
+from app.utils.csv_stream import iter_csv_batches
+
+
+def test_batches_keep_row_numbers():
+    data = b"email,password\n" + b"".join(b"u%d@example.com,pw%d\n" % (i, i) for i in range(5))
+    batches = list(iter_csv_batches(io.BytesIO(data), batch_size=2))
+    assert [len(b) for b in batches] == [2, 2, 1]
+    idx, row = batches[2][0]
+    assert idx == 5
+    assert row == {"email": "u4@example.com", "password": "pw4"}
+
+
+def test_quoted_newlines_and_utf8():
+    data = 'company_name,address\n"Caffè ""Roma""","Via Po 1\nscala B"\n'.encode("utf-8")
+    [[(idx, row)]] = list(iter_csv_batches(io.BytesIO(data), batch_size=10))
+    assert idx == 1
+    assert row == {"company_name": 'Caffè "Roma"', "address": "Via Po 1\nscala B"}
+
+
+def test_header_only_yields_nothing_and_leaves_file_open():
+    f = io.BytesIO(b"email,password\n")
+    assert list(iter_csv_batches(f, batch_size=10)) == []
+    assert not f.closed
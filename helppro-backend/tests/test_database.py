@@ -0,0 +1,26 @@
+from app import database
+from app.database import TimedQueuePool, _engine_options
+
+
+def test_postgres_options_come_from_settings(monkeypatch):
+    monkeypatch.setattr(database.settings, "DB_STATEMENT_TIMEOUT_MS", 5000)
+    monkeypatch.setattr(database.settings, "DB_STATEMENT_CACHE_SIZE", 100)
+    options = _engine_options("postgresql+asyncpg://u:p@db/helppro", pool_size=7, max_overflow=3)
+    assert options["poolclass"] is TimedQueuePool
+    assert (options["pool_size"], options["max_overflow"]) == (7, 3)
+    assert options["connect_args"] == {
+        "prepared_statement_cache_size": 100,
+        "server_settings": {"application_name": "helppro-backend", "statement_timeout": "5000"},
+    }
+
+
+def test_zero_statement_timeout_is_not_sent(monkeypatch):
+    monkeypatch.setattr(database.settings, "DB_STATEMENT_TIMEOUT_MS", 0)
+    options = _engine_options("postgresql+asyncpg://u:p@db/helppro", pool_size=1, max_overflow=0)
+    assert "statement_timeout" not in options["connect_args"]["server_settings"]
+
+
+def test_sqlite_keeps_the_default_pool():
+    options = _engine_options("sqlite+aiosqlite:///test.db", pool_size=5, max_overflow=5)
+    assert "poolclass" not in options
+    assert "connect_args" not in options
@@ -0,0 +1,31 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+
+from app import models
+from app.routers import vendors
+
+ROW = {
+    "id": 7, "account_id": 3, "company_name": 'Bar "Sport", Roma', "category": models.CategoryEnum.mason,
+    "country": "IT", "city": "Roma", "postcode": "00184", "address": "Via Cavour 1",
+    "latitude": 41.9, "longitude": 12.5, "updated_at": datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc),
+}
+
+
+def test_csv_header_only_on_first_chunk():
+    first = vendors._encode_csv([ROW], header=True).decode()
+    rest = vendors._encode_csv([ROW], header=False).decode()
+    rows = list(csv.reader(io.StringIO(first + rest)))
+    assert rows[0] == list(vendors.EXPORT_FIELDS)
+    assert len(rows) == 3
+    assert rows[1][2] == 'Bar "Sport", Roma'
+    assert rows[1][3] == "mason"
+    assert rows[1][10] == "2026-10-18T12:00:00+00:00"
+
+
+def test_ndjson_one_object_per_line():
+    body = vendors._encode_ndjson([ROW, dict(ROW, id=8)])
+    lines = body.decode().splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [7, 8]
+    assert json.loads(lines[0])["category"] == "mason"
@@ -0,0 +1,19 @@
+import json
+
+from app.utils import fastjson
+
+
+def test_dumps_is_compact_utf8():
+    body = fastjson.dumps({"city": "Forlì", "ids": [1, 2], "lat": 45.5})
+    assert isinstance(body, bytes)
+    assert b" " not in body
+    assert json.loads(body) == {"city": "Forlì", "ids": [1, 2], "lat": 45.5}
+
+
+def test_json_response_skips_model_validation():
+    rows = [{"id": 1, "category": "plumber"}]
+    response = fastjson.json_response(rows, status_code=201, headers={"X-Total": "1"})
+    assert response.status_code == 201
+    assert response.media_type == fastjson.MEDIA_JSON
+    assert response.headers["x-total"] == "1"
+    assert json.loads(response.body) == rows
@@ -0,0 +1,120 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.utils import ratelimit
+from app.utils.geocoder import FakeBackend, GeocoderBackend, GeocoderService
+from app.utils.ratelimit import TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_burst_then_wait(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", clock)
+    bucket = TokenBucket(rate=2.0, capacity=3)
+    assert [bucket.try_acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.try_acquire() == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.try_acquire() == 0.0
+
+
+def test_token_bucket_refill_is_capped(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", clock)
+    bucket = TokenBucket(rate=1.0, capacity=2)
+    bucket.try_acquire()
+    bucket.try_acquire()
+    clock.now += 100
+    assert bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() > 0
+
+
+def test_token_bucket_zero_rate_is_unlimited():
+    bucket = TokenBucket(rate=0, capacity=1)
+    assert all(bucket.try_acquire() == 0.0 for _ in range(100))
+
+
+class SlowBackend(GeocoderBackend):
+    def __init__(self, delays):
+        self.delays = list(delays)
+        self.calls = 0
+
+    async def geocode(self, country, city, postcode, address):
+        self.calls += 1
+        await asyncio.sleep(self.delays.pop(0))
+        return 45.0, 9.0
+
+
+class FlakyBackend(GeocoderBackend):
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    async def geocode(self, country, city, postcode, address):
+        self.calls += 1
+        if self.calls <= self.failures:
+            request = httpx.Request("GET", "http://geocoder")
+            raise httpx.HTTPStatusError(
+                "busy", request=request, response=httpx.Response(503, request=request)
+            )
+        return 45.0, 9.0
+
+
+def make_service(backend, **kwargs):
+    params = dict(rate_per_s=0, burst=1, max_retries=0, backoff_s=0.0, timeout_s=1.0)
+    params.update(kwargs)
+    return GeocoderService(backend, **params)
+
+
+def test_fake_backend_is_deterministic():
+    service = make_service(FakeBackend())
+    first = asyncio.run(service.geocode("IT", "Milano", "20100", "Via Roma 1"))
+    second = asyncio.run(service.geocode("it", "milano", "20100", "via roma 1"))
+    assert first == second
+    assert 37.0 <= first[0] <= 46.0 and 7.0 <= first[1] <= 18.0
+
+
+def test_retries_transient_status():
+    backend = FlakyBackend(failures=2)
+    service = make_service(backend, max_retries=2)
+    assert asyncio.run(service.geocode("IT", "Milano", "20100", "Via Roma 1")) == (45.0, 9.0)
+    assert backend.calls == 3
+
+
+def test_gives_up_after_max_retries():
+    service = make_service(FlakyBackend(failures=5), max_retries=1)
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(service.geocode("IT", "Milano", "20100", "Via Roma 1"))
+
+
+def test_timeout_applies_to_each_attempt():
+    backend = SlowBackend([0.2, 0.0])
+    service = make_service(backend, max_retries=1, timeout_s=0.05)
+    assert asyncio.run(service.geocode("IT", "Milano", "20100", "Via Roma 1")) == (45.0, 9.0)
+    assert backend.calls == 2
+
+    service = make_service(SlowBackend([0.2]), timeout_s=0.05)
+    with pytest.raises(TimeoutError):
+        asyncio.run(service.geocode("IT", "Milano", "20100", "Via Roma 1"))
+
+
+def test_rate_limit_wait_does_not_count_against_timeout():
+    # 1 richiesta ogni 0.1 s: la terza attende ~0.2 s nel bucket, più del
+    # timeout, ma la chiamata al backend è immediata e non deve fallire
+    service = make_service(FakeBackend(), rate_per_s=10, timeout_s=0.05)
+
+    async def run():
+        return await asyncio.gather(
+            *(service.geocode("IT", "Milano", "20100", f"Via Roma {i}") for i in range(3))
+        )
+
+    assert len(asyncio.run(run())) == 3
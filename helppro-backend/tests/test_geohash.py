@@ -0,0 +1,61 @@
+import pytest
+
+from app import crud, models
+from app.utils import geohash
+
+
+@pytest.mark.parametrize("lat, lon, precision, expected", [
+    # esempi di riferimento di geohash.org / ST_GeoHash
+    (57.64911, 10.40744, 11, "u4pruydqqvj"),
+    (42.605, -5.603, 5, "ezs42"),
+    (0.0, 0.0, 1, "s"),
+    (-90.0, -180.0, 4, "0000"),
+])
+def test_encode_reference_values(lat, lon, precision, expected):
+    assert geohash.encode(lat, lon, precision) == expected
+
+
+def test_prefix_is_the_coarser_cell():
+    full = geohash.encode(45.4642, 9.19)
+    assert len(full) == geohash.STORED_PRECISION
+    for precision in range(1, geohash.STORED_PRECISION):
+        assert geohash.encode(45.4642, 9.19, precision) == full[:precision]
+
+
+@pytest.mark.parametrize("precision, expected", [
+    (1, (45.0, 45.0)),
+    (2, (45.0 / 8, 45.0 / 4)),
+    (5, (180.0 / 2 ** 12, 360.0 / 2 ** 13)),
+])
+def test_cell_size(precision, expected):
+    assert geohash.cell_size(precision) == expected
+
+
+def test_with_neighbors_returns_the_3x3_block():
+    cells = geohash.with_neighbors(45.4642, 9.19, 5)
+    assert len(cells) == 9
+    assert cells[4] == geohash.encode(45.4642, 9.19, 5)
+    assert len(set(cells)) == 9
+
+
+def test_with_neighbors_wraps_the_antimeridian_and_stops_at_the_pole():
+    cells = geohash.with_neighbors(0.0, 179.99, 2)
+    assert geohash.encode(0.0, -179.99, 2) in cells
+    assert len(geohash.with_neighbors(89.99, 0.0, 2)) == 6
+
+
+def test_cell_count_deltas_net_out_and_sort(monkeypatch):
+    monkeypatch.setattr(crud.settings, "GEO_CELL_PRECISIONS", [4, 5])
+    haircut = models.CategoryEnum.haircut
+    rows = crud._cell_count_deltas([
+        ("u0nd9hdf0", haircut, 1),
+        ("u0nd9zzzz", haircut, 1),
+        ("u0ndxxxxx", "plumber", 1),
+        ("u0ndxxxxx", "plumber", -1),
+        # vendor storico senza location che viene aggiornato
+        (None, "mason", -1),
+    ])
+    assert rows == [
+        {"precision": 4, "cell": "u0nd", "category": "haircut", "count": 2},
+        {"precision": 5, "cell": "u0nd9", "category": "haircut", "count": 2},
+    ]
@@ -0,0 +1,18 @@
+import asyncio
+
+from app import crud
+
+
+def test_bulk_hashing_runs_on_spawned_processes():
+    async def run():
+        try:
+            pool = crud.get_hash_process_pool()
+            # figli avviati con spawn: niente event loop né engine ereditati
+            assert pool._mp_context.get_start_method() == "spawn"
+            return await crud.hash_passwords_parallel(["uno", "due"])
+        finally:
+            crud.shutdown_hash_process_pool()
+
+    hashes = asyncio.run(run())
+    assert crud.verify_password("uno", hashes[0])
+    assert crud.verify_password("due", hashes[1])
@@ -0,0 +1,34 @@
+from app import crud, models
+from app.utils.geocode import normalize_address_key
+
+VENDOR = {
+    "company_name": "Idraulica Rossi",
+    "category": models.CategoryEnum.plumber,
+    "country": "IT",
+    "city": "Milano",
+    "postcode": "20121",
+    "address": "Via Roma 1",
+}
+
+
+def test_normalize_address_key_ignores_case_whitespace_and_punctuation():
+    assert normalize_address_key("IT", "Milano", "20121", "Via Roma 1") == "via roma 1|20121|milano|it"
+    assert normalize_address_key(" it.", "\tMILANO\n", "20121 ", "Via  Roma\t1,") == "via roma 1|20121|milano|it"
+    assert normalize_address_key(None, "", "20121", "Via Roma 1") == "via roma 1|20121||"
+
+
+def test_address_hash_is_stable_across_formatting():
+    reformatted = dict(VENDOR, city="\tmilano\n", address="VIA ROMA  1 ")
+    assert crud.vendor_hashes(reformatted)["address_hash"] == crud.vendor_hashes(VENDOR)["address_hash"]
+    # il contenuto è cambiato: la riga va riscritta, ma senza nuovo geocoding
+    assert crud.vendor_hashes(reformatted)["content_hash"] != crud.vendor_hashes(VENDOR)["content_hash"]
+
+
+def test_content_hash_tracks_every_field():
+    base = crud.vendor_hashes(VENDOR)
+    assert crud.vendor_hashes(dict(VENDOR, category="plumber")) == base
+    renamed = crud.vendor_hashes(dict(VENDOR, company_name="Idraulica Bianchi"))
+    assert renamed["address_hash"] == base["address_hash"]
+    assert renamed["content_hash"] != base["content_hash"]
+    moved = crud.vendor_hashes(dict(VENDOR, address="Via Roma 2"))
+    assert moved["address_hash"] != base["address_hash"]
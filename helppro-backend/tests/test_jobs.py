@@ -0,0 +1,64 @@
+import asyncio
+import io
+import os
+
+import pytest
+from fastapi import HTTPException
+from starlette.datastructures import UploadFile
+
+from app import jobs
+
+
+class SlowCommitSession:
+    """Sessione finta: il commit cede l'event loop come quello vero."""
+
+    def __init__(self):
+        self.added = []
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def commit(self):
+        await asyncio.sleep(0.01)
+
+
+def make_upload():
+    return UploadFile(io.BytesIO(b"company_name\nRossi\n"), filename="vendors.csv")
+
+
+def test_concurrent_submits_cannot_overfill_the_queue(monkeypatch, tmp_path):
+    monkeypatch.setattr(jobs.settings, "JOB_SPOOL_DIR", str(tmp_path))
+
+    async def run():
+        monkeypatch.setattr(jobs, "_queue", asyncio.Queue(maxsize=1))
+        results = await asyncio.gather(
+            jobs.submit_job(SlowCommitSession(), "vendors", make_upload()),
+            jobs.submit_job(SlowCommitSession(), "vendors", make_upload()),
+            return_exceptions=True,
+        )
+        errors = [r for r in results if isinstance(r, HTTPException)]
+        assert len(errors) == 1 and errors[0].status_code == 503
+        assert jobs._queue.qsize() == 1
+        assert jobs._reserved == 0
+
+    asyncio.run(run())
+    # solo il file del job accodato resta su disco
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_failed_commit_removes_the_spooled_file(monkeypatch, tmp_path):
+    monkeypatch.setattr(jobs.settings, "JOB_SPOOL_DIR", str(tmp_path))
+
+    class FailingSession(SlowCommitSession):
+        async def commit(self):
+            raise RuntimeError("db down")
+
+    async def run():
+        monkeypatch.setattr(jobs, "_queue", asyncio.Queue(maxsize=1))
+        with pytest.raises(RuntimeError):
+            await jobs.submit_job(FailingSession(), "vendors", make_upload())
+        assert jobs._queue.qsize() == 0
+        assert jobs._reserved == 0
+
+    asyncio.run(run())
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,57 @@
+import asyncio
+
+from app.utils import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = metrics.Histogram("test_latency_seconds", "Latenza di prova", labelnames=("op",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        h.labels(op="read").observe(value)
+    metrics.REGISTRY["test_latency_seconds"] = h
+    try:
+        text = metrics.render_prometheus()
+    finally:
+        del metrics.REGISTRY["test_latency_seconds"]
+    assert "# TYPE test_latency_seconds histogram" in text
+    assert 'test_latency_seconds_bucket{op="read",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{op="read",le="1.0"} 3' in text
+    assert 'test_latency_seconds_bucket{op="read",le="+Inf"} 4' in text
+    assert 'test_latency_seconds_sum{op="read"} 4.25' in text
+    assert 'test_latency_seconds_count{op="read"} 4' in text
+
+
+def test_counter_and_gauge_render_with_escaped_labels():
+    c = metrics.Counter("test_events_total", "Eventi", labelnames=("path",))
+    c.labels(path='a"b').inc(2)
+    g = metrics.Gauge("test_queue_size", "Coda", function=lambda: 7)
+    metrics.REGISTRY.update({c.name: c, g.name: g})
+    try:
+        text = metrics.render_prometheus()
+    finally:
+        del metrics.REGISTRY[c.name], metrics.REGISTRY[g.name]
+    assert 'test_events_total{path="a\\"b"} 2' in text
+    assert "test_queue_size 7" in text
+
+
+def test_registry_returns_the_existing_metric():
+    assert metrics.counter("http_requests_total", "altro") is metrics.http_requests
+
+
+def test_middleware_labels_by_route_template():
+    class Route:
+        path = "/vendors/{vendor_id}"
+
+    async def app(scope, receive, send):
+        scope["route"] = Route()
+        await send({"type": "http.response.start", "status": 404, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    counter = metrics.http_requests.labels(method="GET", route="/vendors/{vendor_id}", status="404")
+    before = counter.value
+    scope = {"type": "http", "method": "GET", "path": "/vendors/42"}
+    asyncio.run(metrics.MetricsMiddleware(app)(scope, None, send))
+    assert counter.value == before + 1
+    assert metrics.http_in_flight.get() == 0
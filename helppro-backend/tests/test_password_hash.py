@@ -0,0 +1,21 @@
+import asyncio
+
+from app import crud
+
+
+def test_async_hash_and_verify_run_off_the_loop_and_are_timed():
+    verify_count = crud.hash_duration.labels(op="verify").count
+    wait_count = crud.hash_queue_wait.labels(op="hash").count
+
+    async def run():
+        hashed = await crud.get_password_hash_async("s3cret")
+        return hashed, await asyncio.gather(
+            crud.verify_password_async("s3cret", hashed),
+            crud.verify_password_async("wrong", hashed),
+        )
+
+    hashed, results = asyncio.run(run())
+    assert hashed.startswith("$2")
+    assert results == [True, False]
+    assert crud.hash_duration.labels(op="verify").count == verify_count + 2
+    assert crud.hash_queue_wait.labels(op="hash").count == wait_count + 1
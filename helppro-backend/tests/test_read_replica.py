@@ -0,0 +1,44 @@
+import asyncio
+
+from starlette.requests import Request
+
+from app import database
+
+
+def make_request(headers=()):
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": list(headers)})
+
+
+def run_middleware(method, status):
+    sent = []
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": status, "headers": []})
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "path": "/vendors/bulk-upload"}
+    asyncio.run(database.ReadAfterWriteMiddleware(app)(scope, None, send))
+    return dict(sent[0]["headers"])
+
+
+def test_without_replica_everything_reads_from_primary(monkeypatch):
+    monkeypatch.setattr(database, "read_engine", None)
+    assert database.wants_primary(make_request())
+
+
+def test_pinned_clients_read_from_primary(monkeypatch):
+    monkeypatch.setattr(database, "read_engine", object())
+    assert not database.wants_primary(make_request())
+    assert database.wants_primary(make_request([(b"cookie", b"helppro_primary=1")]))
+    assert database.wants_primary(make_request([(b"x-read-primary", b"1")]))
+
+
+def test_successful_writes_set_the_pin_cookie(monkeypatch):
+    monkeypatch.setattr(database, "read_engine", object())
+    monkeypatch.setattr(database.settings, "READ_AFTER_WRITE_PIN_S", 5)
+    cookie = run_middleware("POST", 201)[b"set-cookie"]
+    assert cookie.startswith(b"helppro_primary=1; Max-Age=5;")
+    assert b"set-cookie" not in run_middleware("POST", 422)
+    assert b"set-cookie" not in run_middleware("GET", 200)
@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+
+from app import crud
+from app.utils import search_cache
+from app.utils.search_cache import SearchCache, filter_candidates
+from app.utils.shared_cache import LocalBackend
+
+
+def make_cache(shared=None):
+    return SearchCache(cell_deg=0.01, buckets_km=[10, 1, 5], ttl=60, size=100, shared=shared)
+
+
+def test_key_rounds_radius_up_to_bucket_and_snaps_to_cell():
+    cache = make_cache()
+    key, center_lat, center_lon, candidates_km = cache.key_for(45.46421, 9.18951, 3.2)
+    assert key == "search:4546:918:5"
+    assert center_lat == pytest.approx(45.465)
+    assert center_lon == pytest.approx(9.185)
+    # raggio del bucket più mezza diagonale di cella
+    assert 5.7 < candidates_km < 5.8
+
+
+def test_nearby_points_share_a_key():
+    cache = make_cache()
+    assert cache.key_for(45.4601, 9.1801, 1)[0] == cache.key_for(45.4699, 9.1899, 0.5)[0]
+    assert cache.key_for(45.4601, 9.1801, 1)[0] != cache.key_for(45.4701, 9.1801, 1)[0]
+
+
+def test_radius_above_largest_bucket_is_not_cacheable():
+    assert make_cache().key_for(45.46, 9.18, 11) is None
+
+
+def test_filter_candidates_is_exact_and_paginated():
+    vendors = [
+        {"id": 1, "latitude": 45.0, "longitude": 9.0},
+        {"id": 2, "latitude": 45.005, "longitude": 9.0},   # ~556 m
+        {"id": 3, "latitude": 45.02, "longitude": 9.0},    # ~2.2 km
+        {"id": 4, "latitude": 45.001, "longitude": 9.001},
+    ]
+    assert [v["id"] for v in filter_candidates(vendors, 45.0, 9.0, 1, limit=10)] == [1, 2, 4]
+    assert [v["id"] for v in filter_candidates(vendors, 45.0, 9.0, 1, limit=1, after_id=1)] == [2]
+
+
+@pytest.mark.parametrize("shared", [None, LocalBackend()])
+def test_write_in_covered_tile_invalidates_entry(shared):
+    cache = make_cache(shared)
+
+    async def run():
+        key, lat, lon, km = cache.key_for(45.46, 9.18, 1)
+        tiles, versions = await cache.prepare(lat, lon, km)
+        await cache.store(key, tiles, versions, [{"id": 1}])
+        assert await cache.get(key) == [{"id": 1}]
+        # scrittura lontana: la voce resta valida
+        await cache.invalidate_points([(41.9, 12.5)])
+        assert await cache.get(key) == [{"id": 1}]
+        await cache.invalidate_points([(45.461, 9.181)])
+        assert await cache.get(key) is None
+
+    asyncio.run(run())
+
+
+class CountingSession:
+    """Sessione finta: ogni query ritorna `rows` vendor e viene contata."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    async def execute(self, stmt):
+        self.queries += 1
+        return self
+
+    def mappings(self):
+        return [
+            {"id": i, "latitude": 45.46, "longitude": 9.18}
+            for i in range(1, self.rows + 1)
+        ]
+
+
+def test_dense_zone_is_remembered(monkeypatch):
+    monkeypatch.setattr(crud.settings, "SEARCH_CACHE_MAX_ITEMS", 3)
+    monkeypatch.setattr(search_cache, "_cache", make_cache())
+    db = CountingSession(rows=4)
+
+    async def run():
+        await crud.get_vendors_in_radius_cached(db, 45.46, 9.18, 1, limit=10)
+        # candidati + query diretta
+        assert db.queries == 2
+        await crud.get_vendors_in_radius_cached(db, 45.461, 9.181, 1, limit=10)
+        # il marker salta la lettura dei candidati
+        assert db.queries == 3
+
+    asyncio.run(run())
+
+
+def test_sparse_zone_is_served_from_cache(monkeypatch):
+    monkeypatch.setattr(crud.settings, "SEARCH_CACHE_MAX_ITEMS", 10)
+    monkeypatch.setattr(search_cache, "_cache", make_cache())
+    db = CountingSession(rows=2)
+
+    async def run():
+        first = await crud.get_vendors_in_radius_cached(db, 45.46, 9.18, 1, limit=10)
+        second = await crud.get_vendors_in_radius_cached(db, 45.461, 9.181, 1, limit=10)
+        assert first == second
+        assert db.queries == 1
+
+    asyncio.run(run())
+
+
+def test_local_entries_are_bounded_by_total_rows():
+    cache = SearchCache(cell_deg=0.01, buckets_km=[1], ttl=60, size=100, max_rows=10)
+
+    async def run():
+        await cache.store("a", [], [], [{"id": i} for i in range(6)])
+        await cache.store("b", [], [], [{"id": i} for i in range(6)])
+        assert await cache.get("a") is None
+        assert len(await cache.get("b")) == 6
+
+    asyncio.run(run())
+
+
+def test_miss_on_the_replica_fills_from_the_primary(monkeypatch):
+    monkeypatch.setattr(crud.settings, "SEARCH_CACHE_MAX_ITEMS", 10)
+    monkeypatch.setattr(search_cache, "_cache", make_cache())
+    replica, primary = CountingSession(rows=1), CountingSession(rows=2)
+
+    class PrimarySession:
+        async def __aenter__(self):
+            return primary
+        async def __aexit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(crud, "AsyncSessionLocal", PrimarySession)
+
+    async def run():
+        rows = await crud.get_vendors_in_radius_cached(replica, 45.46, 9.18, 1, limit=10, db_is_primary=False)
+        assert [r["id"] for r in rows] == [1, 2]
+        assert (replica.queries, primary.queries) == (0, 1)
+
+    asyncio.run(run())
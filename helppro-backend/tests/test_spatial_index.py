@@ -0,0 +1,158 @@
+import asyncio
+import random
+
+import pytest
+
+from app.utils import spatial_index
+from app.utils.spatial_index import VendorSpatialIndex, haversine_m
+
+CATEGORIES = ("haircut", "beautician", "plumber", "mason")
+
+
+def make_vendor(vid, lat, lon, category="haircut"):
+    return {
+        "id": vid, "category": category, "latitude": lat, "longitude": lon,
+        "account_id": vid, "company_name": f"V{vid}", "country": "IT",
+        "city": "Milano", "postcode": "20100", "address": f"Via {vid}",
+    }
+
+
+@pytest.fixture(scope="module")
+def vendors():
+    rnd = random.Random(7)
+    return [
+        make_vendor(i, 45.3 + rnd.random() * 0.4, 9.0 + rnd.random() * 0.4, rnd.choice(CATEGORIES))
+        for i in range(1, 1501)
+    ]
+
+
+@pytest.fixture(scope="module")
+def index(vendors):
+    index = VendorSpatialIndex(cell_deg=0.05)
+    for v in vendors:
+        index.upsert(v)
+    return index
+
+
+def test_haversine_known_distance():
+    # Milano Duomo - Roma Colosseo, ~477 km
+    assert haversine_m(45.4642, 9.1900, 41.8902, 12.4922) == pytest.approx(477_000, rel=0.01)
+    assert haversine_m(45.0, 9.0, 45.0, 9.0) == 0
+
+
+def test_radius_matches_brute_force(index, vendors):
+    lat, lon, radius_km = 45.5, 9.2, 5
+    expected = sorted(
+        v["id"] for v in vendors
+        if haversine_m(lat, lon, v["latitude"], v["longitude"]) <= radius_km * 1000
+    )
+    assert [r["id"] for r in index.radius(lat, lon, radius_km, limit=10_000)] == expected
+    page = index.radius(lat, lon, radius_km, limit=10, after_id=expected[9])
+    assert [r["id"] for r in page] == expected[10:20]
+
+
+@pytest.mark.parametrize("category", [None, "plumber"])
+def test_nearest_matches_brute_force(index, vendors, category):
+    lat, lon = 45.41, 9.33
+    candidates = [v for v in vendors if category is None or v["category"] == category]
+    expected = sorted(candidates, key=lambda v: haversine_m(lat, lon, v["latitude"], v["longitude"]))[:7]
+    found = index.nearest(lat, lon, 7, category=category)
+    assert [row["id"] for row, _ in found] == [v["id"] for v in expected]
+    distances = [d for _, d in found]
+    assert distances == sorted(distances)
+
+
+def test_nearest_respects_max_radius(index):
+    found = index.nearest(45.5, 9.2, 1000, max_radius_km=1)
+    assert found and all(d <= 1000 for _, d in found)
+
+
+def test_nearest_from_outside_the_extent(index, vendors):
+    lat, lon = 46.5, 9.2
+    [(row, distance)] = index.nearest(lat, lon, 1)
+    best = min(vendors, key=lambda v: haversine_m(lat, lon, v["latitude"], v["longitude"]))
+    assert row["id"] == best["id"]
+    assert distance == pytest.approx(haversine_m(lat, lon, best["latitude"], best["longitude"]))
+
+
+def test_upsert_moves_an_existing_vendor():
+    index = VendorSpatialIndex(cell_deg=0.1)
+    index.upsert(make_vendor(1, 45.0, 9.0))
+    index.upsert(make_vendor(1, 41.9, 12.5, "mason"))
+    assert len(index) == 1
+    assert index.radius(45.0, 9.0, 1, limit=10) == []
+    [row] = index.radius(41.9, 12.5, 1, limit=10)
+    assert row["category"] == "mason"
+
+
+BBOX = (9.1, 45.4, 9.25, 45.5)
+
+
+def in_bbox(v, bbox=BBOX):
+    min_lon, min_lat, max_lon, max_lat = bbox
+    return min_lat <= v["latitude"] <= max_lat and min_lon <= v["longitude"] <= max_lon
+
+
+def test_in_bbox_matches_brute_force(index, vendors):
+    expected = sorted(v["id"] for v in vendors if in_bbox(v))
+    assert [r["id"] for r in index.in_bbox(BBOX, limit=10_000)] == expected
+    assert [r["id"] for r in index.in_bbox(BBOX, limit=5)] == expected[:5]
+
+
+def test_clusters_aggregate_every_vendor_in_the_bbox(index, vendors):
+    inside = [v for v in vendors if in_bbox(v)]
+    clusters = index.clusters(BBOX, grid_deg=0.05)
+    assert sum(c["count"] for c in clusters) == len(inside)
+    for category in CATEGORIES:
+        assert sum(c["categories"].get(category, 0) for c in clusters) == sum(
+            v["category"] == category for v in inside
+        )
+    # ogni baricentro cade nella sua cella della griglia
+    cells = {(int(c["latitude"] // 0.05), int(c["longitude"] // 0.05)) for c in clusters}
+    assert len(cells) == len(clusters)
+
+
+def test_far_queries_only_walk_occupied_cells(index, vendors):
+    # raggio enorme vicino al polo e punto dall'altra parte del mondo:
+    # senza limitarsi all'estensione servirebbero milioni di celle
+    far = index.radius(89.0, 9.0, 4000, limit=10)
+    assert far == []
+    lat, lon = -40.0, -60.0
+    expected = sorted(vendors, key=lambda v: haversine_m(lat, lon, v["latitude"], v["longitude"]))[:3]
+    assert [row["id"] for row, _ in index.nearest(lat, lon, 3)] == [v["id"] for v in expected]
+
+
+def test_writes_during_the_first_load_are_not_lost(monkeypatch):
+    async def slow_load(cell_deg):
+        # scrittura mentre il primo caricamento è in corso
+        spatial_index.on_vendors_written([make_vendor(2, 45.0, 9.0)])
+        index = VendorSpatialIndex(cell_deg)
+        index.upsert(make_vendor(1, 45.1, 9.1))
+        return index
+
+    monkeypatch.setattr(spatial_index, "load_index", slow_load)
+    monkeypatch.setattr(spatial_index, "_index", None)
+    asyncio.run(spatial_index.refresh())
+    assert len(spatial_index._index) == 2
+
+
+def test_load_skips_vendors_without_location(monkeypatch, recording_session):
+    class Streaming:
+        def __init__(self):
+            self.db = recording_session
+        async def __aenter__(self):
+            return self
+        async def __aexit__(self, *exc):
+            return False
+        async def stream(self, stmt):
+            await self.db.execute(stmt)
+            return self
+        def mappings(self):
+            return self
+        async def partitions(self):
+            return
+            yield
+
+    monkeypatch.setattr(spatial_index, "AsyncSessionLocal", Streaming)
+    asyncio.run(spatial_index.load_index(0.05))
+    assert "vendors.location IS NOT NULL" in str(recording_session.compiled())
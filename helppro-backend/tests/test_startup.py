@@ -0,0 +1,48 @@
+import asyncio
+
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects.postgresql import asyncpg
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import crud, database
+from app.main import app
+
+
+def test_migrations_form_a_single_chain():
+    script = ScriptDirectory.from_config(Config(str(database.ALEMBIC_INI)))
+    assert len(script.get_heads()) == 1
+    revisions = list(script.walk_revisions())
+    assert revisions[-1].down_revision is None
+    assert all(not rev.is_merge_point for rev in revisions)
+
+
+def test_make_point_is_built_in_sql():
+    sql = str(crud.make_point(45.46, 9.18).compile(dialect=asyncpg.dialect()))
+    # ST_MakePoint vuole (lon, lat)
+    assert sql == "ST_SetSRID(ST_MakePoint($1::FLOAT, $2::FLOAT), $3::INTEGER)"
+    params = crud.make_point(45.46, 9.18).compile(dialect=asyncpg.dialect()).params
+    assert list(params.values()) == [9.18, 45.46, 4326]
+
+
+def test_ping_db():
+    async def run():
+        ok = create_async_engine("sqlite+aiosqlite://")
+        down = create_async_engine("postgresql+asyncpg://u:p@127.0.0.1:1/none")
+        try:
+            return await database.ping_db(2, ok), await database.ping_db(2, down)
+        finally:
+            await ok.dispose()
+            await down.dispose()
+
+    assert asyncio.run(run()) == (True, False)
+
+
+def test_liveness_and_readiness_before_startup():
+    # senza `with` lo startup non gira: liveness risponde, readiness no
+    client = TestClient(app)
+    assert client.get("/healthz").json() == {"status": "ok"}
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["checks"]["startup"] is False
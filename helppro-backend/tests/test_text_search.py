@@ -0,0 +1,59 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app import crud, models
+from app.main import app
+
+SEARCH_TEXT = (
+    "(vendors.company_name || ' ' || vendors.city || ' ' || "
+    "vendors.postcode || ' ' || vendors.address)"
+)
+
+
+def compile_search(db, q, **kwargs):
+    asyncio.run(crud.text_search_vendors(db, q, limit=20, **kwargs))
+    if not db.statements:
+        return None
+    return str(db.compiled())
+
+
+def test_ranked_search_groups_the_indexed_expression(recording_session):
+    sql = compile_search(recording_session, "rossi milano")
+    # stessa espressione, tra parentesi, dell'indice ix_vendors_search_trgm
+    assert f"$1::VARCHAR <% {SEARCH_TEXT} ORDER BY" in sql
+    assert f"word_similarity($2::VARCHAR, {SEARCH_TEXT}) DESC" in sql
+
+
+def test_category_words_become_a_filter(recording_session):
+    sql = compile_search(recording_session, "idraulico")
+    assert "vendors.category IN" in sql
+    assert "<%" not in sql
+
+
+def test_empty_query_runs_no_statement(recording_session):
+    assert compile_search(recording_session, "   ") is None
+
+
+def test_prefix_search_escapes_like_wildcards(recording_session):
+    asyncio.run(crud.text_search_vendors(recording_session, "50%_", limit=5, prefix=True))
+    compiled = recording_session.compiled()
+    assert "ILIKE" in str(compiled)
+    assert "50\\%\\_%" in compiled.params.values()
+
+
+def test_split_category_terms():
+    categories, rest = crud._split_category_terms("parrucchiere Roma centro")
+    assert categories == {models.CategoryEnum.haircut}
+    assert rest == "Roma centro"
+
+
+def test_prefix_mode_requires_a_trigram():
+    response = TestClient(app).get("/vendors/text-search", params={"q": "ro ", "mode": "prefix"})
+    assert response.status_code == 422
+
+
+def test_only_whole_labels_become_categories():
+    assert crud._split_category_terms("Idraulico MILANO") == ({models.CategoryEnum.plumber}, "MILANO")
+    for text in ("Este", "Cap 20121", "Mas"):
+        assert crud._split_category_terms(text) == (set(), text)
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from app.utils import shared_cache, tile_cache
+from app.utils.shared_cache import LocalBackend
+from app.utils.tile_cache import TileCache, tile_for_point
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize("lat, lon, z, expected", [
+    (0.0, 0.0, 0, (0, 0)),
+    (45.4642, 9.19, 1, (1, 0)),
+    (-33.86, 151.2, 1, (1, 1)),
+    (45.4642, 9.19, 10, (538, 366)),
+    # poli fuori dalla proiezione: tile al bordo
+    (90.0, -180.0, 3, (0, 0)),
+    (-90.0, 180.0, 3, (7, 7)),
+])
+def test_tile_for_point(lat, lon, z, expected):
+    assert tile_for_point(lat, lon, z) == expected
+
+
+def test_zooms_above_max_are_not_cached():
+    cache = TileCache(ttl=60, size=10, max_zoom=14)
+    assert cache.cacheable(14)
+    assert not cache.cacheable(15)
+
+
+def test_local_invalidation_drops_only_affected_tiles():
+    cache = TileCache(ttl=60, size=100, max_zoom=12)
+    milan = tile_for_point(45.4642, 9.19, 12)
+    rome = tile_for_point(41.9, 12.5, 12)
+
+    async def run():
+        await cache.store(12, *milan, 0, b"milan")
+        await cache.store(12, *rome, 0, b"rome")
+        await cache.invalidate_points([(45.4643, 9.1901)])
+        assert await cache.get(12, *milan) is None
+        assert await cache.get(12, *rome) == b"rome"
+
+    asyncio.run(run())
+
+
+class CountingBackend(LocalBackend):
+    def __init__(self):
+        super().__init__()
+        self.incr_calls = 0
+
+    async def incr_many(self, keys, ttl):
+        self.incr_calls += 1
+        await super().incr_many(keys, ttl)
+
+
+def test_shared_invalidation_is_one_batch_of_unique_keys():
+    shared = CountingBackend()
+    cache = TileCache(ttl=60, size=100, max_zoom=10, shared=shared)
+    milan = tile_for_point(45.4642, 9.19, 10)
+
+    async def run():
+        version = await cache.version(10, *milan)
+        await cache.store(10, *milan, version, b"milan")
+        assert await cache.get(10, *milan) == b"milan"
+        # 500 punti nello stesso isolato: stesse tile a ogni zoom
+        await cache.invalidate_points([(45.4642 + i * 1e-6, 9.19) for i in range(500)])
+        assert await cache.get(10, *milan) is None
+
+    asyncio.run(run())
+    assert shared.incr_calls == 1
+    assert len(shared._counters) == 11
+
+
+def test_version_counters_expire(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(shared_cache.time, "monotonic", clock)
+    shared = LocalBackend()
+
+    async def run():
+        await shared.incr_many(["a", "b"], ttl=10)
+        await shared.incr_many(["a"], ttl=10)
+        assert await shared.get_counters(["a", "b"]) == [2, 1]
+        clock.now += 5
+        # l'incremento rinnova la scadenza
+        await shared.incr_many(["a"], ttl=10)
+        clock.now += 6
+        assert await shared.get_counters(["a", "b"]) == [3, 0]
+        # oltre 1024 chiavi con scadenza le scadute vengono rimosse
+        await shared.incr_many([f"k{i}" for i in range(1100)], ttl=10)
+        assert "b" not in shared._counters
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("url, ttl", [(None, 30), ("memory://", 600)])
+def test_local_only_cache_uses_the_short_ttl(monkeypatch, url, ttl):
+    monkeypatch.setattr(tile_cache.settings, "SHARED_CACHE_URL", url)
+    monkeypatch.setattr(tile_cache.settings, "TILE_CACHE_TTL_S", 600)
+    monkeypatch.setattr(tile_cache.settings, "TILE_CACHE_LOCAL_TTL_S", 30)
+    tile_cache.start()
+    try:
+        assert tile_cache.get_cache().ttl == ttl
+    finally:
+        asyncio.run(tile_cache.stop())
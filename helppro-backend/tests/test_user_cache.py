@@ -0,0 +1,52 @@
+import asyncio
+
+from app import schemas
+from app.utils import user_cache
+from app.utils.shared_cache import LocalBackend
+
+
+def make_user(email):
+    return schemas.User(id=1, email=email, full_name="Test", disabled=False)
+
+
+def test_put_then_get_counts_hits_and_misses():
+    hits = user_cache.user_cache_requests.labels(result="hit")
+    misses = user_cache.user_cache_requests.labels(result="miss")
+    hits_before, misses_before = hits.value, misses.value
+
+    assert asyncio.run(user_cache.get("cache-test@example.com")) is None
+    user = make_user("cache-test@example.com")
+    user_cache.put("cache-test@example.com", user)
+    assert asyncio.run(user_cache.get("cache-test@example.com")) == user
+
+    assert hits.value == hits_before + 1
+    assert misses.value == misses_before + 1
+
+
+def test_invalidation_from_another_worker_drops_the_entry(monkeypatch):
+    shared = LocalBackend()
+    monkeypatch.setattr(user_cache, "_shared", shared)
+    email = "shared-test@example.com"
+
+    async def run():
+        user_cache.put(email, make_user(email), await user_cache.version(email))
+        assert await user_cache.get(email) is not None
+        # un altro worker scrive l'utente: condivide solo il backend
+        await shared.incr(user_cache._version_key(email))
+        assert await user_cache.get(email) is None
+
+    asyncio.run(run())
+
+
+def test_invalidate_bumps_the_shared_version(monkeypatch):
+    monkeypatch.setattr(user_cache, "_shared", LocalBackend())
+    email = "bump-test@example.com"
+
+    async def run():
+        stale = await user_cache.version(email)
+        await user_cache.invalidate(email)
+        # voce letta prima dell'invalidazione: scartata alla lettura
+        user_cache.put(email, make_user(email), stale)
+        assert await user_cache.get(email) is None
+
+    asyncio.run(run())
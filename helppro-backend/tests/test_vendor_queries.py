@@ -0,0 +1,50 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app import crud
+from app.main import app
+
+
+def compile_call(db, fn, *args, **kwargs):
+    asyncio.run(fn(db, *args, **kwargs))
+    return str(db.compiled())
+
+
+def test_radius_search_uses_the_geography_index_expression(recording_session):
+    sql = compile_call(recording_session, crud.get_vendors_in_radius, 45.46, 9.18, 2.5, limit=20, after_id=100)
+    # stessa espressione di ix_vendors_location_geog, raggio in metri
+    assert "ST_DWithin(geography(vendors.location), geography(" in sql
+    assert "ST_MakePoint" in sql
+    assert "vendors.id > $" in sql
+    assert "ORDER BY vendors.id" in sql
+    assert "LIMIT $" in sql
+
+
+def test_radius_search_passes_radius_in_meters(recording_session):
+    asyncio.run(crud.get_vendors_in_radius(recording_session, 45.46, 9.18, 2.5))
+    params = recording_session.compiled().params
+    assert 2500.0 in params.values()
+
+
+def test_nearest_orders_by_knn_distance(recording_session):
+    sql = compile_call(recording_session, crud.get_nearest_vendors, 45.46, 9.18, 5, category="plumber", max_radius_km=10)
+    assert "ORDER BY geography(vendors.location) <-> geography(" in sql
+    assert "ST_Distance(geography(vendors.location), geography(" in sql
+    assert "AS distance_m" in sql
+    assert "ST_DWithin(geography(vendors.location)" in sql
+    assert "vendors.category = $" in sql
+
+
+def test_clusters_group_by_grid_cell_inside_the_bbox(recording_session):
+    sql = compile_call(recording_session, crud.get_vendor_clusters, (9.1, 45.4, 9.3, 45.5), 0.01)
+    assert "vendors.location && ST_MakeEnvelope(" in sql
+    assert "GROUP BY floor(ST_Y(vendors.location) / " in sql
+    assert "count(*) FILTER (WHERE vendors.category = $" in sql
+
+
+def test_search_rejects_out_of_range_coordinates_and_radius():
+    client = TestClient(app)
+    assert client.get("/vendors/search", params={"lat": 91, "lon": 9}).status_code == 422
+    assert client.get("/vendors/search", params={"lat": 45, "lon": 9, "radius_km": 4000}).status_code == 422
+    assert client.get("/vendors/nearest", params={"lat": 45, "lon": 181}).status_code == 422